@@ -47,9 +47,27 @@ ACCOUNT_USERNAME_REQUIRED = False
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "useraccount.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    "DEFAULT_RENDERER_CLASSES": (
+        "property.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    # Token buckets per IP (anon) and per user, see property.throttling
+    "DEFAULT_THROTTLE_CLASSES": (
+        "property.throttling.AnonTokenBucketThrottle",
+        "property.throttling.UserTokenBucketThrottle",
+    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "search_anon": os.getenv("THROTTLE_SEARCH_ANON", "60/min"),
+        "search_user": os.getenv("THROTTLE_SEARCH_USER", "120/min"),
+        # Streamed searches (stream=true) return every match, not a page
+        "stream_user": os.getenv("THROTTLE_STREAM_USER", "6/min"),
+        "booking_user": os.getenv("THROTTLE_BOOKING_USER", "30/min"),
+        "auth_anon": os.getenv("THROTTLE_AUTH_ANON", "10/min"),
+        "auth_user": os.getenv("THROTTLE_AUTH_USER", "20/min"),
+    },
 }
 
 # To this:
@@ -97,10 +115,15 @@ MIDDLEWARE = [
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "property.throttling.LoadSheddingMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "property.replicas.ReplicaMiddleware",
+    # Under ASGI, answers the hot read endpoints from async views; left out
+    # under WSGI
+    "property.async_views.AsyncViewsMiddleware",
 ]
 
 ROOT_URLCONF = "djangobnb_backend.urls"
@@ -137,6 +160,76 @@ DATABASES = {
     }
 }
 
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # Take the write lock when a transaction starts so concurrent bookings
+    # queue up instead of failing with "database is locked".
+    DATABASES["default"]["OPTIONS"] = {"transaction_mode": "IMMEDIATE", "timeout": 20}
+    # A test database file rather than memory, so tests can book from threads
+    DATABASES["default"]["TEST"] = {
+        "NAME": os.path.join(
+            os.path.dirname(DATABASES["default"]["NAME"]),
+            "test_" + os.path.basename(DATABASES["default"]["NAME"]),
+        )
+    }
+
+# Read replicas (see property.replicas): the hosts of the replicas, or their
+# database files with SQLite, separated by spaces
+DATABASE_REPLICAS = []
+for number, replica in enumerate(os.getenv("SQL_REPLICAS", "").split(), 1):
+    alias = f"replica_{number}"
+    DATABASES[alias] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+        DATABASES[alias]["NAME"] = replica
+    else:
+        DATABASES[alias]["HOST"] = replica
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["property.replicas.ReplicaRouter"]
+
+# Seconds a user's reads stay on the primary after they write, and cached
+# responses for a changed generation are built from the primary. Keep it
+# above the replicas' worst lag.
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "djangobnb",
+        }
+    }
+
+# Seconds a cached property list, search or detail response is kept
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 300))
+
+# Users kept in each process by the JWT authentication (see
+# useraccount.authentication), and for how many seconds at most
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 10000))
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", 60))
+
+# Cache alias holding the throttle token buckets
+THROTTLE_CACHE = os.getenv("THROTTLE_CACHE", "default")
+
+# Expensive GET requests one process runs at once before answering 503 with
+# Retry-After (0 disables load shedding)
+LOAD_SHED_MAX_IN_FLIGHT = int(os.getenv("LOAD_SHED_MAX_IN_FLIGHT", 0))
+LOAD_SHED_RETRY_AFTER = int(os.getenv("LOAD_SHED_RETRY_AFTER", 1))
+
+# Minutes a pending reservation holds its nights before sweep_reservations
+# expires it
+RESERVATION_HOLD_MINUTES = int(os.getenv("RESERVATION_HOLD_MINUTES", 30))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
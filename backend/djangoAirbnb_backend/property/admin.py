@@ -1,5 +1,20 @@
 from django.contrib import admin
-from .models import Property, PropertyImage, Reservation, Review, Wishlist
+from . import exports
+from .models import (
+    Amenity,
+    Property,
+    PropertyImage,
+    Reservation,
+    Review,
+    Wishlist,
+)
+
+
+@admin.action(description="Export selected rows as CSV")
+def export_csv(modeladmin, request, queryset):
+    return exports.stream_export(
+        queryset, modeladmin.export_columns, "csv", modeladmin.export_filename
+    )
 
 
 class PropertyImageInline(admin.TabularInline):
@@ -28,8 +43,12 @@ class PropertyAdmin(admin.ModelAdmin):
         "updated_at",
         "average_rating",
         "review_count",
+        "amenity_mask",
     ]
     inlines = [PropertyImageInline]
+    actions = [export_csv]
+    export_columns = exports.PROPERTY_COLUMNS
+    export_filename = "properties"
 
     fieldsets = (
         ("Basic Info", {"fields": ("title", "description", "host", "property_type")}),
@@ -43,6 +62,7 @@ class PropertyAdmin(admin.ModelAdmin):
                     "bedrooms",
                     "bathrooms",
                     "amenities",
+                    "amenity_mask",
                 )
             },
         ),
@@ -61,6 +81,13 @@ class PropertyAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(Amenity)
+class AmenityAdmin(admin.ModelAdmin):
+    list_display = ["name", "key", "bit"]
+    search_fields = ["name", "key"]
+    readonly_fields = ["key", "bit"]
+
+
 @admin.register(PropertyImage)
 class PropertyImageAdmin(admin.ModelAdmin):
     list_display = ["property", "caption", "is_primary", "order"]
@@ -84,6 +111,9 @@ class ReservationAdmin(admin.ModelAdmin):
     search_fields = ["property__title", "guest__email", "guest__name"]
     readonly_fields = ["id", "nights", "created_at", "updated_at"]
     date_hierarchy = "check_in"
+    actions = [export_csv]
+    export_columns = exports.RESERVATION_COLUMNS
+    export_filename = "reservations"
 
     fieldsets = (
         (
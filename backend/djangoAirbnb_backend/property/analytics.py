@@ -0,0 +1,353 @@
+"""
+Host analytics: occupancy, revenue and average daily rate per month.
+
+``MonthlyRollup`` holds the booked nights, revenue and check-ins of every
+property in every month, counting confirmed and completed reservations,
+and ``HostMonthlyRollup`` their sums over each host's properties. A stay's
+nights go to the months they fall in, and its total price is shared out
+per night in whole cents, so the months of a stay add up to its exact
+price. A property also counts as a listing added in the month it was
+created, and the listings of a month are the ones added up to then. The
+dashboard only reads rollups: one row per month, however many listings the
+host has.
+
+``refresh`` reprocesses just the properties created or with reservations
+updated since the last run's watermark, plus the ones queued in
+``StaleRollup`` because they or one of their reservations were deleted. Each property is recomputed from all of
+its reservations, so a refresh never depends on what changed, and then the
+totals of their hosts. Writes that leave ``updated_at`` alone (queryset
+``update()`` without it) and changes of a property's host need
+``refresh(full=True)``.
+
+With NumPy installed, large batches expand stays into nights with array
+operations instead of a Python loop.
+"""
+
+import calendar
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import (
+    HostMonthlyRollup,
+    MonthlyRollup,
+    Property,
+    Reservation,
+    RollupWatermark,
+    StaleRollup,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+COUNTED_STATUSES = ["confirmed", "completed"]
+WATERMARK = "monthly-rollups"
+
+# Reprocess reservations updated this long before the previous run started,
+# so rows committed late by long transactions are not missed.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+EPOCH = date(1970, 1, 1).toordinal()
+
+# Below this many reservations the Python loop is as fast as NumPy
+NUMPY_MIN_ROWS = 5000
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _expand_python(rows):
+    totals = defaultdict(lambda: [0, 0, 0])
+    for property_id, check_in, check_out, total_price in rows:
+        nights = (check_out - check_in).days
+        if nights <= 0:
+            continue
+        cents = int(total_price * 100)
+        totals[property_id, month_start(check_in)][2] += 1
+        night, start = 0, check_in
+        while start < check_out:
+            end = min(next_month(start), check_out)
+            first, last = night, night + (end - start).days
+            bucket = totals[property_id, month_start(start)]
+            bucket[0] += last - first
+            # Night n of the stay earns cents * (n + 1) // nights minus
+            # cents * n // nights, which adds up to exactly ``cents``.
+            bucket[1] += cents * last // nights - cents * first // nights
+            night, start = last, end
+    return totals
+
+
+def _expand_numpy(rows):
+    property_ids = sorted({row[0] for row in rows})
+    codes = {property_id: code for code, property_id in enumerate(property_ids)}
+    property_codes = _column((codes[row[0]] for row in rows), len(rows))
+    # Building datetime64 arrays from date objects is slow, ordinals are not
+    check_ins = _column((row[1].toordinal() - EPOCH for row in rows), len(rows))
+    check_outs = _column((row[2].toordinal() - EPOCH for row in rows), len(rows))
+    cents = _column((int(row[3] * 100) for row in rows), len(rows))
+    nights = check_outs - check_ins
+    keep = nights > 0
+    property_codes, cents, nights = property_codes[keep], cents[keep], nights[keep]
+    check_ins = check_ins[keep].astype("datetime64[D]")
+    totals = defaultdict(lambda: [0, 0, 0])
+    if not len(nights):
+        return totals
+
+    # One element per night: its stay, its position within the stay, its
+    # month (counted from 1970-01) and its share of the stay's price
+    stay = numpy.repeat(numpy.arange(len(nights)), nights)
+    offset = numpy.arange(len(stay)) - numpy.repeat(
+        numpy.cumsum(nights) - nights, nights
+    )
+    months = (check_ins[stay] + offset).astype("datetime64[M]").astype(numpy.int64)
+    stay_cents, stay_nights = cents[stay], nights[stay]
+    night_cents = (
+        stay_cents * (offset + 1) // stay_nights - stay_cents * offset // stay_nights
+    )
+
+    # Sum the nights per (property, month) key
+    span = int(months.max()) + 1
+    keys = property_codes[stay] * span + months
+    order = numpy.argsort(keys, kind="stable")
+    keys, night_cents = keys[order], night_cents[order]
+    unique_keys, starts = numpy.unique(keys, return_index=True)
+    counts = numpy.diff(numpy.append(starts, len(keys)))
+    sums = numpy.add.reduceat(night_cents, starts)
+    for key, count, total in zip(unique_keys.tolist(), counts.tolist(), sums.tolist()):
+        bucket = totals[_bucket_key(key, span, property_ids)]
+        bucket[0], bucket[1] = count, total
+
+    check_in_months = check_ins.astype("datetime64[M]").astype(numpy.int64)
+    keys = property_codes * span + check_in_months
+    unique_keys, counts = numpy.unique(keys, return_counts=True)
+    for key, count in zip(unique_keys.tolist(), counts.tolist()):
+        totals[_bucket_key(key, span, property_ids)][2] = count
+    return totals
+
+
+def _column(values, count):
+    return numpy.fromiter(values, dtype=numpy.int64, count=count)
+
+
+def _bucket_key(key, span, property_ids):
+    code, month = divmod(key, span)
+    return (
+        property_ids[code],
+        numpy.datetime64(month, "M").astype("datetime64[D]").item(),
+    )
+
+
+def expand(rows):
+    """
+    Return ``{(property id, month): [nights, cents, check-ins]}`` for
+    ``(property id, check-in, check-out, total price)`` rows.
+    """
+    if numpy is not None and len(rows) >= NUMPY_MIN_ROWS:
+        return _expand_numpy(rows)
+    return _expand_python(rows)
+
+
+def _recompute(property_ids):
+    """Redo the properties' rollups; return the ids of their hosts"""
+    # Dequeue first: a reservation deleted while this runs queues the
+    # property again for the next refresh.
+    queued = StaleRollup.objects.filter(pk__in=property_ids)
+    host_ids = set(queued.exclude(host_id=None).values_list("host_id", flat=True))
+    queued.delete()
+    host_ids.update(
+        Property.objects.filter(pk__in=property_ids).values_list("host_id", flat=True)
+    )
+
+    rows = list(
+        Reservation.objects.filter(
+            property_id__in=property_ids, status__in=COUNTED_STATUSES
+        ).values_list("property_id", "check_in", "check_out", "total_price")
+    )
+    totals = expand(rows)
+    # Each property is a listing added in the month it was created
+    added = {
+        (property_id, month_start(timezone.localtime(created_at).date()))
+        for property_id, created_at in Property.objects.filter(
+            pk__in=property_ids
+        ).values_list("pk", "created_at")
+    }
+    rollups = []
+    for property_id, month in totals.keys() | added:
+        nights, cents, check_ins = totals.get((property_id, month), (0, 0, 0))
+        rollups.append(
+            MonthlyRollup(
+                property_id=property_id,
+                month=month,
+                nights=nights,
+                revenue=Decimal(cents).scaleb(-2),
+                check_ins=check_ins,
+                listings_added=int((property_id, month) in added),
+            )
+        )
+    MonthlyRollup.objects.filter(property_id__in=property_ids).delete()
+    MonthlyRollup.objects.bulk_create(rollups)
+    return host_ids
+
+
+def _recompute_hosts(host_ids):
+    HostMonthlyRollup.objects.filter(host_id__in=host_ids).delete()
+    HostMonthlyRollup.objects.bulk_create(
+        HostMonthlyRollup(
+            host_id=row["property__host_id"],
+            month=row["month"],
+            nights=row["nights_sum"],
+            revenue=row["revenue_sum"],
+            check_ins=row["check_ins_sum"],
+            listings_added=row["listings_added_sum"],
+        )
+        for row in MonthlyRollup.objects.filter(property__host_id__in=host_ids)
+        .order_by()
+        .values("property__host_id", "month")
+        .annotate(
+            nights_sum=Sum("nights"),
+            revenue_sum=Sum("revenue"),
+            check_ins_sum=Sum("check_ins"),
+            listings_added_sum=Sum("listings_added"),
+        )
+    )
+
+
+def refresh(full=False, batch_size=2000):
+    """Bring the rollups up to date; return the number of properties redone"""
+    started = timezone.now()
+    watermark = RollupWatermark.objects.filter(pk=WATERMARK).first()
+    host_ids = set()
+    if full or watermark is None:
+        property_ids = set(Property.objects.values_list("pk", flat=True))
+        # Hosts whose properties are all gone
+        host_ids.update(
+            HostMonthlyRollup.objects.values_list("host_id", flat=True).distinct()
+        )
+    else:
+        property_ids = set(
+            Reservation.objects.filter(updated_at__gt=watermark.value)
+            .order_by()
+            .values_list("property_id", flat=True)
+            .distinct()
+        )
+        property_ids.update(
+            Property.objects.filter(created_at__gt=watermark.value).values_list(
+                "pk", flat=True
+            )
+        )
+    property_ids.update(StaleRollup.objects.values_list("pk", flat=True))
+
+    property_ids = sorted(property_ids)
+    for i in range(0, len(property_ids), batch_size):
+        with transaction.atomic():
+            host_ids |= _recompute(property_ids[i : i + batch_size])
+    host_ids = sorted(host_ids)
+    for i in range(0, len(host_ids), batch_size):
+        with transaction.atomic():
+            _recompute_hosts(host_ids[i : i + batch_size])
+
+    RollupWatermark.objects.update_or_create(
+        pk=WATERMARK, defaults={"value": started - WATERMARK_OVERLAP}
+    )
+    return len(property_ids)
+
+
+def queue_property(property_id, using=None):
+    # Looked up now: the property may be on its way out in the same delete
+    host_id = (
+        Property.objects.using(using)
+        .filter(pk=property_id)
+        .values_list("host_id", flat=True)
+        .first()
+    )
+    StaleRollup.objects.using(using).bulk_create(
+        [StaleRollup(property_id=property_id, host_id=host_id)],
+        ignore_conflicts=True,
+    )
+
+
+def queue_properties(properties, using=None):
+    """``queue_property`` for every property in a queryset, in two queries"""
+    rows = properties.order_by().values_list("pk", "host_id").distinct()
+    StaleRollup.objects.using(using).bulk_create(
+        [StaleRollup(property_id=pk, host_id=host_id) for pk, host_id in rows],
+        ignore_conflicts=True,
+    )
+
+
+def _months(start, end):
+    month = start
+    while month <= end:
+        yield month
+        month = next_month(month)
+
+
+def _rates(available, nights, revenue):
+    # Decimals as strings, the way the API renders money
+    occupancy = Decimal(nights) / available if available else Decimal(0)
+    adr = revenue / nights if nights else Decimal(0)
+    return {
+        "available_nights": available,
+        "booked_nights": nights,
+        "occupancy_rate": str(occupancy.quantize(Decimal("0.0001"))),
+        "revenue": str(revenue.quantize(Decimal("0.01"))),
+        "adr": str(adr.quantize(Decimal("0.01"))),
+    }
+
+
+def host_report(host, start, end, property_id=None):
+    """
+    Return the occupancy, revenue and average daily rate of ``host``'s
+    properties (or just ``property_id``) for every month from ``start`` to
+    ``end``, and over the whole range.
+    """
+    rollups = HostMonthlyRollup.objects.filter(host=host)
+    if property_id is not None:
+        rollups = MonthlyRollup.objects.filter(property_id=property_id)
+
+    # Listings added before the range count in every month of it
+    listings = 0
+    booked = {}
+    for month, nights, revenue, check_ins, listings_added in rollups.filter(
+        month__lte=end
+    ).values_list("month", "nights", "revenue", "check_ins", "listings_added"):
+        if month < start:
+            listings += listings_added
+        else:
+            booked[month] = (nights, revenue, check_ins, listings_added)
+
+    months = []
+    available = nights = check_ins = 0
+    revenue = Decimal("0.00")
+    for month in _months(start, end):
+        month_nights, month_revenue, month_check_ins, listings_added = booked.get(
+            month, (0, Decimal("0.00"), 0, 0)
+        )
+        listings += listings_added
+        month_available = listings * calendar.monthrange(month.year, month.month)[1]
+        months.append(
+            {
+                "month": f"{month:%Y-%m}",
+                "listings": listings,
+                **_rates(month_available, month_nights, month_revenue),
+                "check_ins": month_check_ins,
+            }
+        )
+        available += month_available
+        nights += month_nights
+        revenue += month_revenue
+        check_ins += month_check_ins
+
+    totals = {**_rates(available, nights, revenue), "check_ins": check_ins}
+    return {"months": months, "totals": totals}
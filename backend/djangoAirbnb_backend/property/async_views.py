@@ -0,0 +1,310 @@
+"""
+Async implementations of the hot read endpoints for the ASGI stack.
+
+Under ASGI a synchronous DRF view holds a thread for the whole request,
+including the time spent waiting on the database. GET requests for property
+detail, property search, a property's reviews and the wishlist are answered
+by coroutines instead: the user comes from
+``CachedJWTAuthentication.aauthenticate``, rows from the async ORM (``aget``,
+``async for``, ``afirst``), cache entries and throttle buckets from the
+cache's ``a*`` methods. Serializers only run once every row they read is
+loaded, so rendering never touches the database. Payloads and headers are
+the same as the DRF views'.
+
+``async_read_view`` attaches a coroutine to its DRF view as ``async_view``
+and ``AsyncViewsMiddleware`` runs it in place of the view. Under WSGI the
+middleware is left out, so the DRF views run as before without going
+through ``async_to_sync``. Requests a coroutine does not handle (writes, HEAD
+and OPTIONS, the browsable API, search facets and streamed search results)
+still go to the DRF view.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import exceptions, status
+from rest_framework.fields import BooleanField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from . import conditional, fast_serialization, response_cache, views
+from .models import Property, Review, Wishlist
+from .pagination import KeysetPagination
+from .renderers import FastJSONRenderer
+from .serializers import (
+    PropertyDetailSerializer,
+    ReviewSerializer,
+    WishlistSerializer,
+    awishlisted_property_ids,
+)
+
+
+class AsyncViewsMiddleware:
+    """Under ASGI, answer requests with the view's ``async_view`` if it has one"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not iscoroutinefunction(get_response):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        markcoroutinefunction(self)
+
+    async def __call__(self, request):
+        return await self.get_response(request)
+
+    async def process_view(self, request, view_func, view_args, view_kwargs):
+        async_view = getattr(view_func, "async_view", None)
+        if async_view is None:
+            return None
+        # None when the DRF view should answer after all
+        return await async_view(request, *view_args, **view_kwargs)
+
+
+def _negotiate(request, view):
+    """Return ``(renderer, media_type)`` if the client gets JSON, else None"""
+    try:
+        renderer, media_type = view.get_content_negotiator().select_renderer(
+            request, view.get_renderers()
+        )
+    except exceptions.NotAcceptable:
+        return None
+    if not isinstance(renderer, FastJSONRenderer):
+        return None
+    return renderer, media_type
+
+
+async def _authenticate(request):
+    """Set ``request.user`` and ``request.auth`` the way DRF would"""
+    for authenticator in request.authenticators:
+        if hasattr(authenticator, "aauthenticate"):
+            user_auth = await authenticator.aauthenticate(request)
+        else:
+            user_auth = await sync_to_async(authenticator.authenticate)(request)
+        if user_auth is not None:
+            request.user, request.auth = user_auth
+            return
+    request.user, request.auth = api_settings.UNAUTHENTICATED_USER(), None
+
+
+def _check_permissions(request, view):
+    for permission in view.get_permissions():
+        if not permission.has_permission(request, view):
+            if not request.user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied()
+
+
+async def _check_throttles(request, view):
+    durations = []
+    for throttle in view.get_throttles():
+        if hasattr(throttle, "aallow_request"):
+            allowed = await throttle.aallow_request(request, view)
+        else:
+            allowed = await sync_to_async(throttle.allow_request)(request, view)
+        if not allowed:
+            durations.append(throttle.wait())
+    if durations:
+        durations = [duration for duration in durations if duration is not None]
+        raise exceptions.Throttled(wait=max(durations, default=None))
+
+
+def _authenticate_header(request):
+    for authenticator in request.authenticators:
+        return authenticator.authenticate_header(request)
+    return None
+
+
+def _handle_exception(request, view, exc):
+    # What APIView.handle_exception does for the exceptions raised here
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        auth_header = _authenticate_header(request)
+        if auth_header:
+            exc.auth_header = auth_header
+        else:
+            exc.status_code = status.HTTP_403_FORBIDDEN
+    response = view.get_exception_handler()(exc, view.get_exception_handler_context())
+    if response is None:
+        raise exc
+    return response
+
+
+def _finalize(request, response, negotiated, allow):
+    """Render ``response`` with the negotiated renderer, as APIView would"""
+    if isinstance(response, Response):
+        renderer, media_type = negotiated
+        content = renderer.render(
+            response.data, media_type, {"request": request, "response": response}
+        )
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        # A plain HttpResponse, so Django has nothing left to render in a
+        # thread
+        rendered = HttpResponse(
+            content, status=response.status_code, content_type=content_type
+        )
+        for header, value in response.items():
+            if header != "Content-Type":
+                rendered[header] = value
+        response = rendered
+    response["Allow"] = allow
+    patch_vary_headers(response, ["Accept"])
+    return response
+
+
+def _wants_sync(request, sync_params):
+    return any(
+        request.GET.get(name) in BooleanField.TRUE_VALUES for name in sync_params
+    )
+
+
+def async_read_view(view, sync_params=()):
+    """
+    Attach the decorated coroutine to the DRF view ``view`` to answer its
+    GET requests under ASGI, except those that turn on one of
+    ``sync_params``; return ``view``. The coroutine receives a DRF
+    ``Request`` that has been authenticated, checked against the view's
+    permissions and throttled with the view's own classes, and returns a DRF
+    ``Response`` or raises like a DRF view.
+    """
+
+    def decorator(read):
+        async def async_view(request, *args, **kwargs):
+            if request.method != "GET" or _wants_sync(request, sync_params):
+                return None
+            # An instance per request, as as_view() makes, for the
+            # get_authenticators(), get_permissions() and get_throttles()
+            # APIView.initial() would use
+            instance = view.cls(**view.initkwargs)
+            instance.setup(request, *args, **kwargs)
+            drf_request = instance.initialize_request(request, *args, **kwargs)
+            instance.request = drf_request
+            negotiated = _negotiate(drf_request, instance)
+            if negotiated is None:
+                return None
+            allow = ", ".join(instance.allowed_methods)
+
+            try:
+                await _authenticate(drf_request)
+                _check_permissions(drf_request, instance)
+                await _check_throttles(drf_request, instance)
+                response = await read(drf_request, *args, **kwargs)
+            except (exceptions.APIException, Http404) as exc:
+                response = _handle_exception(drf_request, instance, exc)
+            return _finalize(drf_request, response, negotiated, allow)
+
+        view.async_view = async_view
+        return view
+
+    return decorator
+
+
+async def _is_wishlisted(request, property_id):
+    entry = views.wishlist_entry(request, property_id)
+    return entry is not None and await entry.aexists()
+
+
+@async_read_view(views.PropertyDetailView.as_view())
+async def property_detail(request, pk):
+    """Retrieve a property"""
+    validators = await conditional.aproperty_validators(pk)
+    if validators is None:
+        raise Http404
+    read = views.PropertyDetailRead(
+        request, pk, validators, await _is_wishlisted(request, pk)
+    )
+    response = read.not_modified()
+    if response is None:
+
+        async def build():
+            queryset = PropertyDetailSerializer.setup_eager_loading(
+                Property.objects.all()
+            )
+            try:
+                instance = await queryset.aget(pk=pk)
+            except Property.DoesNotExist:
+                raise Http404
+            context = {"request": request, "wishlisted_ids": read.wishlisted_ids}
+            return Response(PropertyDetailSerializer(instance, context=context).data)
+
+        response = await response_cache.acached_response(
+            request,
+            read.cache_name,
+            read.generations,
+            build,
+            wishlisted_ids=read.wishlisted_ids,
+            validate=False,
+        )
+    return read.finish(response)
+
+
+@async_read_view(
+    views.property_search,
+    # Facet counts and streamed results are only produced by the DRF view
+    sync_params=["facets", "stream"],
+)
+async def property_search(request):
+    """Advanced property search"""
+    wishlisted_ids = await awishlisted_property_ids(request)
+
+    async def build():
+        # Amenity names are resolved against the catalogue while the
+        # query is built
+        _, paginator, queryset = await sync_to_async(views.search_request)(request)
+        page = await paginator.apaginate_queryset(
+            fast_serialization.property_rows(queryset), request
+        )
+        return paginator.get_paginated_response(
+            await fast_serialization.aserialize_properties(
+                page, request, wishlisted_ids
+            )
+        )
+
+    return await response_cache.acached_response(
+        request,
+        "property-search",
+        views.search_generations(request),
+        build,
+        wishlisted_ids=wishlisted_ids,
+    )
+
+
+async def _paginated(request, queryset, serializer_class):
+    paginator = KeysetPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    context = {"request": request}
+    if page:
+        # Looked up only when a property is rendered, like is_wishlisted does
+        context["wishlisted_ids"] = await awishlisted_property_ids(request)
+    serializer = serializer_class(page, many=True, context=context)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@async_read_view(views.PropertyReviewsView.as_view())
+async def property_reviews(request, property_id):
+    """List reviews for a property"""
+    queryset = ReviewSerializer.setup_eager_loading(
+        Review.objects.filter(property_id=property_id)
+    )
+    validators = await conditional.aproperty_validators(property_id)
+    if validators is None:
+        return await _paginated(request, queryset, ReviewSerializer)
+    read = views.PropertyReviewsRead(
+        request, validators, await _is_wishlisted(request, property_id)
+    )
+    response = read.not_modified()
+    if response is None:
+        response = await _paginated(request, queryset, ReviewSerializer)
+    return read.finish(response)
+
+
+@async_read_view(views.WishlistView.as_view())
+async def wishlist(request):
+    """List user's wishlist"""
+    queryset = WishlistSerializer.setup_eager_loading(
+        Wishlist.objects.filter(user=request.user)
+    )
+    return await _paginated(request, queryset, WishlistSerializer)
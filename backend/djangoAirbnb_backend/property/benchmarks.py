@@ -0,0 +1,458 @@
+"""
+End-to-end API benchmark.
+
+Every URL in ``property.urls`` and ``useraccount.urls`` has at least one
+scenario, and ``APIBenchmark.check_coverage()`` fails when a URL is added
+without one. Each iteration of a scenario first prepares whatever the request
+needs (a reservation to cancel, a property to delete, ...) outside the
+measurement, then sends one request through DRF's test client with a real
+JWT and records its latency, number of queries and response size.
+
+Results are plain dicts so they can be written as JSON baselines and
+compared with ``compare_benchmarks``.
+"""
+
+import statistics
+import time
+from collections import Counter, namedtuple
+from datetime import timedelta
+from importlib import import_module
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Property, Reservation, Wishlist
+
+User = get_user_model()
+
+# ``prepare(i)`` returns ``(client, method, path, data)`` for iteration i
+Scenario = namedtuple("Scenario", ["name", "url_name", "prepare"])
+
+# Namespaces whose every URL must be covered
+NAMESPACES = ["property", "useraccount"]
+
+PERCENTILES = {"p50_ms": 49, "p95_ms": 94, "p99_ms": 98}
+
+
+def url(name, *args):
+    return reverse(name, args=args)
+
+
+def summarize(timings, queries, sizes, statuses):
+    """Return the recorded figures for one scenario"""
+    result = {"requests": len(timings)}
+    cuts = statistics.quantiles(timings, n=100, method="inclusive")
+    for key, index in PERCENTILES.items():
+        result[key] = round(cuts[index] * 1000, 3)
+    result["mean_ms"] = round(statistics.fmean(timings) * 1000, 3)
+    result["queries"] = statistics.median(queries)
+    result["max_queries"] = max(queries)
+    result["bytes"] = statistics.median(sizes)
+    result["statuses"] = {str(code): n for code, n in sorted(statuses.items())}
+    return result
+
+
+class APIBenchmark:
+    """
+    Drive every API URL against the current database, which must hold a
+    synthetic data set (see property.synthetic).
+    """
+
+    def __init__(self, cold_cache=True):
+        self.cold_cache = cold_cache
+
+    def client(self, user=None):
+        client = APIClient()
+        if user is not None:
+            token = RefreshToken.for_user(user).access_token
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client
+
+    def make_user(self, role, **fields):
+        return User.objects.create_user(
+            email=f"benchmark-{role}@example.com",
+            password="benchmark-password",
+            name=f"Benchmark {role}",
+            **fields,
+        )
+
+    def setup(self):
+        """Pick realistic actors from the data set and create fixtures"""
+        # The busiest host and guest, so lists and exports are not trivial
+        busiest_host = (
+            Property.objects.values("host")
+            .annotate(n=Count("pk"))
+            .order_by("-n", "host")
+            .first()
+        )
+        busiest_guest = (
+            Reservation.objects.values("guest")
+            .annotate(n=Count("pk"))
+            .order_by("-n", "guest")
+            .first()
+        )
+        if busiest_host is None or busiest_guest is None:
+            raise ValueError("Load a synthetic data set first.")
+        self.host = User.objects.get(pk=busiest_host["host"])
+        self.guest = User.objects.get(pk=busiest_guest["guest"])
+        self.host_properties = list(
+            Property.objects.filter(host=self.host).order_by("pk")[:50]
+        )
+        self.popular = list(
+            Property.objects.order_by("-review_count", "pk")[:50].values_list(
+                "pk", flat=True
+            )
+        )
+        self.guest_reservations = list(
+            Reservation.objects.filter(guest=self.guest)
+            .order_by("pk")[:50]
+            .values_list("pk", flat=True)
+        )
+        # Bookable without touching the generated calendars
+        self.venue = Property.objects.create(
+            title="Benchmark venue",
+            description="Benchmark",
+            location="Paris, France",
+            address="1 Benchmark Street",
+            price_per_night=100,
+            guests=4,
+            amenities="WiFi",
+            host=self.host,
+        )
+        self.booker = self.make_user("booker")
+        self.reviewer = self.make_user("reviewer")
+        self.wisher = self.make_user("wisher")
+        self.account = self.make_user("account")
+        self.clients = {
+            user: self.client(user)
+            for user in [
+                self.host,
+                self.guest,
+                self.booker,
+                self.reviewer,
+                self.wisher,
+                self.account,
+            ]
+        }
+        self.clients[None] = self.client()
+        self.far_future = timezone.now().date() + timedelta(days=2000)
+
+    def book(self, guest, i, status):
+        check_in = self.far_future + timedelta(days=2 * i)
+        return Reservation.objects.create(
+            property=self.venue,
+            guest=guest,
+            check_in=check_in,
+            check_out=check_in + timedelta(days=1),
+            guests_count=1,
+            total_price=self.venue.price_per_night,
+            status=status,
+        )
+
+    def scenarios(self):
+        host, guest = self.clients[self.host], self.clients[self.guest]
+        anonymous = self.clients[None]
+        today = timezone.now().date()
+        check_in, check_out = today + timedelta(days=30), today + timedelta(days=33)
+        stay = f"check_in={check_in}&check_out={check_out}"
+        search = url("property:property-search")
+
+        def get(client, path):
+            return lambda i: (client, "get", path, None)
+
+        def rotating(client, name, values):
+            return lambda i: (client, "get", url(name, values[i % len(values)]), None)
+
+        def create_property(i):
+            data = {
+                "title": f"Benchmark listing {i}",
+                "description": "Benchmark",
+                "location": "Lisbon, Portugal",
+                "address": f"{i} Benchmark Street",
+                "price_per_night": "95.00",
+                "guests": 2,
+                "amenities_list": ["WiFi", "Kitchen"],
+            }
+            return host, "post", url("property:property-list-create"), data
+
+        def update_property(i):
+            prop = self.host_properties[i % len(self.host_properties)]
+            data = {"price_per_night": f"{100 + i % 50}.00"}
+            return host, "patch", url("property:property-detail", prop.pk), data
+
+        def delete_property(i):
+            prop = Property.objects.create(
+                title=f"Benchmark delete {i}",
+                description="Benchmark",
+                location="Lisbon, Portugal",
+                address="-",
+                price_per_night=90,
+                amenities="",
+                host=self.host,
+            )
+            return host, "delete", url("property:property-detail", prop.pk), None
+
+        def create_reservation(i):
+            check_in = self.far_future + timedelta(days=2 * i + 1)
+            data = {
+                "property_id": str(self.venue.pk),
+                "check_in": str(check_in),
+                "check_out": str(check_in + timedelta(days=1)),
+                "guests_count": 1,
+            }
+            client = self.clients[self.booker]
+            return client, "post", url("property:create-reservation"), data
+
+        def update_reservation(i):
+            reservation = self.book(self.booker, 10_000 + i, "confirmed")
+            path = url("property:reservation-detail", reservation.pk)
+            return self.clients[self.booker], "patch", path, {"status": "cancelled"}
+
+        def cancel_reservation(i):
+            reservation = self.book(self.booker, 20_000 + i, "confirmed")
+            path = url("property:cancel-reservation", reservation.pk)
+            return self.clients[self.booker], "post", path, None
+
+        def confirm_reservation(i):
+            reservation = self.book(self.booker, 30_000 + i, "pending")
+            path = url("property:confirm-reservation", reservation.pk)
+            return host, "post", path, None
+
+        self.reviewed = []
+
+        def create_review(i):
+            prop = Property.objects.exclude(pk__in=self.reviewed).exclude(
+                pk=self.venue.pk
+            )[0]
+            self.reviewed.append(prop.pk)
+            check_in = today - timedelta(days=30)
+            Reservation.objects.create(
+                property=prop,
+                guest=self.reviewer,
+                check_in=check_in,
+                check_out=check_in + timedelta(days=2),
+                guests_count=1,
+                total_price=prop.price_per_night * 2,
+                status="completed",
+            )
+            path = url("property:property-reviews", prop.pk)
+            data = {"rating": 5, "comment": "Benchmark review"}
+            return self.clients[self.reviewer], "post", path, data
+
+        def add_to_wishlist(i):
+            property_id = self.popular[i % len(self.popular)]
+            Wishlist.objects.filter(user=self.wisher, property_id=property_id).delete()
+            data = {"property_id": str(property_id)}
+            return self.clients[self.wisher], "post", url("property:wishlist"), data
+
+        def bulk_wishlist(i):
+            ids = [str(pk) for pk in self.popular[i % 30 : i % 30 + 20]]
+            path = url("property:bulk-update-wishlist")
+            return self.clients[self.wisher], "post", path, {"add": ids}
+
+        def remove_from_wishlist(i):
+            property_id = self.popular[i % len(self.popular)]
+            Wishlist.objects.get_or_create(user=self.wisher, property_id=property_id)
+            path = url("property:remove-from-wishlist", property_id)
+            return self.clients[self.wisher], "delete", path, None
+
+        def update_profile(i):
+            data = {"bio": f"Benchmark bio {i}"}
+            return (
+                self.clients[self.account],
+                "patch",
+                url("useraccount:user-profile"),
+                data,
+            )
+
+        def register(i):
+            data = {
+                "email": f"benchmark-register-{i}@example.com",
+                "name": "Benchmark",
+                "password": "benchmark-password",
+                "password_confirm": "benchmark-password",
+            }
+            return anonymous, "post", url("useraccount:user-register"), data
+
+        def change_password(i):
+            self.account.set_password(f"benchmark-password-{i}")
+            self.account.save(update_fields=["password"])
+            data = {
+                "old_password": f"benchmark-password-{i}",
+                "new_password": f"benchmark-password-{i + 1}",
+                "new_password_confirm": f"benchmark-password-{i + 1}",
+            }
+            path = url("useraccount:change-password")
+            return self.clients[self.account], "post", path, data
+
+        def become_host(i):
+            path = url("useraccount:become-host")
+            return self.clients[self.account], "post", path, None
+
+        return [
+            # Properties
+            Scenario(
+                "property list (anonymous)",
+                "property-list-create",
+                get(anonymous, url("property:property-list-create")),
+            ),
+            Scenario(
+                "property list (guest)",
+                "property-list-create",
+                get(guest, url("property:property-list-create")),
+            ),
+            Scenario("property create", "property-list-create", create_property),
+            Scenario(
+                "property detail",
+                "property-detail",
+                rotating(guest, "property:property-detail", self.popular),
+            ),
+            Scenario("property update", "property-detail", update_property),
+            Scenario("property delete", "property-detail", delete_property),
+            Scenario(
+                "host properties",
+                "user-properties",
+                get(host, url("property:user-properties")),
+            ),
+            Scenario(
+                "search destination",
+                "property-search",
+                get(guest, f"{search}?destination=Paris"),
+            ),
+            Scenario(
+                "search dates and guests",
+                "property-search",
+                get(guest, f"{search}?destination=London&{stay}&guests=2"),
+            ),
+            Scenario(
+                "search facets",
+                "property-search",
+                get(guest, f"{search}?destination=Tokyo&facets=true"),
+            ),
+            Scenario(
+                "search radius",
+                "property-search",
+                get(guest, f"{search}?lat=48.8566&lng=2.3522&radius_km=5"),
+            ),
+            Scenario(
+                "map clusters",
+                "property-clusters",
+                get(
+                    anonymous,
+                    url("property:property-clusters") + "?bbox=2.2,48.8,2.5,48.95",
+                ),
+            ),
+            # Reservations
+            Scenario(
+                "reservation list",
+                "reservation-list",
+                get(guest, url("property:reservation-list")),
+            ),
+            Scenario("reservation create", "create-reservation", create_reservation),
+            Scenario(
+                "reservation detail",
+                "reservation-detail",
+                rotating(guest, "property:reservation-detail", self.guest_reservations),
+            ),
+            Scenario("reservation update", "reservation-detail", update_reservation),
+            Scenario("reservation cancel", "cancel-reservation", cancel_reservation),
+            Scenario("reservation confirm", "confirm-reservation", confirm_reservation),
+            # Exports
+            Scenario(
+                "export reservations",
+                "export-reservations",
+                get(host, url("property:export-reservations", "csv")),
+            ),
+            Scenario(
+                "export properties",
+                "export-properties",
+                get(host, url("property:export-properties", "ndjson")),
+            ),
+            # Host analytics
+            Scenario(
+                "host analytics",
+                "host-analytics",
+                get(host, url("property:host-analytics")),
+            ),
+            # Reviews
+            Scenario(
+                "review list",
+                "property-reviews",
+                rotating(anonymous, "property:property-reviews", self.popular),
+            ),
+            Scenario("review create", "property-reviews", create_review),
+            # Wishlist
+            Scenario(
+                "wishlist list",
+                "wishlist",
+                get(guest, url("property:wishlist")),
+            ),
+            Scenario("wishlist add", "wishlist", add_to_wishlist),
+            Scenario("wishlist bulk", "bulk-update-wishlist", bulk_wishlist),
+            Scenario("wishlist remove", "remove-from-wishlist", remove_from_wishlist),
+            # Accounts
+            Scenario(
+                "profile",
+                "user-profile",
+                get(self.clients[self.account], url("useraccount:user-profile")),
+            ),
+            Scenario("profile update", "user-profile", update_profile),
+            Scenario("register", "user-register", register),
+            Scenario("change password", "change-password", change_password),
+            Scenario("become host", "become-host", become_host),
+            Scenario(
+                "user stats", "user-stats", get(host, url("useraccount:user-stats"))
+            ),
+        ]
+
+    def check_coverage(self, scenarios):
+        """Return the names of API URLs that no scenario requests"""
+        covered = {scenario.url_name for scenario in scenarios}
+        return sorted(
+            pattern.name
+            for namespace in NAMESPACES
+            for pattern in import_module(f"{namespace}.urls").urlpatterns
+            if pattern.name not in covered
+        )
+
+    def measure(self, scenario, repeat, warmup):
+        timings, queries, sizes, statuses = [], [], [], Counter()
+        for i in range(warmup + repeat):
+            client, method, path, data = scenario.prepare(i)
+            if self.cold_cache:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                if data is None:
+                    response = getattr(client, method)(path)
+                else:
+                    response = getattr(client, method)(path, data, format="json")
+                if response.streaming:
+                    size = sum(len(chunk) for chunk in response.streaming_content)
+                else:
+                    size = len(response.content)
+                elapsed = time.perf_counter() - started
+            if i < warmup:
+                continue
+            timings.append(elapsed)
+            queries.append(len(captured))
+            sizes.append(size)
+            statuses[response.status_code] += 1
+        return summarize(timings, queries, sizes, statuses)
+
+    def run(self, repeat, warmup=2, report=None):
+        """Return ``{scenario name: figures}`` for every scenario"""
+        results = {}
+        for scenario in self.scenarios():
+            results[scenario.name] = self.measure(scenario, repeat, warmup)
+            results[scenario.name]["url_name"] = scenario.url_name
+            if report is not None:
+                report(scenario.name, results[scenario.name])
+        return results
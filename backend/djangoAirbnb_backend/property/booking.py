@@ -0,0 +1,76 @@
+"""
+Booking engine.
+
+Competing bookings for the same property are serialized on the property
+row (``SELECT ... FOR UPDATE``), and the unique ``(property, night)``
+constraint on ``BookedNight`` backs that up on every database. PostgreSQL
+additionally enforces a ``daterange`` exclusion constraint on reservations.
+A conflict is reported as HTTP 409 rather than a validation error.
+"""
+
+from django.db import IntegrityError, transaction
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from .models import BookedNight, Property, Reservation
+
+
+class BookingConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The property is already booked for some of these nights."
+    default_code = "booking_conflict"
+
+
+def validate_stay(property_obj, nights, guests_count):
+    if guests_count > property_obj.guests:
+        raise serializers.ValidationError(
+            f"Maximum {property_obj.guests} guests allowed."
+        )
+
+    if nights < property_obj.minimum_nights:
+        raise serializers.ValidationError(
+            f"Minimum stay is {property_obj.minimum_nights} nights."
+        )
+
+    if nights > property_obj.maximum_nights:
+        raise serializers.ValidationError(
+            f"Maximum stay is {property_obj.maximum_nights} nights."
+        )
+
+
+def create_reservation(property_id, check_in, check_out, guests_count, **fields):
+    """
+    Book ``property_id`` for ``[check_in, check_out)`` and return the
+    saved reservation, or raise ``BookingConflict`` if any night is taken.
+    """
+    nights = (check_out - check_in).days
+    with transaction.atomic():
+        try:
+            property_obj = Property.objects.select_for_update().get(pk=property_id)
+        except Property.DoesNotExist:
+            raise serializers.ValidationError("Property not found.")
+
+        validate_stay(property_obj, nights, guests_count)
+
+        if BookedNight.objects.filter(
+            property=property_obj, night__gte=check_in, night__lt=check_out
+        ).exists():
+            raise BookingConflict()
+
+        reservation = Reservation(
+            property=property_obj,
+            check_in=check_in,
+            check_out=check_out,
+            guests_count=guests_count,
+            total_price=property_obj.price_per_night * nights,
+            **fields,
+        )
+        try:
+            with transaction.atomic():
+                reservation.save()
+        except IntegrityError:
+            # Lost a race that the row lock could not prevent (e.g. SQLite,
+            # or a writer that bypassed this service).
+            raise BookingConflict()
+
+    return reservation
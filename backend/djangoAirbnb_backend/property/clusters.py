@@ -0,0 +1,281 @@
+"""
+Server-side map marker clustering.
+
+Each zoom level has its own grid whose cells are a quarter of a 256px map
+tile wide (about 64px on screen). ``MapCluster`` keeps a running count,
+coordinate sums (for the centroid) and the minimum price of the available
+properties in every non-empty cell, so serving a viewport only reads the
+handful of cells that fit on the screen.
+
+Property saves and deletes only queue their map point in
+``MapClusterChange``, one INSERT however many zoom levels there are.
+``update_map_clusters`` applies the queue in batches away from the request
+path: each batch adds up its changes per cell and writes every touched cell
+once. A cell whose minimum price may have left takes it from the four cells
+below it, or from the properties at the finest zoom, so the minimum is
+never re-read while a property is being saved.
+"""
+
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import (
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Min,
+    Q,
+    Sum,
+)
+from django.db.models.functions import Cast, Floor, Least
+
+from . import geo
+from .models import MapCluster, MapClusterChange, Property
+
+MAX_ZOOM = 14
+CELLS_PER_TILE = 4
+CLUSTER_PIXELS = 64
+
+
+def cell_degrees(zoom):
+    return 360 / (CELLS_PER_TILE * 2**zoom)
+
+
+def columns(zoom):
+    return CELLS_PER_TILE * 2**zoom
+
+
+def _row(lat, zoom):
+    rows = columns(zoom) // 2
+    return min(max(int((lat + 90) / cell_degrees(zoom)), 0), rows - 1)
+
+
+def _column(lng, zoom):
+    return min(max(int((lng + 180) / cell_degrees(zoom)), 0), columns(zoom) - 1)
+
+
+def cell_for(lat, lng, zoom):
+    return _row(lat, zoom) * columns(zoom) + _column(lng, zoom)
+
+
+def cell_bounds(cell, zoom):
+    """Return ``(min_lat, min_lng, max_lat, max_lng)`` for a cell"""
+    size = cell_degrees(zoom)
+    row, column = divmod(cell, columns(zoom))
+    min_lat, min_lng = row * size - 90, column * size - 180
+    return min_lat, min_lng, min_lat + size, min_lng + size
+
+
+def zoom_for_viewport(min_lat, min_lng, max_lat, max_lng, width_px):
+    """
+    Pick the zoom whose cells are about CLUSTER_PIXELS wide on screen. The
+    longer of the two spans decides, so a viewport never covers more than
+    ``width_px / CLUSTER_PIXELS`` cells (plus the partial ones at its edges)
+    in either direction.
+    """
+    span = max((max_lng - min_lng) % 360 or 360, max_lat - min_lat)
+    target = span * CLUSTER_PIXELS / max(width_px, CLUSTER_PIXELS)
+    zoom = math.floor(math.log2(360 / (CELLS_PER_TILE * target)))
+    return min(max(zoom, 0), MAX_ZOOM)
+
+
+def queue_change(old_point, new_point, using=None):
+    """
+    Queue moving one property's contribution from ``old_point`` to
+    ``new_point``. Either may be None (not on the map).
+    """
+    if old_point == new_point:
+        return
+    changes = [
+        MapClusterChange(latitude=lat, longitude=lng, price=price, delta=delta)
+        for point, delta in ((old_point, -1), (new_point, 1))
+        if point is not None
+        for lat, lng, price in [point]
+    ]
+    MapClusterChange.objects.using(using).bulk_create(changes)
+
+
+def _child_cells(cell, zoom):
+    """The four cells at ``zoom + 1`` that make up ``cell``"""
+    row, column = divmod(cell, columns(zoom))
+    return [
+        (2 * row + i) * columns(zoom + 1) + 2 * column + j
+        for i in (0, 1)
+        for j in (0, 1)
+    ]
+
+
+def _min_price(zoom, cell):
+    if zoom == MAX_ZOOM:
+        properties = geo.filter_bbox(
+            Property.objects.filter(is_available=True), *cell_bounds(cell, zoom)
+        )
+        return properties.aggregate(min_price=Min("price_per_night"))["min_price"]
+    return MapCluster.objects.filter(
+        zoom=zoom + 1, cell__in=_child_cells(cell, zoom)
+    ).aggregate(min_price=Min("min_price"))["min_price"]
+
+
+def _apply_batch(changes):
+    # (zoom, cell) -> [count, latitude sum, longitude sum, lowest added
+    # price, lowest removed price]
+    deltas = defaultdict(lambda: [0, 0.0, 0.0, None, None])
+    for change in changes:
+        for zoom in range(MAX_ZOOM + 1):
+            delta = deltas[zoom, cell_for(change.latitude, change.longitude, zoom)]
+            delta[0] += change.delta
+            delta[1] += change.delta * change.latitude
+            delta[2] += change.delta * change.longitude
+            slot = 3 if change.delta > 0 else 4
+            if delta[slot] is None or change.price < delta[slot]:
+                delta[slot] = change.price
+
+    # Finest zoom first, so coarser cells can take their minimum from the
+    # cells below them
+    for zoom in range(MAX_ZOOM, -1, -1):
+        cells = {cell: delta for (z, cell), delta in deltas.items() if z == zoom}
+        existing = {
+            cluster.cell: cluster
+            for cluster in MapCluster.objects.select_for_update().filter(
+                zoom=zoom, cell__in=cells
+            )
+        }
+        created, updated, emptied = [], [], []
+        for cell, (count, latitude_sum, longitude_sum, added, removed) in cells.items():
+            cluster = existing.get(cell) or MapCluster(
+                zoom=zoom, cell=cell, latitude_sum=0, longitude_sum=0
+            )
+            cluster.count += count
+            if cluster.count <= 0:
+                if cluster.pk is not None:
+                    emptied.append(cluster.pk)
+                continue
+            cluster.latitude_sum += latitude_sum
+            cluster.longitude_sum += longitude_sum
+            cluster.min_price = min(
+                price for price in (cluster.min_price, added) if price is not None
+            )
+            # A minimum cannot be decremented; re-read it if it went away.
+            if removed is not None and removed <= cluster.min_price:
+                min_price = _min_price(zoom, cell)
+                if min_price is not None:
+                    cluster.min_price = min_price
+            (updated if cluster.pk is not None else created).append(cluster)
+        MapCluster.objects.filter(pk__in=emptied).delete()
+        MapCluster.objects.bulk_update(
+            updated, ["count", "latitude_sum", "longitude_sum", "min_price"]
+        )
+        MapCluster.objects.bulk_create(created)
+
+
+def apply_queued(batch_size=1000):
+    """
+    Apply the queued changes ``batch_size`` at a time, each batch in a
+    transaction of its own; return how many were applied.
+    """
+    applied = 0
+    while True:
+        with transaction.atomic():
+            changes = list(
+                MapClusterChange.objects.select_for_update(skip_locked=True).order_by(
+                    "pk"
+                )[:batch_size]
+            )
+            if not changes:
+                return applied
+            _apply_batch(changes)
+            MapClusterChange.objects.filter(
+                pk__in=[change.pk for change in changes]
+            ).delete()
+        applied += len(changes)
+
+
+def _cells_q(zoom, min_lat, min_lng, max_lat, max_lng):
+    if min_lng > max_lng:
+        return _cells_q(zoom, min_lat, min_lng, max_lat, 180) | _cells_q(
+            zoom, min_lat, -180, max_lat, max_lng
+        )
+    first_row, last_row = _row(min_lat, zoom), _row(max_lat, zoom)
+    first_column, last_column = _column(min_lng, zoom), _column(max_lng, zoom)
+    if last_row - first_row + 1 > geo.MAX_ROW_RANGES:
+        # One range over the rows, with the columns checked on each cell
+        return Q(
+            cell__range=(
+                first_row * columns(zoom) + first_column,
+                last_row * columns(zoom) + last_column,
+            ),
+            column__range=(first_column, last_column),
+        )
+    cells = Q()
+    for row in range(first_row, last_row + 1):
+        cells |= Q(
+            cell__range=(
+                row * columns(zoom) + first_column,
+                row * columns(zoom) + last_column,
+            )
+        )
+    return cells
+
+
+def clusters_in_viewport(zoom, min_lat, min_lng, max_lat, max_lng):
+    clusters = MapCluster.objects.annotate(column=F("cell") % columns(zoom)).filter(
+        _cells_q(zoom, min_lat, min_lng, max_lat, max_lng), zoom=zoom, count__gt=0
+    )
+    return [
+        {
+            "latitude": round(cluster.latitude_sum / cluster.count, 6),
+            "longitude": round(cluster.longitude_sum / cluster.count, 6),
+            "count": cluster.count,
+            "min_price": str(cluster.min_price),
+        }
+        for cluster in clusters
+    ]
+
+
+def rebuild(batch_size=5000):
+    """Recompute every zoom level from scratch with grouped aggregates"""
+    with transaction.atomic():
+        # Queued changes are already in the properties read below
+        MapClusterChange.objects.all().delete()
+        MapCluster.objects.all().delete()
+        properties = Property.objects.filter(
+            is_available=True, latitude__isnull=False, longitude__isnull=False
+        ).annotate(
+            lat=Cast("latitude", FloatField()), lng=Cast("longitude", FloatField())
+        )
+        for zoom in range(MAX_ZOOM + 1):
+            size = cell_degrees(zoom)
+            cells = (
+                properties.annotate(
+                    cell=ExpressionWrapper(
+                        Least(Floor((F("lat") + 90) / size), columns(zoom) // 2 - 1)
+                        * columns(zoom)
+                        + Least(Floor((F("lng") + 180) / size), columns(zoom) - 1),
+                        output_field=FloatField(),
+                    )
+                )
+                .order_by()
+                .values("cell")
+                .annotate(
+                    count=Count("pk"),
+                    latitude_sum=Sum("lat"),
+                    longitude_sum=Sum("lng"),
+                    min_price=Min("price_per_night"),
+                )
+            )
+            MapCluster.objects.bulk_create(
+                (
+                    MapCluster(
+                        zoom=zoom,
+                        cell=int(row["cell"]),
+                        count=row["count"],
+                        latitude_sum=row["latitude_sum"],
+                        longitude_sum=row["longitude_sum"],
+                        min_price=row["min_price"],
+                    )
+                    for row in cells.iterator()
+                ),
+                batch_size=batch_size,
+            )
@@ -0,0 +1,80 @@
+"""
+Conditional requests.
+
+Validators are computed without serializing anything. Property detail and
+review pages use the property's stored ``version`` and ``updated_at``; list
+pages use the response cache generations they are cached under (see
+property.response_cache). Matching ``If-None-Match``/``If-Modified-Since``
+requests get a 304, and writes honour ``If-Match``/``If-Unmodified-Since``.
+"""
+
+import hashlib
+import json
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import Property
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The property has changed since it was fetched."
+    default_code = "precondition_failed"
+
+
+def make_etag(*parts):
+    payload = json.dumps(parts, default=str, separators=(",", ":"))
+    return '"%s"' % hashlib.sha1(payload.encode()).hexdigest()
+
+
+def property_validators(property_id, lock=False):
+    """
+    Return ``(version, updated_at)`` for a property, or None if it does not
+    exist. With ``lock`` the row stays locked until the transaction ends.
+    """
+    properties = Property.objects.filter(pk=property_id)
+    if lock:
+        properties = properties.select_for_update()
+    return properties.values_list("version", "updated_at").first()
+
+
+async def aproperty_validators(property_id):
+    """``property_validators`` for async views"""
+    return (
+        await Property.objects.filter(pk=property_id)
+        .values_list("version", "updated_at")
+        .afirst()
+    )
+
+
+def _timestamp(last_modified):
+    return int(last_modified.timestamp()) if last_modified else None
+
+
+def set_validators(response, etag, last_modified=None):
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(_timestamp(last_modified))
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return a 304 (or 412) response if the request's conditions say so"""
+    response = get_conditional_response(
+        request, etag=etag, last_modified=_timestamp(last_modified)
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def check_preconditions(request, etag, last_modified=None):
+    """Raise PreconditionFailed if a write's preconditions do not hold"""
+    response = get_conditional_response(
+        request, etag=etag, last_modified=_timestamp(last_modified)
+    )
+    if response is not None:
+        raise PreconditionFailed()
@@ -0,0 +1,126 @@
+"""
+Search facets.
+
+All facets come from one grouped query over the filtered properties: rows
+are grouped by price bucket (which gives the histogram) and every other
+facet is a conditional count within the bucket, summed up in Python.
+Results are cached under a key derived from the normalized filter set and
+the listing generations, so writes invalidate them like cached responses.
+"""
+
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, Q
+from django.db.models.functions import Cast, Floor, Least
+from django.db.models.lookups import Exact
+
+from . import response_cache
+from .models import Amenity, Property
+
+FACETS_CACHE_TIMEOUT = 60
+MAX_PRICE_BUCKETS = 50
+
+GUEST_BUCKETS = [("1-2", 1, 2), ("3-4", 3, 4), ("5-6", 5, 6), ("7+", 7, None)]
+
+# Parameters that change the page, not the result set
+NON_FILTER_PARAMS = {"facets", "price_bucket", "stream"}
+
+
+def cache_key(filters, price_bucket):
+    normalized = {
+        name: value
+        for name, value in filters.items()
+        if name not in NON_FILTER_PARAMS and value not in (None, "", [])
+    }
+    if "amenities" in normalized:
+        normalized["amenities"] = sorted(
+            {Amenity.normalize(name) for name in normalized["amenities"]}
+        )
+    if "lat" not in normalized:
+        normalized.pop("radius_km", None)
+    generations = response_cache.get_generations(
+        response_cache.listing_generations(
+            normalized.get("check_in"), normalized.get("check_out")
+        )
+    )
+    payload = json.dumps(
+        [normalized, price_bucket, generations],
+        sort_keys=True,
+        default=str,
+        separators=(",", ":"),
+    )
+    return "property-facets:" + hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _guest_q(low, high):
+    if high is None:
+        return Q(guests__gte=low)
+    return Q(guests__gte=low, guests__lte=high)
+
+
+def compute(queryset, price_bucket):
+    amenities = list(Amenity.objects.filter(bit__isnull=False))
+    aggregates = {"total": Count("pk")}
+    for value, _ in Property.PROPERTY_TYPES:
+        aggregates[f"type:{value}"] = Count("pk", filter=Q(property_type=value))
+    for label, low, high in GUEST_BUCKETS:
+        aggregates[f"guests:{label}"] = Count("pk", filter=_guest_q(low, high))
+    for amenity in amenities:
+        has_amenity = Exact(F("amenity_mask").bitand(amenity.mask), amenity.mask)
+        aggregates[f"amenity:{amenity.pk}"] = Count("pk", filter=has_amenity)
+
+    rows = (
+        queryset.order_by()
+        .annotate(
+            price_bucket=Least(
+                Cast(Floor(F("price_per_night") / price_bucket), IntegerField()),
+                MAX_PRICE_BUCKETS - 1,
+            )
+        )
+        .values("price_bucket")
+        .annotate(**aggregates)
+    )
+
+    totals = dict.fromkeys(aggregates, 0)
+    histogram = []
+    for row in rows:
+        for key in aggregates:
+            totals[key] += row[key]
+        bucket = int(row["price_bucket"])
+        histogram.append(
+            {
+                "min": bucket * price_bucket,
+                "max": (
+                    None
+                    if bucket == MAX_PRICE_BUCKETS - 1
+                    else (bucket + 1) * price_bucket
+                ),
+                "count": row["total"],
+            }
+        )
+    histogram.sort(key=lambda bucket: bucket["min"])
+
+    return {
+        "total": totals["total"],
+        "property_type": {
+            value: totals[f"type:{value}"] for value, _ in Property.PROPERTY_TYPES
+        },
+        "guests": {label: totals[f"guests:{label}"] for label, _, _ in GUEST_BUCKETS},
+        "amenities": {
+            amenity.name: totals[f"amenity:{amenity.pk}"]
+            for amenity in amenities
+            if totals[f"amenity:{amenity.pk}"]
+        },
+        "price_histogram": histogram,
+    }
+
+
+def get_facets(queryset, filters, price_bucket):
+    key = cache_key(filters, price_bucket)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute(queryset, price_bucket)
+        cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
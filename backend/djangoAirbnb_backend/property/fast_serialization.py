@@ -0,0 +1,149 @@
+"""
+Read-only fast path for property lists.
+
+``PropertyListSerializer`` instantiates a model per row and walks the nested
+host and image serializers field by field. ``serialize_properties`` builds
+the same representation from ``.values()`` rows instead: the host comes from
+the same query through a join, images from one extra query grouped by
+property, and only decimals go through the DRF fields' own conversion. The
+``benchmark_list_serialization`` command checks that both paths render
+byte-identical JSON.
+"""
+
+from collections import defaultdict
+from functools import cache
+
+from django.contrib.auth import get_user_model
+
+from .models import PropertyImage, split_amenities
+from .serializers import PropertyListSerializer
+
+User = get_user_model()
+
+PROPERTY_FIELDS = [
+    "id",
+    "title",
+    "location",
+    "price_per_night",
+    "guests",
+    "bedrooms",
+    "bathrooms",
+    "property_type",
+    "average_rating",
+    "review_count",
+    "amenities",
+    "is_available",
+    # Not rendered, but keyset pagination reads it from the row
+    "created_at",
+]
+HOST_FIELDS = ["id", "name", "email", "avatar", "bio", "is_host"]
+IMAGE_FIELDS = ["id", "property_id", "image", "caption", "is_primary", "order"]
+
+
+@cache
+def _decimal_fields():
+    fields = PropertyListSerializer().fields
+    return (
+        fields["price_per_night"].to_representation,
+        fields["average_rating"].to_representation,
+    )
+
+
+def _file_url(storage, name, request):
+    # What DRF's FileField renders for a stored file name
+    if not name:
+        return None
+    url = storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def property_rows(queryset):
+    """Return ``.values()`` rows with everything ``serialize_properties`` reads"""
+    return queryset.values(
+        *PROPERTY_FIELDS,
+        *(f"host__{name}" for name in HOST_FIELDS),
+        # Annotations such as search_rank and distance are ordering keys
+        *queryset.query.annotation_select,
+    )
+
+
+def _image_rows(property_ids):
+    return (
+        PropertyImage.objects.filter(property_id__in=property_ids)
+        .order_by("order", "id")
+        .values_list(*IMAGE_FIELDS)
+    )
+
+
+def _images_by_property(rows, request):
+    storage = PropertyImage._meta.get_field("image").storage
+    images = defaultdict(list)
+    for pk, property_id, name, caption, is_primary, order in rows:
+        images[property_id].append(
+            {
+                "id": pk,
+                "image": _file_url(storage, name, request),
+                "caption": caption,
+                "is_primary": is_primary,
+                "order": order,
+            }
+        )
+    return images
+
+
+def serialize_properties(rows, request=None, wishlisted_ids=frozenset()):
+    """Render ``property_rows`` the way ``PropertyListSerializer`` does"""
+    rows = list(rows)
+    image_rows = _image_rows([row["id"] for row in rows])
+    return _serialize(
+        rows, _images_by_property(image_rows, request), request, wishlisted_ids
+    )
+
+
+async def aserialize_properties(rows, request=None, wishlisted_ids=frozenset()):
+    """``serialize_properties`` for async views"""
+    image_rows = [image async for image in _image_rows([row["id"] for row in rows])]
+    return _serialize(
+        rows, _images_by_property(image_rows, request), request, wishlisted_ids
+    )
+
+
+def _serialize(rows, images, request, wishlisted_ids):
+    price, rating = _decimal_fields()
+    avatar_storage = User._meta.get_field("avatar").storage
+
+    hosts = {}
+    data = []
+    for row in rows:
+        host = hosts.get(row["host__id"])
+        if host is None:
+            host = hosts[row["host__id"]] = {
+                "id": row["host__id"],
+                "name": row["host__name"],
+                "email": row["host__email"],
+                "avatar": _file_url(avatar_storage, row["host__avatar"], request),
+                "bio": row["host__bio"],
+                "is_host": row["host__is_host"],
+            }
+        data.append(
+            {
+                "id": str(row["id"]),
+                "title": row["title"],
+                "location": row["location"],
+                "price_per_night": price(row["price_per_night"]),
+                "guests": row["guests"],
+                "bedrooms": row["bedrooms"],
+                "bathrooms": row["bathrooms"],
+                "property_type": row["property_type"],
+                "average_rating": rating(row["average_rating"]),
+                "review_count": row["review_count"],
+                "images": images.get(row["id"], []),
+                "host": host,
+                "amenities_list": split_amenities(row["amenities"]),
+                "is_available": row["is_available"],
+                "is_wishlisted": row["id"] in wishlisted_ids,
+            }
+        )
+    return data
@@ -0,0 +1,93 @@
+"""
+Reservation lifecycle: expire stale holds and complete past stays.
+
+Reservations are created ``pending`` and hold their nights until the host
+confirms them (``confirm_reservation``) or the guest cancels them, and only
+``completed`` stays can be reviewed.
+``sweep`` moves them on: pending holds older than
+RESERVATION_HOLD_MINUTES become ``expired`` and release their nights,
+confirmed stays become ``completed`` on their check-out day.
+
+Every transition is a set-based ``UPDATE ... WHERE pk IN (...)`` of at most
+``batch_size`` rows in a short transaction of its own, so a backlog of
+millions of rows goes through without long locks. The rows of a batch are
+locked first (on PostgreSQL, skipping rows another transaction holds), so
+a concurrent confirmation or cancellation happens either before or after
+the batch, never in the middle of it.
+
+Queryset updates send no ``post_save``. The batch therefore deletes the
+booked nights it releases and sets ``updated_at`` for the analytics
+watermark itself. ``status_changed`` is then sent inside its transaction
+for the rest: availability responses and the hosts' completed bookings.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import BookedNight, Reservation
+
+# Sent with reservation_ids, old_status, new_status and using after a batch
+# of reservations changed status with a queryset update
+status_changed = Signal()
+
+
+def transition(old_status, new_status, condition, batch_size=1000):
+    """
+    Move the ``old_status`` reservations matching ``condition`` to
+    ``new_status``, ``batch_size`` at a time; return how many moved.
+    """
+    using = router.db_for_write(Reservation)
+    reservations = Reservation.objects.using(using)
+    moved = 0
+    while True:
+        with transaction.atomic(using=using):
+            reservation_ids = list(
+                reservations.select_for_update(skip_locked=True)
+                .filter(condition, status=old_status)
+                .order_by()
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not reservation_ids:
+                return moved
+            reservations.filter(pk__in=reservation_ids).update(
+                status=new_status, updated_at=timezone.now()
+            )
+            if new_status not in Reservation.BLOCKING_STATUSES:
+                BookedNight.objects.using(using).filter(
+                    reservation_id__in=reservation_ids
+                ).delete()
+            status_changed.send(
+                sender=Reservation,
+                reservation_ids=reservation_ids,
+                old_status=old_status,
+                new_status=new_status,
+                using=using,
+            )
+        moved += len(reservation_ids)
+
+
+def hold_cutoff(now=None):
+    """Pending holds created before this have lapsed"""
+    return (now or timezone.now()) - timedelta(
+        minutes=settings.RESERVATION_HOLD_MINUTES
+    )
+
+
+def sweep(now=None, batch_size=1000):
+    """Return ``(expired, completed)``: how many holds and stays moved on"""
+    now = now or timezone.now()
+    expired = transition(
+        "pending", "expired", Q(created_at__lt=hold_cutoff(now)), batch_size=batch_size
+    )
+    completed = transition(
+        "confirmed",
+        "completed",
+        Q(check_out__lte=timezone.localdate(now)),
+        batch_size=batch_size,
+    )
+    return expired, completed
@@ -0,0 +1,124 @@
+import json
+import platform
+from datetime import date
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.utils import timezone
+from property.benchmarks import APIBenchmark
+from property.synthetic import Generator
+
+BENCHMARK_SETTINGS = {
+    # Never share cache entries or generations with a running site
+    "CACHES": {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "api-benchmark",
+        }
+    },
+    # Password hashing is deliberately slow and would drown everything else
+    "PASSWORD_HASHERS": ["django.contrib.auth.hashers.MD5PasswordHasher"],
+    # Repeating a scenario would run into the throttles
+    "REST_FRAMEWORK": {**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a synthetic data set into a throwaway test database, request "
+        "every API URL and record latency percentiles, queries and bytes per "
+        "request (see property.benchmarks). Runs on the configured database "
+        "engine, so SQLite or PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--properties", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--repeat", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument(
+            "--warm-cache",
+            action="store_true",
+            help="Keep the response cache between requests (default: cleared)",
+        )
+        parser.add_argument("--output", help="Write the results to this JSON file")
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 2:
+            raise CommandError("--repeat must be at least 2.")
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with override_settings(**BENCHMARK_SETTINGS):
+                self.load(options)
+                results = self.benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["output"]:
+            baseline = {
+                "meta": {
+                    "created_at": timezone.now().isoformat(),
+                    "database": connection.vendor,
+                    "properties": options["properties"],
+                    "seed": options["seed"],
+                    "repeat": options["repeat"],
+                    "warm_cache": options["warm_cache"],
+                    "python": platform.python_version(),
+                    "django": django.get_version(),
+                },
+                "scenarios": results,
+            }
+            with open(options["output"], "w") as f:
+                json.dump(baseline, f, indent=2)
+                f.write("\n")
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def load(self, options):
+        count = options["properties"]
+        generator = Generator(
+            seed=options["seed"],
+            hosts=max(1, count // 5),
+            guests=count * 2,
+            properties=count,
+            reservations=count * 10,
+            wishlists=count * 2,
+            today=date.today(),
+        )
+        generator.create_users()
+        for chunk in range(generator.chunk_count):
+            generator.write_chunk(chunk)
+        generator.finish()
+        self.stdout.write(f"Loaded {count} synthetic properties")
+
+    def benchmark(self, options):
+        benchmark = APIBenchmark(cold_cache=not options["warm_cache"])
+        benchmark.setup()
+        missing = benchmark.check_coverage(benchmark.scenarios())
+        if missing:
+            raise CommandError(f"No benchmark scenario for: {', '.join(missing)}")
+
+        self.stdout.write(
+            f"{'scenario':28} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'queries':>7} {'bytes':>9}  statuses"
+        )
+        return benchmark.run(options["repeat"], options["warmup"], report=self.report)
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:28} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f} "
+            f"{result['p99_ms']:8.2f} {result['queries']:7g} {result['bytes']:9.0f}  "
+            + " ".join(f"{code}x{n}" for code, n in result["statuses"].items())
+        )
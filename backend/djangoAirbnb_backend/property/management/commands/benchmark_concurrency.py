@@ -0,0 +1,326 @@
+import asyncio
+import io
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+from property.models import Property, Wishlist
+
+from . import benchmark_api
+
+User = get_user_model()
+
+
+def percentile(timings, percent):
+    cuts = statistics.quantiles(timings, n=100, method="inclusive")
+    return round(cuts[percent - 1] * 1000, 1)
+
+
+class Command(benchmark_api.Command):
+    help = (
+        "Compare a fixed pool of WSGI workers with the ASGI event loop when "
+        "many slow clients request property detail, search, reviews and the "
+        "wishlist at once. Both servers run in this process: every client "
+        "takes --latency seconds to send its request and as long again to "
+        "read the response. A sync worker is held for all of it, while the "
+        "event loop only needs a thread while a view waits on the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--properties", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--clients",
+            default="100,250,500,1000",
+            help="Comma separated numbers of concurrent clients",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=1, help="Requests per client"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=8, help="WSGI worker threads"
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.1,
+            help="Seconds a client takes to send a request and to read a response",
+        )
+        parser.add_argument("--output", help="Write the results to this JSON file")
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(n) for n in options["clients"].split(",")]
+        except ValueError:
+            raise CommandError("--clients must be comma separated numbers.")
+        if options["requests"] < 1 or options["workers"] < 1 or min(levels) < 1:
+            raise CommandError("--clients, --requests and --workers must be positive.")
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with override_settings(**benchmark_api.BENCHMARK_SETTINGS):
+                self.load(options)
+                urls = self.request_urls()
+                results = self.benchmark_levels(levels, urls, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(
+                    {
+                        "meta": {
+                            "database": connection.vendor,
+                            "properties": options["properties"],
+                            "requests_per_client": options["requests"],
+                            "workers": options["workers"],
+                            "latency": options["latency"],
+                        },
+                        "results": results,
+                    },
+                    f,
+                    indent=2,
+                )
+                f.write("\n")
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def request_urls(self):
+        """Return ``(path, query, token)`` for the endpoints, in rotation"""
+        guest = User.objects.filter(is_host=False).order_by("pk").first()
+        token = str(RefreshToken.for_user(guest).access_token)
+        property_ids = list(
+            Property.objects.order_by("-review_count").values_list("pk", flat=True)[:50]
+        )
+        if not Wishlist.objects.filter(user=guest).exists():
+            Wishlist.objects.bulk_create(
+                Wishlist(user=guest, property_id=pk) for pk in property_ids[:10]
+            )
+        urls = []
+        for i, pk in enumerate(property_ids):
+            urls += [
+                (reverse("property:property-detail", args=[pk]), "", token),
+                (reverse("property:property-reviews", args=[pk]), "", token),
+                (reverse("property:property-search"), f"guests={i % 6 + 1}", token),
+                (reverse("property:wishlist"), "", token),
+            ]
+        return urls
+
+    def benchmark_levels(self, levels, urls, options):
+        self.stdout.write(
+            f"{'server':6} {'clients':>7} {'req/s':>8} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'p99 ms':>8} {'errors':>6} {'threads':>7}"
+        )
+        wsgi = get_wsgi_application()
+        asgi = get_asgi_application()
+        results = []
+        for clients in levels:
+            for server, run in [
+                ("wsgi", lambda: self.run_wsgi(wsgi, clients, urls, options)),
+                (
+                    "asgi",
+                    lambda: asyncio.run(self.run_asgi(asgi, clients, urls, options)),
+                ),
+            ]:
+                with ThreadCounter() as threads:
+                    started = time.perf_counter()
+                    timings, errors = run()
+                    elapsed = time.perf_counter() - started
+                result = {
+                    "server": server,
+                    "clients": clients,
+                    "requests": len(timings),
+                    "throughput": round(len(timings) / elapsed, 1),
+                    "p50_ms": percentile(timings, 50),
+                    "p95_ms": percentile(timings, 95),
+                    "p99_ms": percentile(timings, 99),
+                    "errors": errors,
+                    "peak_threads": threads.peak,
+                }
+                self.report(result)
+                results.append(result)
+        return results
+
+    def report(self, result):
+        self.stdout.write(
+            f"{result['server']:6} {result['clients']:7} "
+            f"{result['throughput']:8.1f} {result['p50_ms']:8.1f} "
+            f"{result['p95_ms']:8.1f} {result['p99_ms']:8.1f} "
+            f"{result['errors']:6} {result['peak_threads']:7}"
+        )
+
+    def run_wsgi(self, application, clients, urls, options):
+        """
+        Every client queues for one of the worker threads, which then spends
+        the client's latency on both sides of the request.
+        """
+        latency = options["latency"]
+        timings, errors = [], 0
+        lock = threading.Lock()
+        done = threading.Event()
+        remaining = clients * options["requests"]
+        urls = cycle(urls)
+
+        def serve(path, query, token, queued_at):
+            time.sleep(latency)
+            environ = wsgi_environ(path, query, token)
+            statuses = []
+            response = application(
+                environ, lambda status, headers: statuses.append(status)
+            )
+            try:
+                for chunk in response:
+                    pass
+            finally:
+                if hasattr(response, "close"):
+                    response.close()
+            time.sleep(latency)
+            return statuses[0], time.perf_counter() - queued_at
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+
+            def submit(left):
+                with lock:
+                    path, query, token = next(urls)
+                future = pool.submit(serve, path, query, token, time.perf_counter())
+                future.add_done_callback(lambda future: finished(future, left))
+
+            def finished(future, left):
+                nonlocal errors, remaining
+                status, elapsed = future.result()
+                with lock:
+                    timings.append(elapsed)
+                    errors += not status.startswith("200")
+                    remaining -= 1
+                    if not remaining:
+                        done.set()
+                if left > 1:
+                    submit(left - 1)
+
+            for _ in range(clients):
+                submit(options["requests"])
+            done.wait()
+        return timings, errors
+
+    async def run_asgi(self, application, clients, urls, options):
+        """Every client is a coroutine; its latency is spent on the event loop"""
+        latency = options["latency"]
+        timings, errors = [], 0
+        urls = cycle(urls)
+
+        async def request(path, query, token):
+            status = None
+            finished = asyncio.Event()
+            received = False
+
+            async def receive():
+                nonlocal received
+                if not received:
+                    received = True
+                    await asyncio.sleep(latency)
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await finished.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                elif not message.get("more_body"):
+                    await asyncio.sleep(latency)
+                    finished.set()
+
+            await application(asgi_scope(path, query, token), receive, send)
+            return status
+
+        async def client():
+            nonlocal errors
+            for _ in range(options["requests"]):
+                started = time.perf_counter()
+                status = await request(*next(urls))
+                timings.append(time.perf_counter() - started)
+                errors += status != 200
+
+        await asyncio.gather(*(client() for _ in range(clients)))
+        return timings, errors
+
+
+def wsgi_environ(path, query, token):
+    return {
+        "REQUEST_METHOD": "GET",
+        "SCRIPT_NAME": "",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "SERVER_NAME": "testserver",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": "127.0.0.1",
+        "HTTP_HOST": "testserver",
+        "HTTP_AUTHORIZATION": f"Bearer {token}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+
+
+def asgi_scope(path, query, token):
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [
+            (b"host", b"testserver"),
+            (b"authorization", f"Bearer {token}".encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+
+
+class ThreadCounter:
+    """Record the most threads alive at once while the block runs"""
+
+    def __enter__(self):
+        self.peak = threading.active_count()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def sample(self):
+        while not self.stopped.wait(0.01):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
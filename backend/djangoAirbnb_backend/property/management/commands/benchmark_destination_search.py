@@ -0,0 +1,109 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from property import search
+from property.models import Property
+
+User = get_user_model()
+
+# 20 x 20 synthetic town names, so a destination matches ~0.25% of rows.
+TOWN_PREFIXES = (
+    "North South East West Lake River Stone Oak Pine Rose "
+    "Iron Silver Gold Green Red Fair Bright Clear High Low"
+).split()
+TOWN_SUFFIXES = (
+    "port field ford haven bridge wood dale ton bury mouth "
+    "view gate hill brook side well stead worth moor shire"
+).split()
+COUNTRIES = ["France", "Portugal", "United States", "Japan", "Iceland"]
+WORDS = (
+    "cozy modern sunny quiet spacious historic "
+    "loft cabin garden terrace harbour mountain"
+).split()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare icontains destination filtering with the full-text index "
+        "on synthetic properties (all rows are rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--terms",
+            nargs="+",
+            default=["Northport", "silverbrook", "Greenhaven Japan"],
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.populate(options["count"], options["seed"])
+                for term in options["terms"]:
+                    self.compare(term, options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def populate(self, count, seed):
+        rng = random.Random(seed)
+        host = User.objects.create_user(
+            email=f"benchmark-{seed}@example.com", password=None, name="Benchmark"
+        )
+        batch = []
+        for i in range(count):
+            batch.append(
+                Property(
+                    title=" ".join(rng.sample(WORDS, 3)).title(),
+                    description=" ".join(rng.choices(WORDS, k=30)),
+                    location=(
+                        f"{rng.choice(TOWN_PREFIXES)}{rng.choice(TOWN_SUFFIXES)}, "
+                        f"{rng.choice(COUNTRIES)}"
+                    ),
+                    address=f"{i} Benchmark Street",
+                    price_per_night=rng.randint(30, 600),
+                    amenities="",
+                    host=host,
+                )
+            )
+            if len(batch) == 5000:
+                Property.objects.bulk_create(batch)
+                batch = []
+        Property.objects.bulk_create(batch)
+
+        started = time.perf_counter()
+        search.rebuild_index()
+        self.stdout.write(
+            f"Indexed {count} properties in {time.perf_counter() - started:.2f}s"
+        )
+
+    def compare(self, term, repeat):
+        icontains = Property.objects.filter(
+            Q(location__icontains=term)
+            | Q(title__icontains=term)
+            | Q(description__icontains=term)
+        )
+        indexed = search.filter_by_destination(Property.objects.all(), term)
+        for label, queryset in (("icontains", icontains), ("full-text", indexed)):
+            timings, rows = [], 0
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.order_by()[:20].values_list("pk"))
+                rows = queryset.count()
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"{term!r:20} {label:10} {rows:8} rows  "
+                f"median {statistics.median(timings):8.2f} ms"
+            )
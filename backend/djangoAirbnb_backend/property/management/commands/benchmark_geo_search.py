@@ -0,0 +1,124 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from property import geo
+from property.models import Property
+
+User = get_user_model()
+
+# (lat, lng, spread in degrees) for clustered synthetic listings
+CLUSTERS = [
+    (48.8566, 2.3522, 0.15),  # Paris
+    (40.7128, -74.0060, 0.2),  # New York
+    (35.6762, 139.6503, 0.25),  # Tokyo
+    (-33.8688, 151.2093, 0.2),  # Sydney
+    (38.7223, -9.1393, 0.1),  # Lisbon
+    (-22.9068, -43.1729, 0.15),  # Rio de Janeiro
+]
+
+VIEWPORTS = {
+    "Paris street": (48.85, 2.33, 48.87, 2.37),
+    "Paris city": (48.80, 2.25, 48.92, 2.45),
+    "Northern France": (47.0, -1.0, 51.0, 5.0),
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare grid-cell map queries with a plain coordinate scan on "
+        "synthetic clustered properties (all rows are rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.populate(options["count"], options["seed"])
+                for label, bbox in VIEWPORTS.items():
+                    self.compare_bbox(label, bbox, options["repeat"])
+                for radius in (2, 25):
+                    self.compare_radius(radius, options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def populate(self, count, seed):
+        rng = random.Random(seed)
+        host = User.objects.create_user(
+            email=f"geo-benchmark-{seed}@example.com", password=None, name="Benchmark"
+        )
+        started = time.perf_counter()
+        batch = []
+        for i in range(count):
+            if rng.random() < 0.9:
+                lat, lng, spread = rng.choice(CLUSTERS)
+                lat = min(max(rng.gauss(lat, spread), -89.9), 89.9)
+                lng = min(max(rng.gauss(lng, spread), -179.9), 179.9)
+            else:
+                lat, lng = rng.uniform(-60, 70), rng.uniform(-180, 180)
+            batch.append(
+                Property(
+                    title=f"Listing {i}",
+                    description="",
+                    location="",
+                    address="",
+                    latitude=round(lat, 6),
+                    longitude=round(lng, 6),
+                    geo_cell=geo.cell_for(lat, lng),
+                    price_per_night=100,
+                    amenities="",
+                    host=host,
+                )
+            )
+            if len(batch) == 5000:
+                Property.objects.bulk_create(batch)
+                batch = []
+        Property.objects.bulk_create(batch)
+        self.stdout.write(
+            f"Inserted {count} properties in {time.perf_counter() - started:.1f}s"
+        )
+
+    def time_query(self, queryset, repeat):
+        timings, rows = [], 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = len(list(queryset.values_list("pk", flat=True)))
+            timings.append((time.perf_counter() - started) * 1000)
+        return rows, statistics.median(timings)
+
+    def report(self, label, method, rows, elapsed):
+        self.stdout.write(f"{label:18} {method:6} {rows:8} rows  {elapsed:9.2f} ms")
+
+    def compare_bbox(self, label, bbox, repeat):
+        min_lat, min_lng, max_lat, max_lng = bbox
+        scan = Property.objects.filter(
+            latitude__gte=min_lat,
+            latitude__lte=max_lat,
+            longitude__gte=min_lng,
+            longitude__lte=max_lng,
+        )
+        grid = geo.filter_bbox(Property.objects.all(), *bbox)
+        self.report(label, "scan", *self.time_query(scan, repeat))
+        self.report(label, "grid", *self.time_query(grid, repeat))
+
+    def compare_radius(self, radius, repeat):
+        lat, lng = CLUSTERS[0][:2]
+        label = f"{radius} km radius"
+        scan = geo.annotate_distance(Property.objects.all(), lat, lng).filter(
+            distance__lte=radius
+        )
+        grid = geo.filter_radius(Property.objects.all(), lat, lng, radius)
+        self.report(label, "scan", *self.time_query(scan, repeat))
+        self.report(label, "grid", *self.time_query(grid, repeat))
@@ -0,0 +1,159 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from property.fast_serialization import property_rows, serialize_properties
+from property.models import Property, PropertyImage, Wishlist
+from property.serializers import PropertyListSerializer, wishlisted_property_ids
+
+User = get_user_model()
+
+AMENITIES = ["WiFi", "Pool", "Kitchen", "Parking", "Air conditioning", "Washer"]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that the fast property list path renders byte-identical JSON to "
+        "PropertyListSerializer, then compare their throughput on synthetic "
+        "properties (all rows are rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--counts", type=int, nargs="+", default=[1000, 10_000])
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                guest = self.populate(max(options["counts"]), options["seed"])
+                request = Request(APIRequestFactory().get("/api/properties/"))
+                request.user = guest
+                for count in options["counts"]:
+                    self.check_identical(count, request)
+                    self.compare(count, request, options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def populate(self, count, seed):
+        rng = random.Random(seed)
+        hosts = [
+            User.objects.create_user(
+                email=f"list-benchmark-{seed}-{i}@example.com",
+                password=None,
+                name=f"Host {i}",
+                bio=rng.choice([None, "", "Superhost since 2019"]),
+                avatar=rng.choice(["", f"avatars/host-{i}.jpg"]),
+                is_host=True,
+            )
+            for i in range(50)
+        ]
+        guest = User.objects.create_user(
+            email=f"list-benchmark-{seed}-guest@example.com", password=None, name="G"
+        )
+
+        started = time.perf_counter()
+        properties = Property.objects.bulk_create(
+            (
+                Property(
+                    title=f"Listing {i}",
+                    description="",
+                    location=f"Town {rng.randrange(400)}",
+                    address="",
+                    price_per_night=Decimal(rng.randrange(2000, 60000)) / 100,
+                    guests=rng.randint(1, 10),
+                    average_rating=Decimal(rng.randrange(0, 501)) / 100,
+                    review_count=rng.randrange(200),
+                    amenities=", ".join(rng.sample(AMENITIES, rng.randint(0, 4))),
+                    host=rng.choice(hosts),
+                )
+                for i in range(count)
+            ),
+            batch_size=5000,
+        )
+        PropertyImage.objects.bulk_create(
+            (
+                PropertyImage(
+                    property=prop,
+                    image=f"property_images/{prop.pk}-{n}.jpg",
+                    caption=rng.choice(["", "Living room"]),
+                    is_primary=n == 0,
+                    order=n,
+                )
+                for prop in properties
+                for n in range(rng.randint(0, 3))
+            ),
+            batch_size=5000,
+        )
+        Wishlist.objects.bulk_create(
+            Wishlist(user=guest, property=prop)
+            for prop in rng.sample(properties, count // 20)
+        )
+        self.stdout.write(
+            f"Inserted {count} properties in {time.perf_counter() - started:.1f}s"
+        )
+        return guest
+
+    def queryset(self, count):
+        return Property.objects.order_by("-created_at", "-pk")[:count]
+
+    def serializer_json(self, count, request):
+        queryset = PropertyListSerializer.setup_eager_loading(self.queryset(count))
+        data = PropertyListSerializer(
+            queryset, many=True, context={"request": request}
+        ).data
+        return JSONRenderer().render(data)
+
+    def fast_json(self, count, request):
+        data = serialize_properties(
+            property_rows(self.queryset(count)),
+            request,
+            wishlisted_property_ids(request),
+        )
+        return JSONRenderer().render(data)
+
+    def check_identical(self, count, request):
+        expected = self.serializer_json(count, request)
+        actual = self.fast_json(count, request)
+        if actual != expected:
+            offset = next(
+                (i for i, (a, b) in enumerate(zip(actual, expected)) if a != b),
+                min(len(actual), len(expected)),
+            )
+            raise CommandError(
+                f"Fast path differs from PropertyListSerializer at byte {offset}: "
+                f"{actual[offset - 60:offset + 60]!r} != "
+                f"{expected[offset - 60:offset + 60]!r}"
+            )
+        self.stdout.write(f"{count} rows: output is byte-identical")
+
+    def time_path(self, render, count, request, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render(count, request)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+
+    def compare(self, count, request, repeat):
+        for label, render in [
+            ("serializer", self.serializer_json),
+            ("fast path", self.fast_json),
+        ]:
+            elapsed = self.time_path(render, count, request, repeat)
+            self.stdout.write(
+                f"{count:6} rows  {label:10} {elapsed * 1000:9.1f} ms  "
+                f"{count / elapsed:10.0f} rows/s"
+            )
@@ -0,0 +1,85 @@
+import time
+import tracemalloc
+
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+from property.fast_serialization import property_rows, serialize_properties
+from property.models import Property
+from property.renderers import FastJSONRenderer
+from property.serializers import wishlisted_property_ids
+from property.views import property_search
+
+from . import benchmark_list_serialization
+
+
+class Command(benchmark_list_serialization.Command):
+    help = (
+        "Compare time to first byte, total time and peak memory of a buffered "
+        "search response that holds every match against ?stream=true, on "
+        "synthetic properties (all rows are rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=50_000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                guest = self.populate(options["count"], options["seed"])
+                for label, chunks in [
+                    (
+                        "buffered, JSONRenderer",
+                        lambda: self.buffered(guest, JSONRenderer),
+                    ),
+                    (
+                        "buffered, FastJSONRenderer",
+                        lambda: self.buffered(guest, FastJSONRenderer),
+                    ),
+                    ("streamed", lambda: self.streamed(guest)),
+                ]:
+                    self.report(label, chunks)
+                raise benchmark_list_serialization.Rollback
+        except benchmark_list_serialization.Rollback:
+            pass
+
+    def buffered(self, guest, renderer_class):
+        request = Request(APIRequestFactory().get("/api/properties/search/"))
+        request.user = guest
+        queryset = Property.objects.filter(is_available=True).order_by(
+            "-created_at", "-pk"
+        )
+        data = serialize_properties(
+            property_rows(queryset), request, wishlisted_property_ids(request)
+        )
+        content = renderer_class().render({"results": data})
+        yield content
+
+    def streamed(self, guest):
+        request = APIRequestFactory().get("/api/properties/search/?stream=true")
+        force_authenticate(request, user=guest)
+        yield from property_search(request).streaming_content
+
+    def report(self, label, chunks):
+        started = time.perf_counter()
+        first_byte = None
+        size = 0
+        for chunk in chunks():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(chunk)
+        elapsed = time.perf_counter() - started
+
+        # Traced separately, tracemalloc slows allocation down several times
+        tracemalloc.start()
+        for chunk in chunks():
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{label:27} first byte {first_byte * 1000:8.1f} ms  "
+            f"total {elapsed * 1000:8.1f} ms  peak {peak / 2**20:7.1f} MiB  "
+            f"{size / 2**20:6.1f} MiB sent"
+        )
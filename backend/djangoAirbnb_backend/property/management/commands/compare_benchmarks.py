@@ -0,0 +1,86 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare two benchmark_api result files and fail if any scenario got "
+        "slower, issues more queries, sends more bytes or changed status"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("baseline")
+        parser.add_argument("current")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.5,
+            help="Allowed relative growth of p50/p95 latency (default 0.5)",
+        )
+        parser.add_argument(
+            "--min-ms",
+            type=float,
+            default=2.0,
+            help="Ignore latency changes smaller than this many milliseconds",
+        )
+        parser.add_argument(
+            "--bytes-threshold",
+            type=float,
+            default=0.1,
+            help="Allowed relative growth of the response size (default 0.1)",
+        )
+
+    def handle(self, *args, **options):
+        baseline = self.load(options["baseline"])
+        current = self.load(options["current"])
+        if baseline["meta"]["database"] != current["meta"]["database"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Comparing {baseline['meta']['database']} with "
+                    f"{current['meta']['database']} results"
+                )
+            )
+
+        regressions = 0
+        for name, before in baseline["scenarios"].items():
+            after = current["scenarios"].get(name)
+            if after is None:
+                self.stdout.write(self.style.WARNING(f"{name}: missing"))
+                continue
+            problems = self.compare(before, after, options)
+            regressions += len(problems)
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(f"{name}: {problem}"))
+        for name in current["scenarios"].keys() - baseline["scenarios"].keys():
+            self.stdout.write(f"{name}: new scenario")
+
+        if regressions:
+            raise CommandError(f"{regressions} regression(s) against the baseline")
+        self.stdout.write(self.style.SUCCESS("No regressions"))
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+    def compare(self, before, after, options):
+        problems = []
+        for key in ["p50_ms", "p95_ms"]:
+            limit = before[key] * (1 + options["threshold"])
+            if after[key] > limit and after[key] - before[key] >= options["min_ms"]:
+                problems.append(
+                    f"{key} {before[key]:.2f} -> {after[key]:.2f} "
+                    f"(+{after[key] / before[key] - 1:.0%})"
+                )
+        if after["queries"] > before["queries"]:
+            problems.append(f"queries {before['queries']:g} -> {after['queries']:g}")
+        if after["bytes"] > before["bytes"] * (1 + options["bytes_threshold"]):
+            problems.append(f"bytes {before['bytes']:g} -> {after['bytes']:g}")
+        if after["statuses"].keys() != before["statuses"].keys():
+            problems.append(
+                f"statuses {sorted(before['statuses'])} -> {sorted(after['statuses'])}"
+            )
+        return problems
@@ -1,15 +1,63 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
-from property.models import Property, PropertyImage
-import uuid
+from django.db import connection, connections
+from property.models import Property
+from property.synthetic import Generator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import Counter
+from datetime import date
+import django
+import time
 
 User = get_user_model()
 
+_generator = None
+
+
+def _init_worker(generator):
+    global _generator
+    django.setup()
+    _generator = generator
+
+
+def _write_chunk(chunk):
+    return _generator.write_chunk(chunk)
+
 
 class Command(BaseCommand):
-    help = "Create sample properties"
+    help = (
+        "Create sample properties. With --properties, generate a seeded "
+        "synthetic data set of that size instead (see property.synthetic)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--properties", type=int)
+        parser.add_argument("--hosts", type=int, help="Default: properties / 5")
+        parser.add_argument("--guests", type=int, help="Default: properties * 2")
+        parser.add_argument(
+            "--reservations",
+            type=int,
+            help="Default: properties * 10. Stays that do not fit in a "
+            "listing's calendar are dropped, so slightly fewer are created.",
+        )
+        parser.add_argument("--wishlists", type=int, help="Default: properties * 2")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--today",
+            type=date.fromisoformat,
+            help="Reference date for booking history (default: today)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=10_000)
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--workers", type=int, default=1, help="Processes writing chunks"
+        )
 
     def handle(self, *args, **options):
+        if options["properties"]:
+            self.generate(options)
+            return
+
         # Create a host user if it doesn't exist
         host_email = "host@example.com"
         try:
@@ -93,3 +141,70 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS(f"Successfully created {created_count} properties")
         )
+
+    def generate(self, options):
+        count = options["properties"]
+        generator = Generator(
+            seed=options["seed"],
+            hosts=options["hosts"] or max(1, count // 5),
+            guests=options["guests"] or max(1, count * 2),
+            properties=count,
+            reservations=(
+                count * 10
+                if options["reservations"] is None
+                else options["reservations"]
+            ),
+            wishlists=(
+                count * 2 if options["wishlists"] is None else options["wishlists"]
+            ),
+            today=options["today"],
+            chunk_size=options["chunk_size"],
+            batch_size=options["batch_size"],
+        )
+        if generator.exists():
+            raise CommandError(
+                f"Seed {generator.seed} has already been generated; use another --seed."
+            )
+        workers = options["workers"]
+        if workers > 1 and connection.vendor == "sqlite":
+            self.stdout.write("SQLite takes one writer at a time, using --workers 1")
+            workers = 1
+
+        started = time.perf_counter()
+        generator.create_users()
+        self.stdout.write(
+            f"Created {generator.hosts} hosts and {generator.guests} guests "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        totals = Counter()
+        chunks = range(generator.chunk_count)
+        if workers > 1:
+            # Workers open their own connections; none may be inherited.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                workers, initializer=_init_worker, initargs=(generator,)
+            ) as pool:
+                futures = [pool.submit(_write_chunk, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    self.report_chunk(totals, future.result(), started)
+        else:
+            for chunk in chunks:
+                self.report_chunk(totals, generator.write_chunk(chunk), started)
+
+        generator.finish()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {', '.join(f'{n} {model}' for model, n in totals.items())} "
+                f"in {elapsed:.1f}s"
+            )
+        )
+
+    def report_chunk(self, totals, counts, started):
+        totals.update(counts)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{totals['Property']} properties, {totals['Reservation']} reservations "
+            f"({totals['Reservation'] / elapsed:.0f} reservations/s)"
+        )
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from property.models import BookedNight, Reservation
+
+
+class Command(BaseCommand):
+    help = "Rebuild the booked-nights availability index from reservations"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        reservations = (
+            Reservation.objects.filter(status__in=Reservation.BLOCKING_STATUSES)
+            .order_by()
+            .values_list("id", "property_id", "check_in", "check_out")
+        )
+
+        created = 0
+        with transaction.atomic():
+            BookedNight.objects.all().delete()
+            batch = []
+            for (
+                reservation_id,
+                property_id,
+                check_in,
+                check_out,
+            ) in reservations.iterator(chunk_size=batch_size):
+                for n in range((check_out - check_in).days):
+                    batch.append(
+                        BookedNight(
+                            property_id=property_id,
+                            reservation_id=reservation_id,
+                            night=check_in + timedelta(days=n),
+                        )
+                    )
+                if len(batch) >= batch_size:
+                    BookedNight.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            BookedNight.objects.bulk_create(batch)
+            created += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} booked nights"))
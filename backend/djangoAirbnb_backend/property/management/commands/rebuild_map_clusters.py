@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from property import clusters
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-zoom map cluster aggregates from properties"
+
+    def handle(self, *args, **options):
+        clusters.rebuild()
+        self.stdout.write(self.style.SUCCESS("Map clusters rebuilt"))
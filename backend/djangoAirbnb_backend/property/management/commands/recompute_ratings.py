@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from property import ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute every property's rating aggregates from its reviews"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        corrected = ratings.recompute(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Corrected rating aggregates of {corrected} properties")
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from property import analytics
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the monthly analytics rollups of properties whose "
+        "reservations changed since the last run"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recompute every property instead of reading the watermark",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        refreshed = analytics.refresh(
+            full=options["full"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Refreshed the rollups of {refreshed} properties")
+        )
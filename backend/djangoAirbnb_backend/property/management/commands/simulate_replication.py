@@ -0,0 +1,85 @@
+import sqlite3
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Stand in for replication between a SQLite primary and SQLite "
+        "replicas (SQL_REPLICAS): snapshot the primary every --interval "
+        "seconds and copy each snapshot to the replicas --lag seconds later"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lag", type=float, default=2, help="Seconds the replicas are behind"
+        )
+        parser.add_argument("--interval", type=float, default=0.5)
+        parser.add_argument(
+            "--duration",
+            type=float,
+            help="Stop after this many seconds instead of running until interrupted",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("Set SQL_REPLICAS to the replicas' database files.")
+        databases = [DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS]
+        if any(connections[alias].vendor != "sqlite" for alias in databases):
+            raise CommandError("Replication can only be simulated with SQLite.")
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict["NAME"]
+        replicas = [
+            connections[alias].settings_dict["NAME"]
+            for alias in settings.DATABASE_REPLICAS
+        ]
+
+        # Snapshots taken but not replicated yet, oldest first
+        pending = deque()
+        started = time.monotonic()
+        copies = 0
+        try:
+            while (
+                options["duration"] is None
+                or time.monotonic() - started < options["duration"]
+            ):
+                pending.append((time.monotonic(), self.snapshot(primary)))
+                due = None
+                while pending and pending[0][0] <= time.monotonic() - options["lag"]:
+                    if due is not None:
+                        due.close()
+                    due = pending.popleft()[1]
+                if due is not None:
+                    for replica in replicas:
+                        self.restore(due, replica)
+                    due.close()
+                    copies += 1
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for _, snapshot in pending:
+                snapshot.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Copied {copies} snapshots to {len(replicas)} replicas")
+        )
+
+    def snapshot(self, primary):
+        snapshot = sqlite3.connect(":memory:")
+        source = sqlite3.connect(primary, timeout=20)
+        try:
+            source.backup(snapshot)
+        finally:
+            source.close()
+        return snapshot
+
+    def restore(self, snapshot, replica):
+        target = sqlite3.connect(replica, timeout=20)
+        try:
+            snapshot.backup(target)
+        finally:
+            target.close()
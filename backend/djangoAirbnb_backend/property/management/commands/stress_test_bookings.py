@@ -0,0 +1,115 @@
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection
+from rest_framework.exceptions import ValidationError
+from property import booking
+from property.models import Property, Reservation
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent booking attempts at a single throwaway property and "
+        "verify that no two confirmed or pending stays overlap"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--attempts", type=int, default=500)
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--window-days", type=int, default=60)
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite" and connection.settings_dict["NAME"] in (
+            ":memory:",
+            "",
+        ):
+            raise CommandError("Use a file-backed database for concurrent writes.")
+
+        host, _ = User.objects.get_or_create(
+            email="stress-host@example.com", defaults={"name": "Stress host"}
+        )
+        guest, _ = User.objects.get_or_create(
+            email="stress-guest@example.com", defaults={"name": "Stress guest"}
+        )
+        property_obj = Property.objects.create(
+            title="Booking stress test",
+            description="Temporary property",
+            location="Nowhere",
+            address="-",
+            price_per_night=100,
+            guests=4,
+            amenities="",
+            host=host,
+        )
+        try:
+            self.run(property_obj, guest, options)
+        finally:
+            property_obj.delete()
+
+    def run(self, property_obj, guest, options):
+        rng = random.Random(options["seed"])
+        start = date.today() + timedelta(days=30)
+        stays = []
+        for _ in range(options["attempts"]):
+            check_in = start + timedelta(days=rng.randrange(options["window_days"]))
+            stays.append((check_in, check_in + timedelta(days=rng.randint(1, 5))))
+
+        outcomes = Counter()
+        lock = threading.Lock()
+
+        def attempt(stay):
+            try:
+                booking.create_reservation(
+                    property_id=property_obj.pk,
+                    check_in=stay[0],
+                    check_out=stay[1],
+                    guests_count=1,
+                    guest=guest,
+                )
+                outcome = "booked"
+            except booking.BookingConflict:
+                outcome = "conflict"
+            except (ValidationError, OperationalError):
+                outcome = "error"
+            finally:
+                connection.close()
+            with lock:
+                outcomes[outcome] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+            list(pool.map(attempt, stays))
+        elapsed = time.perf_counter() - started
+
+        reservations = list(
+            Reservation.objects.filter(
+                property=property_obj, status__in=Reservation.BLOCKING_STATUSES
+            ).values_list("check_in", "check_out")
+        )
+        nights = Counter(
+            check_in + timedelta(days=n)
+            for check_in, check_out in reservations
+            for n in range((check_out - check_in).days)
+        )
+        double_booked = sum(1 for count in nights.values() if count > 1)
+
+        self.stdout.write(
+            f"{len(stays)} attempts on {options['threads']} threads in {elapsed:.2f}s "
+            f"({len(stays) / elapsed:.0f} attempts/s)"
+        )
+        self.stdout.write(
+            f"booked={outcomes['booked']} conflict={outcomes['conflict']} "
+            f"error={outcomes['error']} double-booked nights={double_booked}"
+        )
+        if double_booked:
+            raise CommandError(f"{double_booked} nights were double booked")
+        self.stdout.write(self.style.SUCCESS("No double bookings"))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from property import lifecycle
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire pending holds older than RESERVATION_HOLD_MINUTES and "
+        "complete confirmed stays whose check-out day has come. Run it from "
+        "cron, or with --loop to keep sweeping."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--loop", action="store_true", help="Sweep until interrupted"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=60,
+            help="Seconds between sweeps with --loop",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                expired, completed = lifecycle.sweep(batch_size=options["batch_size"])
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Expired {expired} holds and completed {completed} stays"
+                    )
+                )
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from property import clusters
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the map cluster changes queued by property saves and deletes. "
+        "Run it from cron, or with --loop to keep applying them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--loop", action="store_true", help="Apply changes until interrupted"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds between runs with --loop",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                applied = clusters.apply_queued(batch_size=options["batch_size"])
+                self.stdout.write(
+                    self.style.SUCCESS(f"Applied {applied} map cluster changes")
+                )
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
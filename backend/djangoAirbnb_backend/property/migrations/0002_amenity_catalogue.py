@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Amenity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('bit', models.PositiveSmallIntegerField(blank=True, null=True, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Amenities',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='amenity_mask',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='PropertyAmenity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amenity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='property.amenity')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='property.property')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='amenity_tags',
+            field=models.ManyToManyField(blank=True, related_name='properties', through='property.PropertyAmenity', to='property.amenity'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyamenity',
+            index=models.Index(fields=['amenity', 'property'], name='property_pr_amenity_23997b_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='propertyamenity',
+            unique_together={('property', 'amenity')},
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+MAX_BIT = 62
+
+
+def normalize(name):
+    return " ".join(name.split()).lower()
+
+
+def populate_amenities(apps, schema_editor):
+    Amenity = apps.get_model("property", "Amenity")
+    Property = apps.get_model("property", "Property")
+    PropertyAmenity = apps.get_model("property", "PropertyAmenity")
+
+    catalogue = {amenity.key: amenity for amenity in Amenity.objects.all()}
+    next_bit = max(
+        (amenity.bit for amenity in catalogue.values() if amenity.bit is not None),
+        default=-1,
+    ) + 1
+
+    def resolve(name):
+        nonlocal next_bit
+        key = normalize(name)
+        if key not in catalogue:
+            bit = next_bit if next_bit <= MAX_BIT else None
+            next_bit += 1
+            catalogue[key] = Amenity.objects.create(name=name, key=key, bit=bit)
+        return catalogue[key]
+
+    properties = Property.objects.only("id", "amenities").order_by("pk")
+    last_pk = None
+    while True:
+        page = properties if last_pk is None else properties.filter(pk__gt=last_pk)
+        batch = list(page[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        links = []
+        for prop in batch:
+            tags = {}
+            for name in (prop.amenities or "").split(","):
+                if name.strip():
+                    amenity = resolve(name.strip())
+                    tags.setdefault(amenity.key, amenity)
+            prop.amenities = ", ".join(amenity.name for amenity in tags.values())
+            prop.amenity_mask = sum(
+                1 << amenity.bit for amenity in tags.values() if amenity.bit is not None
+            )
+            links.extend(
+                PropertyAmenity(property_id=prop.pk, amenity_id=amenity.pk)
+                for amenity in tags.values()
+            )
+        Property.objects.bulk_update(batch, ["amenities", "amenity_mask"])
+        PropertyAmenity.objects.filter(property_id__in=[p.pk for p in batch]).delete()
+        PropertyAmenity.objects.bulk_create(links)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0002_amenity_catalogue"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_amenities, migrations.RunPython.noop),
+    ]
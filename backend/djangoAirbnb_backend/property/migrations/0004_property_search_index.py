@@ -0,0 +1,54 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:29
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+FTS_TABLE = "property_search_fts"
+GIN_INDEX = "property_search_vector_gin"
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE INDEX {GIN_INDEX} ON property_property USING gin (search_vector)"
+        )
+        schema_editor.execute(
+            "UPDATE property_property SET search_vector = "
+            "setweight(to_tsvector(COALESCE(location, '')), 'A') || "
+            "setweight(to_tsvector(COALESCE(title, '')), 'B') || "
+            "setweight(to_tsvector(COALESCE(description, '')), 'C')"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "property_id UNINDEXED, location, title, description)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (property_id, location, title, description) "
+            "SELECT id, location, title, description FROM property_property"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {GIN_INDEX}")
+    elif vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0003_populate_amenities'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:32
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def populate_booked_nights(apps, schema_editor):
+    BookedNight = apps.get_model("property", "BookedNight")
+    Reservation = apps.get_model("property", "Reservation")
+
+    reservations = Reservation.objects.filter(
+        status__in=["pending", "confirmed"]
+    ).values_list("id", "property_id", "check_in", "check_out")
+    batch = []
+    for reservation_id, property_id, check_in, check_out in reservations.iterator():
+        batch.extend(
+            BookedNight(
+                property_id=property_id,
+                reservation_id=reservation_id,
+                night=check_in + timedelta(days=n),
+            )
+            for n in range((check_out - check_in).days)
+        )
+        if len(batch) >= 5000:
+            BookedNight.objects.bulk_create(batch)
+            batch = []
+    BookedNight.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0004_property_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BookedNight",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("night", models.DateField()),
+                (
+                    "property",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="booked_nights",
+                        to="property.property",
+                    ),
+                ),
+                (
+                    "reservation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="booked_nights",
+                        to="property.reservation",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["property", "night"],
+                "indexes": [
+                    models.Index(
+                        fields=["property", "night"],
+                        name="property_bo_propert_442488_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_booked_nights, migrations.RunPython.noop),
+    ]
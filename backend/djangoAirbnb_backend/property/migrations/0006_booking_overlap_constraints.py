@@ -0,0 +1,96 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:33
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Case, Count, Value, When
+from django.utils import timezone
+
+EXCLUSION_CONSTRAINT = "reservation_no_overlapping_stays"
+
+
+def cancel_double_bookings(apps, schema_editor):
+    """
+    Before the constraints go on, cancel the holds that share a night with
+    another one. Per property, confirmed reservations win over pending ones
+    and earlier ones over later ones.
+    """
+    BookedNight = apps.get_model("property", "BookedNight")
+    Reservation = apps.get_model("property", "Reservation")
+
+    property_ids = (
+        BookedNight.objects.values("property_id", "night")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("property_id", flat=True)
+        .distinct()
+    )
+    cancelled = []
+    for property_id in property_ids.iterator():
+        reservations = (
+            Reservation.objects.filter(
+                property_id=property_id, status__in=["pending", "confirmed"]
+            )
+            .alias(rank=Case(When(status="confirmed", then=Value(0)), default=Value(1)))
+            .order_by("rank", "created_at", "id")
+            .values_list("id", "check_in", "check_out")
+        )
+        taken = set()
+        for reservation_id, check_in, check_out in reservations:
+            nights = {
+                check_in + timedelta(days=n) for n in range((check_out - check_in).days)
+            }
+            if nights & taken:
+                cancelled.append(reservation_id)
+            else:
+                taken |= nights
+
+    for i in range(0, len(cancelled), 1000):
+        batch = cancelled[i : i + 1000]
+        BookedNight.objects.filter(reservation_id__in=batch).delete()
+        Reservation.objects.filter(id__in=batch).update(
+            status="cancelled", updated_at=timezone.now()
+        )
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(
+        f"ALTER TABLE property_reservation ADD CONSTRAINT {EXCLUSION_CONSTRAINT} "
+        "EXCLUDE USING gist ("
+        "property_id WITH =, daterange(check_in, check_out, '[)') WITH &&"
+        ") WHERE (status IN ('pending', 'confirmed'))"
+    )
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "ALTER TABLE property_reservation "
+        f"DROP CONSTRAINT IF EXISTS {EXCLUSION_CONSTRAINT}"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0005_booked_nights"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="bookednight",
+            name="property_bo_propert_442488_idx",
+        ),
+        migrations.RunPython(cancel_double_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="bookednight",
+            constraint=models.UniqueConstraint(
+                fields=("property", "night"), name="unique_booked_night"
+            ),
+        ),
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+# The grid of property.geo as of this migration
+CELL_DEGREES = 0.1
+ROWS = round(180 / CELL_DEGREES)
+COLUMNS = round(360 / CELL_DEGREES)
+
+
+def cell_for(lat, lng):
+    row = min(max(int((float(lat) + 90) / CELL_DEGREES), 0), ROWS - 1)
+    column = min(max(int((float(lng) + 180) / CELL_DEGREES), 0), COLUMNS - 1)
+    return row * COLUMNS + column
+
+
+def populate_geo_cells(apps, schema_editor):
+    Property = apps.get_model("property", "Property")
+    properties = (
+        Property.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .only("id", "latitude", "longitude")
+        .order_by("pk")
+    )
+    last_pk = None
+    while True:
+        page = properties if last_pk is None else properties.filter(pk__gt=last_pk)
+        batch = list(page[:1000])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for prop in batch:
+            prop.geo_cell = cell_for(prop.latitude, prop.longitude)
+        Property.objects.bulk_update(batch, ["geo_cell"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0006_booking_overlap_constraints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="geo_cell",
+            field=models.IntegerField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(populate_geo_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+# The zoom grids of property.clusters as of this migration
+MAX_ZOOM = 14
+CELLS_PER_TILE = 4
+
+
+def cell_for(lat, lng, zoom):
+    columns = CELLS_PER_TILE * 2**zoom
+    size = 360 / columns
+    row = min(max(int((lat + 90) / size), 0), columns // 2 - 1)
+    column = min(max(int((lng + 180) / size), 0), columns - 1)
+    return row * columns + column
+
+
+def populate_map_clusters(apps, schema_editor):
+    MapCluster = apps.get_model("property", "MapCluster")
+    Property = apps.get_model("property", "Property")
+
+    cells = {}
+    points = Property.objects.filter(
+        is_available=True, latitude__isnull=False, longitude__isnull=False
+    ).values_list("latitude", "longitude", "price_per_night")
+    for lat, lng, price in points.iterator():
+        lat, lng = float(lat), float(lng)
+        for zoom in range(MAX_ZOOM + 1):
+            key = (zoom, cell_for(lat, lng, zoom))
+            count, lat_sum, lng_sum, min_price = cells.get(key, (0, 0.0, 0.0, price))
+            cells[key] = (
+                count + 1,
+                lat_sum + lat,
+                lng_sum + lng,
+                min(min_price, price),
+            )
+
+    MapCluster.objects.bulk_create(
+        (
+            MapCluster(
+                zoom=zoom,
+                cell=cell,
+                count=count,
+                latitude_sum=lat_sum,
+                longitude_sum=lng_sum,
+                min_price=min_price,
+            )
+            for (zoom, cell), (count, lat_sum, lng_sum, min_price) in cells.items()
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0007_property_geo_cell"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MapCluster",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("zoom", models.PositiveSmallIntegerField()),
+                ("cell", models.BigIntegerField()),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("latitude_sum", models.FloatField(default=0)),
+                ("longitude_sum", models.FloatField(default=0)),
+                ("min_price", models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("zoom", "cell"), name="unique_map_cluster"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_map_clusters, migrations.RunPython.noop),
+    ]
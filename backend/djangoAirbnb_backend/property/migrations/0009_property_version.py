@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0008_map_clusters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
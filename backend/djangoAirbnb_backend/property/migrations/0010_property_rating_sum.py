@@ -0,0 +1,58 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:45
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def average_rating(rating_sum, review_count):
+    if not review_count:
+        return Decimal("0.00")
+    return (Decimal(rating_sum) / review_count).quantize(
+        Decimal("0.01"), rounding=ROUND_HALF_UP
+    )
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    Property = apps.get_model("property", "Property")
+    Review = apps.get_model("property", "Review")
+    properties = Property.objects.only("id").order_by("pk")
+    last_pk = None
+    while True:
+        page = properties if last_pk is None else properties.filter(pk__gt=last_pk)
+        batch = list(page[:1000])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        totals = {
+            row["property_id"]: (row["count"], row["total"])
+            for row in Review.objects.filter(property__in=batch)
+            .order_by()
+            .values("property_id")
+            .annotate(count=Count("pk"), total=Sum("rating"))
+        }
+        for prop in batch:
+            count, total = totals.get(prop.pk, (0, 0))
+            prop.review_count = count
+            prop.rating_sum = total
+            prop.average_rating = average_rating(total, count)
+        Property.objects.bulk_update(
+            batch, ["review_count", "rating_sum", "average_rating"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0009_property_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
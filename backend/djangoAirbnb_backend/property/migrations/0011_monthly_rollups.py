@@ -0,0 +1,109 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0010_property_rating_sum"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HostMonthlyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField()),
+                ("nights", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("check_ins", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="MonthlyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField()),
+                ("nights", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("check_ins", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=50, primary_key=True, serialize=False),
+                ),
+                ("value", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StaleRollup",
+            fields=[
+                ("property_id", models.UUIDField(primary_key=True, serialize=False)),
+                ("host_id", models.BigIntegerField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(fields=["updated_at"], name="reservation_updated_at"),
+        ),
+        migrations.AddField(
+            model_name="hostmonthlyrollup",
+            name="host",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="monthly_rollups",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="monthlyrollup",
+            name="property",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="monthly_rollups",
+                to="property.property",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="hostmonthlyrollup",
+            constraint=models.UniqueConstraint(
+                fields=("host", "month"), name="unique_host_monthly_rollup"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="monthlyrollup",
+            constraint=models.UniqueConstraint(
+                fields=("property", "month"), name="unique_monthly_rollup"
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0012_reservation_lifecycle"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MapClusterChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                ("price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("delta", models.SmallIntegerField()),
+            ],
+        ),
+    ]
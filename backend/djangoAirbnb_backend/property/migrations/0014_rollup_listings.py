@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+def reset_rollup_watermark(apps, schema_editor):
+    # Without a watermark the next refresh_host_analytics recomputes every
+    # property, which fills in listings_added
+    RollupWatermark = apps.get_model("property", "RollupWatermark")
+    RollupWatermark.objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0013_map_cluster_changes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="hostmonthlyrollup",
+            name="listings_added",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="monthlyrollup",
+            name="listings_added",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(reset_rollup_watermark, migrations.RunPython.noop),
+    ]
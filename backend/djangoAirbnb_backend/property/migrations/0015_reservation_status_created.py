@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0014_rollup_listings"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                fields=["status", "created_at"], name="reservation_status_created"
+            ),
+        ),
+    ]
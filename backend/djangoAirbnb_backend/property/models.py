@@ -1,8 +1,187 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, router, transaction, IntegrityError
+from django.db.models import (
+    Case,
+    DecimalField,
+    Exists,
+    F,
+    FloatField,
+    Max,
+    OuterRef,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Round
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
 import uuid
 
+from . import geo
+
+
+def split_amenities(value):
+    """Split a comma-separated amenities string into stripped names"""
+    return [amenity.strip() for amenity in value.split(",") if amenity.strip()]
+
+
+class AmenityManager(models.Manager):
+    def resolve(self, names):
+        """
+        Return catalogue rows for the given names, creating missing ones.
+
+        Names are matched case-insensitively and duplicates are dropped,
+        keeping the order of first appearance.
+        """
+        keys = {}
+        for name in names:
+            keys.setdefault(Amenity.normalize(name), name.strip())
+        existing = {amenity.key: amenity for amenity in self.filter(key__in=list(keys))}
+        for key, name in keys.items():
+            if key not in existing:
+                existing[key] = self._create_amenity(name, key)
+        return [existing[key] for key in keys]
+
+    def _create_amenity(self, name, key):
+        # Two writers can race for the same key or the same next bit; retry
+        # on the unique constraints rather than locking the whole catalogue.
+        for _ in range(3):
+            try:
+                with transaction.atomic():
+                    highest = self.aggregate(highest=Max("bit"))["highest"]
+                    bit = 0 if highest is None else highest + 1
+                    if bit > Amenity.MAX_BIT:
+                        bit = None
+                    return self.create(name=name, key=key, bit=bit)
+            except IntegrityError:
+                amenity = self.filter(key=key).first()
+                if amenity is not None:
+                    return amenity
+        raise IntegrityError(f"Could not register amenity {name!r}")
+
+
+class Amenity(models.Model):
+    """Canonical amenity catalogue entry"""
+
+    # Bits 0-62 fit in a signed 64-bit mask; later amenities are only
+    # reachable through the PropertyAmenity table.
+    MAX_BIT = 62
+
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, unique=True)
+    bit = models.PositiveSmallIntegerField(unique=True, null=True, blank=True)
+
+    objects = AmenityManager()
+
+    class Meta:
+        verbose_name_plural = "Amenities"
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = Amenity.normalize(self.name)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def normalize(name):
+        return " ".join(name.split()).lower()
+
+    @property
+    def mask(self):
+        return 0 if self.bit is None else 1 << self.bit
+
+
+class PropertyQuerySet(models.QuerySet):
+    def with_all_amenities(self, names):
+        """Filter to properties that have every one of the given amenities"""
+        keys = {Amenity.normalize(name) for name in names if name.strip()}
+        if not keys:
+            return self
+        amenities = list(Amenity.objects.filter(key__in=keys))
+        if len(amenities) < len(keys):
+            # Nothing can have an amenity that is not in the catalogue.
+            return self.none()
+
+        queryset = self
+        mask = sum(amenity.mask for amenity in amenities)
+        if mask:
+            queryset = queryset.alias(
+                matched_amenities=F("amenity_mask").bitand(mask)
+            ).filter(matched_amenities=mask)
+        for amenity in amenities:
+            if amenity.bit is None:
+                queryset = queryset.filter(amenity_tags=amenity)
+        return queryset
+
+    def available_between(self, check_in, check_out):
+        """Exclude properties with any booked night in [check_in, check_out)"""
+        booked = BookedNight.objects.filter(
+            property=OuterRef("pk"), night__gte=check_in, night__lt=check_out
+        )
+        return self.filter(~Exists(booked))
+
+    def touch(self):
+        """Mark the properties as changed without saving each one"""
+        updated = self.update(version=F("version") + 1, updated_at=timezone.now())
+        _invalidate_listings()
+        return updated
+
+    def add_ratings(self, count, total):
+        """
+        Add ``count`` reviews totalling ``total`` stars to the running rating
+        aggregates (negative values remove them). Everything is computed in
+        one UPDATE from the current row, so concurrent reviews never lose an
+        update.
+        """
+        review_count = F("review_count") + count
+        rating_sum = F("rating_sum") + total
+        # Divided as floats (SQLite truncates integer division), then rounded
+        # half up to cents like ratings.average_rating
+        average = Round(
+            Cast(
+                Cast(rating_sum, FloatField()) / review_count,
+                DecimalField(max_digits=20, decimal_places=10),
+            ),
+            2,
+        )
+        average_field = Property._meta.get_field("average_rating")
+        updated = self.update(
+            review_count=review_count,
+            rating_sum=rating_sum,
+            average_rating=Case(
+                When(review_count__lte=-count, then=Value(Decimal("0.00"))),
+                default=Cast(average, average_field),
+                output_field=average_field,
+            ),
+            version=F("version") + 1,
+            updated_at=timezone.now(),
+        )
+        _invalidate_listings()
+        return updated
+
+
+def _invalidate_listings():
+    # Queryset updates send no post_save. Detail responses are keyed on the
+    # version the update bumped; lists need a new listings generation.
+    from .response_cache import LISTINGS, bump
+
+    bump(LISTINGS)
+
+
+def deleted_with(origin, *senders):
+    """
+    Whether a delete signal's ``origin`` (the instance or queryset whose
+    delete() was called) is one of ``senders``, so the instance is going as
+    part of their cascade.
+    """
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return issubclass(model, senders)
+
 
 class Property(models.Model):
     PROPERTY_TYPES = [
@@ -27,6 +206,8 @@ class Property(models.Model):
     longitude = models.DecimalField(
         max_digits=9, decimal_places=6, null=True, blank=True
     )
+    # Map grid cell derived from the coordinates (see property.geo)
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False, db_index=True)
 
     property_type = models.CharField(
         max_length=20, choices=PROPERTY_TYPES, default="apartment"
@@ -42,6 +223,10 @@ class Property(models.Model):
 
     # Features
     amenities = models.TextField(help_text="Comma-separated list of amenities")
+    amenity_tags = models.ManyToManyField(
+        Amenity, through="PropertyAmenity", related_name="properties", blank=True
+    )
+    amenity_mask = models.BigIntegerField(default=0, editable=False)
 
     # Availability
     is_available = models.BooleanField(default=True)
@@ -56,10 +241,22 @@ class Property(models.Model):
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Incremented on every change to the property, its images or its
+    # reviews; used as the ETag (see property.conditional)
+    version = models.PositiveIntegerField(default=1, editable=False)
 
-    # Rating (calculated field)
+    # Rating (maintained from reviews, see PropertyQuerySet.add_ratings)
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+
+    # Full-text search document (PostgreSQL only, see property.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Fields that decide whether and where a property shows on the map
+    MAP_FIELDS = ["latitude", "longitude", "price_per_night", "is_available"]
+
+    objects = PropertyQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = "Properties"
@@ -68,17 +265,114 @@ class Property(models.Model):
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_amenities = instance.__dict__.get("amenities")
+        if not set(Property.MAP_FIELDS) & instance.get_deferred_fields():
+            instance._loaded_map_point = instance.get_map_point()
+        if "host_id" not in instance.get_deferred_fields():
+            instance._loaded_host_id = instance.host_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        sync_amenities = (
+            "amenities" not in self.get_deferred_fields()
+            and (update_fields is None or "amenities" in update_fields)
+            and (
+                self._state.adding
+                or self.amenities != getattr(self, "_loaded_amenities", None)
+            )
+        )
+        derived_fields = set()
+        if sync_amenities:
+            tags = Amenity.objects.resolve(split_amenities(self.amenities or ""))
+            self.amenities = ", ".join(amenity.name for amenity in tags)
+            self.amenity_mask = sum(amenity.mask for amenity in tags)
+            derived_fields.add("amenity_mask")
+        if update_fields is None or {"latitude", "longitude"} & set(update_fields):
+            self.geo_cell = geo.cell_for(self.latitude, self.longitude)
+            derived_fields.add("geo_cell")
+        bump_version = not self._state.adding
+        if bump_version:
+            # Increment in SQL so concurrent saves never share a version.
+            self.version = F("version") + 1
+            derived_fields.update(["version", "updated_at"])
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, *derived_fields}
+
+        super().save(*args, **kwargs)
+        if bump_version:
+            # Leave the new version deferred; it is reloaded if read.
+            del self.__dict__["version"]
+
+        if sync_amenities:
+            self.amenity_tags.set(tags)
+            self._loaded_amenities = self.amenities
+
+    def get_map_point(self):
+        """Return ``(lat, lng, price)`` if the property shows on the map"""
+        if not self.is_available or self.latitude is None or self.longitude is None:
+            return None
+        return (float(self.latitude), float(self.longitude), self.price_per_night)
+
     def get_amenities_list(self):
         """Return amenities as a list"""
-        return [
-            amenity.strip() for amenity in self.amenities.split(",") if amenity.strip()
-        ]
+        return split_amenities(self.amenities)
 
     def set_amenities_list(self, amenities_list):
         """Set amenities from a list"""
         self.amenities = ", ".join(amenities_list)
 
 
+class MapCluster(models.Model):
+    """
+    Running aggregate of the available properties in one map grid cell at
+    one zoom level (see property.clusters).
+    """
+
+    zoom = models.PositiveSmallIntegerField()
+    cell = models.BigIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    latitude_sum = models.FloatField(default=0)
+    longitude_sum = models.FloatField(default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["zoom", "cell"], name="unique_map_cluster")
+        ]
+
+    def __str__(self):
+        return f"{self.count} properties in cell {self.cell} at zoom {self.zoom}"
+
+
+class MapClusterChange(models.Model):
+    """
+    A map point entering (``delta`` 1) or leaving (-1) the map clusters,
+    queued by a property save or delete until ``update_map_clusters``
+    applies it (see property.clusters).
+    """
+
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    delta = models.SmallIntegerField()
+
+
+class PropertyAmenity(models.Model):
+    property = models.ForeignKey(Property, on_delete=models.CASCADE)
+    amenity = models.ForeignKey(Amenity, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ("property", "amenity")
+        indexes = [models.Index(fields=["amenity", "property"])]
+
+    def __str__(self):
+        return f"{self.amenity.name} at {self.property.title}"
+
+
 class PropertyImage(models.Model):
     property = models.ForeignKey(
         Property, on_delete=models.CASCADE, related_name="images"
@@ -101,6 +395,7 @@ class Reservation(models.Model):
         ("confirmed", "Confirmed"),
         ("cancelled", "Cancelled"),
         ("completed", "Completed"),
+        ("expired", "Expired"),
     ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -126,16 +421,177 @@ class Reservation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Statuses that hold the property's nights
+    BLOCKING_STATUSES = ["pending", "confirmed"]
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Finds the reservations changed since the analytics watermark
+            models.Index(fields=["updated_at"], name="reservation_updated_at"),
+            # Find the holds and the stays the lifecycle sweep moves on
+            models.Index(
+                fields=["status", "created_at"], name="reservation_status_created"
+            ),
+            models.Index(
+                fields=["status", "check_out"], name="reservation_status_check_out"
+            ),
+        ]
 
     def __str__(self):
         return f"Reservation for {self.property.title} by {self.guest.email}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_stay = instance._stay_key()
+        if not {"guest_id", "property_id", "status"} & instance.get_deferred_fields():
+            instance._loaded_parties = (
+                instance.guest_id,
+                instance.property_id,
+                instance.status,
+            )
+        return instance
+
+    def _stay_key(self):
+        fields = ("property_id", "check_in", "check_out", "status")
+        if any(field in self.get_deferred_fields() for field in fields):
+            return None
+        return tuple(getattr(self, field) for field in fields)
+
     def save(self, *args, **kwargs):
         # Calculate nights
         self.nights = (self.check_out - self.check_in).days
-        super().save(*args, **kwargs)
+        stay = self._stay_key()
+        if not self._state.adding and stay == getattr(self, "_loaded_stay", None):
+            super().save(*args, **kwargs)
+            return
+
+        # The reservation and its booked nights are written together, so
+        # availability never disagrees with the reservation table.
+        using = kwargs.get("using") or router.db_for_write(Reservation, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            self.sync_booked_nights(using=using)
+        self._loaded_stay = stay
+
+    def get_stay_nights(self):
+        """Return the dates of each night of the stay"""
+        return [self.check_in + timedelta(days=n) for n in range(self.nights)]
+
+    def sync_booked_nights(self, using=None):
+        nights = BookedNight.objects.using(using)
+        nights.filter(reservation=self).delete()
+        if self.status in self.BLOCKING_STATUSES:
+            nights.bulk_create(
+                BookedNight(property_id=self.property_id, reservation=self, night=night)
+                for night in self.get_stay_nights()
+            )
+
+
+class BookedNight(models.Model):
+    """
+    One row per night held by a pending or confirmed reservation.
+
+    Searches answer "is this property free between these dates" with an
+    indexed lookup on (property, night) instead of scanning reservations,
+    and the uniqueness of that pair rules out double bookings.
+    """
+
+    property = models.ForeignKey(
+        Property, on_delete=models.CASCADE, related_name="booked_nights"
+    )
+    reservation = models.ForeignKey(
+        Reservation, on_delete=models.CASCADE, related_name="booked_nights"
+    )
+    night = models.DateField()
+
+    class Meta:
+        ordering = ["property", "night"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["property", "night"], name="unique_booked_night"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.property_id} booked on {self.night}"
+
+
+class MonthlyRollup(models.Model):
+    """
+    Booked nights and revenue of one property in one calendar month, for
+    the host analytics (see property.analytics).
+    """
+
+    property = models.ForeignKey(
+        Property, on_delete=models.CASCADE, related_name="monthly_rollups"
+    )
+    # First day of the month
+    month = models.DateField()
+    nights = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    check_ins = models.PositiveIntegerField(default=0)
+    # 1 in the month the property was created
+    listings_added = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["property", "month"], name="unique_monthly_rollup"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.property_id} in {self.month:%Y-%m}"
+
+
+class HostMonthlyRollup(models.Model):
+    """Sum of the monthly rollups of all of a host's properties"""
+
+    host = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="monthly_rollups",
+    )
+    month = models.DateField()
+    nights = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    check_ins = models.PositiveIntegerField(default=0)
+    # The host's current properties created in the month
+    listings_added = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["host", "month"], name="unique_host_monthly_rollup"
+            )
+        ]
+
+    def __str__(self):
+        return f"Host {self.host_id} in {self.month:%Y-%m}"
+
+
+class StaleRollup(models.Model):
+    """
+    Property whose rollups need recomputing because one of its reservations
+    was deleted, which the ``updated_at`` watermark cannot see. Not foreign
+    keys, so queueing works while the property itself is being deleted; the
+    host is kept because its totals need redoing either way.
+    """
+
+    property_id = models.UUIDField(primary_key=True)
+    host_id = models.BigIntegerField(null=True)
+
+
+class RollupWatermark(models.Model):
+    """Reservations updated after ``value`` are not in the rollups yet"""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} at {self.value}"
 
 
 class Review(models.Model):
@@ -163,6 +619,37 @@ class Review(models.Model):
     def __str__(self):
         return f"Review for {self.property.title} by {self.guest.email}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if not {"property_id", "rating"} & instance.get_deferred_fields():
+            instance._loaded_rating = (instance.property_id, instance.rating)
+        if not {"guest_id", "property_id"} & instance.get_deferred_fields():
+            instance._loaded_parties = (instance.guest_id, instance.property_id)
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        old = getattr(self, "_loaded_rating", None)
+        new = (self.property_id, self.rating)
+        using = kwargs.get("using") or router.db_for_write(Review, instance=self)
+
+        # The review and its property's rating aggregates are written together
+        # (deletes are handled by a post_delete signal).
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            properties = Property.objects.using(using)
+            if adding:
+                properties.filter(pk=self.property_id).add_ratings(1, self.rating)
+            elif old is None or old == new:
+                # Comment edit, or the old rating is unknown because it was
+                # deferred; recompute_ratings reconciles the latter.
+                properties.filter(pk=self.property_id).touch()
+            else:
+                properties.filter(pk=old[0]).add_ratings(-1, -old[1])
+                properties.filter(pk=self.property_id).add_ratings(1, self.rating)
+        self._loaded_rating = new
+
 
 class Wishlist(models.Model):
     user = models.ForeignKey(
@@ -0,0 +1,217 @@
+from base64 import b64decode, b64encode
+from collections import namedtuple
+from urllib import parse
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+Cursor = namedtuple("Cursor", ["value", "pk", "reverse"])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination on a single ordering field plus the primary key.
+
+    The cursor stores the ordering value and primary key of the boundary row,
+    so the next page is fetched with a ``(field, pk) > (value, pk)`` predicate
+    instead of an OFFSET. Rows inserted between requests never shift a page,
+    and no COUNT(*) is issued.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 20
+    max_page_size = 100
+    ordering = "-created_at"
+    ordering_fields = ["created_at"]
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views"""
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.set_page([row async for row in queryset])
+
+    def get_page_queryset(self, queryset, request, view):
+        """Return the unevaluated query for the page and one row beyond it"""
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.field, self.descending = self.get_ordering(request, queryset, view)
+        self.pk_name = queryset.model._meta.pk.name
+        self.cursor = self.decode_cursor(request, queryset)
+
+        reverse = self.cursor.reverse if self.cursor else False
+        descending = self.descending != reverse
+        if descending:
+            queryset = queryset.order_by(f"-{self.field}", "-pk")
+        else:
+            queryset = queryset.order_by(self.field, "pk")
+
+        if self.cursor is not None:
+            lookup = "lt" if descending else "gt"
+            queryset = queryset.filter(
+                Q(**{f"{self.field}__{lookup}": self.cursor.value})
+                | Q(**{self.field: self.cursor.value, f"pk__{lookup}": self.cursor.pk})
+            )
+
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if self.cursor is not None and self.cursor.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Return ``(field, descending)`` for the first ordering term.
+
+        Views with an ``OrderingFilter`` backend resolve the ``ordering``
+        query parameter through it; function views fall back to
+        ``ordering_fields`` on the paginator.
+        """
+        ordering = None
+        filter_backends = getattr(view, "filter_backends", [])
+        ordering_filters = [
+            backend
+            for backend in filter_backends
+            if issubclass(backend, OrderingFilter)
+        ]
+        if ordering_filters:
+            ordering = ordering_filters[0]().get_ordering(request, queryset, view)
+        else:
+            param = request.query_params.get(OrderingFilter.ordering_param, "")
+            terms = [term.strip() for term in param.split(",") if term.strip()]
+            ordering = [
+                term for term in terms if term.lstrip("-") in self.ordering_fields
+            ]
+
+        ordering = [
+            term for term in ordering or [] if self.is_orderable(queryset, term)
+        ]
+        term = ordering[0] if ordering else self.ordering
+        return term.lstrip("-"), term.startswith("-")
+
+    def is_orderable(self, queryset, term):
+        return self.get_field(queryset, term.lstrip("-")) is not None
+
+    def get_field(self, queryset, name):
+        """Return the model field or annotation output field ``name``, or None"""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        try:
+            return queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def decode_cursor(self, request, queryset):
+        """
+        Return the requested ``Cursor``, its value and primary key converted
+        for ``queryset``, or None; a malformed or tampered cursor is a 400.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            querystring = b64decode(encoded.encode("ascii")).decode("ascii")
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            value = self.get_field(queryset, self.field).to_python(tokens["v"][0])
+            pk = queryset.model._meta.pk.to_python(tokens["i"][0])
+            reverse = bool(int(tokens.get("r", ["0"])[0]))
+        except (TypeError, ValueError, KeyError, UnicodeError, DjangoValidationError):
+            raise ValidationError(
+                {self.cursor_query_param: self.invalid_cursor_message}
+            )
+
+        return Cursor(value=value, pk=pk, reverse=reverse)
+
+    def encode_cursor(self, cursor):
+        tokens = {"v": cursor.value, "i": cursor.pk}
+        if cursor.reverse:
+            tokens["r"] = "1"
+        querystring = parse.urlencode(tokens, doseq=True)
+        encoded = b64encode(querystring.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_position(self, instance, reverse):
+        if isinstance(instance, dict):
+            # A ``.values()`` row
+            value, pk = instance[self.field], instance[self.pk_name]
+        else:
+            value, pk = getattr(instance, self.field), instance.pk
+        if hasattr(value, "isoformat"):
+            value = value.isoformat()
+        return Cursor(value=str(value), pk=str(pk), reverse=reverse)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Walked backwards off the start of the list; restart from the top.
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.get_position(self.page[-1], reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0], reverse=True))
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+
+class PropertyCursorPagination(KeysetPagination):
+    """Keyset pagination over the property list ordering fields"""
+
+    ordering_fields = [
+        "created_at",
+        "price_per_night",
+        "average_rating",
+        "search_rank",
+        "distance",
+    ]
@@ -0,0 +1,73 @@
+"""
+Rating aggregates.
+
+``Property.review_count``, ``rating_sum`` and ``average_rating`` are kept up
+to date incrementally by ``Review.save`` and a post_delete signal (see
+``PropertyQuerySet.add_ratings``). ``recompute`` rebuilds them from the
+reviews table in batches of properties, with one grouped query per batch,
+so it never holds more than one batch in memory. Corrected properties get a
+new version and invalidate the cached responses that show them.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from . import response_cache
+from .models import Property, Review
+
+RATING_FIELDS = ["review_count", "rating_sum", "average_rating"]
+
+
+def average_rating(rating_sum, review_count):
+    if not review_count:
+        return Decimal("0.00")
+    return (Decimal(rating_sum) / review_count).quantize(
+        Decimal("0.01"), rounding=ROUND_HALF_UP
+    )
+
+
+def recompute(batch_size=1000):
+    """Return the number of properties whose aggregates were corrected"""
+    properties = Property.objects.only("id", *RATING_FIELDS).order_by("pk")
+    corrected = 0
+    last_pk = None
+    while True:
+        page = properties if last_pk is None else properties.filter(pk__gt=last_pk)
+        with transaction.atomic():
+            # Locking the batch holds back concurrent add_ratings() calls
+            # until the recomputed values are written.
+            batch = list(page.select_for_update()[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            totals = {
+                row["property_id"]: (row["count"], row["total"])
+                for row in Review.objects.filter(property__in=batch)
+                .order_by()
+                .values("property_id")
+                .annotate(count=Count("pk"), total=Sum("rating"))
+            }
+
+            changed = []
+            for prop in batch:
+                count, total = totals.get(prop.pk, (0, 0))
+                values = (count, total, average_rating(total, count))
+                if (prop.review_count, prop.rating_sum, prop.average_rating) != values:
+                    prop.review_count, prop.rating_sum, prop.average_rating = values
+                    prop.version = F("version") + 1
+                    prop.updated_at = timezone.now()
+                    changed.append(prop)
+            Property.objects.bulk_update(
+                changed, [*RATING_FIELDS, "version", "updated_at"]
+            )
+            if changed:
+                # bulk_update() sends no post_save
+                response_cache.bump(
+                    response_cache.LISTINGS,
+                    *(response_cache.property_generation(prop.pk) for prop in changed),
+                )
+            corrected += len(changed)
+    return corrected
@@ -0,0 +1,46 @@
+"""
+JSON rendering.
+
+``FastJSONRenderer`` produces the same bytes as DRF's compact
+``JSONRenderer`` but encodes with orjson when it is installed. orjson writes
+UUIDs, dicts, lists and their subclasses natively; Decimals and datetimes
+are handed to DRF's own encoder so their representation does not change.
+Without orjson, or when indented output is asked for, it falls back to
+``JSONRenderer``.
+"""
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def dumps(data):
+    """Encode ``data`` exactly as the compact ``JSONRenderer`` would"""
+    if orjson is None:
+        return JSONRenderer().render(data)
+    ret = orjson.dumps(
+        data,
+        default=_encoder.default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+    )
+    # JSONRenderer escapes these so the output is a strict JavaScript subset
+    return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
@@ -0,0 +1,178 @@
+"""
+Read replicas with read-your-writes.
+
+``SQL_REPLICAS`` adds the replicas to ``DATABASES`` as ``replica_1``,
+``replica_2`` and so on. ``ReplicaRouter`` only sends reads to one of them
+for GET, HEAD and OPTIONS requests to REPLICA_VIEWS, once the request is
+authenticated; writes, every other request and code that runs outside a
+request (management commands, tasks) use ``default``.
+
+Once a request writes, the rest of it reads from ``default``, and so do the
+user's requests for the next ``REPLICA_PIN_SECONDS``: a new reservation or
+wishlist item shows up at once for whoever made it, however far behind the
+replicas are. Cached responses whose generations changed within that window
+are also built from ``default`` (see ``response_cache``), so an entry for
+the new generation is never filled from a replica that has not caught up.
+
+``simulate_replication`` copies a SQLite primary to SQLite replicas with a
+delay, to try this out without a real replication setup.
+"""
+
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import LazyObject
+
+from .throttling import view_name
+
+# Views whose safe requests may read from a replica
+REPLICA_VIEWS = {
+    "property:property-list-create",
+    "property:property-search",
+    "property:property-detail",
+    "property:property-reviews",
+}
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_routing = ContextVar("replica_routing", default=None)
+
+
+def _pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+def _known_user(request):
+    # Until DRF authenticates the request, request.user is the lazy session
+    # user, and loading it must not go through the router.
+    user = request.__dict__.get("user")
+    if user is None or isinstance(user, LazyObject):
+        return None
+    return user
+
+
+class Routing:
+    """Where the reads of one request go"""
+
+    # Not decided yet
+    UNDECIDED = object()
+
+    def __init__(self, request):
+        self.request = request
+        self.wrote = False
+        self.primary = False
+        self.replica = self.UNDECIDED
+
+    def can_use_replica(self):
+        return (
+            not self.wrote
+            and not self.primary
+            and self.request.method in SAFE_METHODS
+            and view_name(self.request) in REPLICA_VIEWS
+            # Reads inside a transaction must see its writes
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        )
+
+    def choose(self, pinned):
+        self.replica = None if pinned else random.choice(settings.DATABASE_REPLICAS)
+
+    def get_replica(self):
+        """Return the replica to read from, or None for ``default``"""
+        if not self.can_use_replica():
+            return None
+        if self.replica is self.UNDECIDED:
+            user = _known_user(self.request)
+            if user is None:
+                return None
+            self.choose(user.is_authenticated and cache.get(_pin_key(user.pk)))
+        return self.replica
+
+    def pin_key(self):
+        """Cache key pinning the user to ``default``, if this request wrote"""
+        user = _known_user(self.request)
+        if self.wrote and user is not None and user.is_authenticated:
+            return _pin_key(user.pk)
+        return None
+
+
+def use_primary():
+    """Read from ``default`` for the rest of this request"""
+    routing = _routing.get()
+    if routing is not None:
+        routing.primary = True
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None:
+            return None
+        return routing.get_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        # Even for instances that were read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema from the primary
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Track the reads and writes of each request for ReplicaRouter, and pin
+    users who wrote to ``default`` for REPLICA_PIN_SECONDS. Not used when
+    there are no replicas.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        routing = Routing(request)
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        pin_key = routing.pin_key()
+        if pin_key is not None:
+            cache.set(pin_key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        routing = Routing(request)
+        token = _routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        pin_key = routing.pin_key()
+        if pin_key is not None:
+            await cache.aset(pin_key, True, settings.REPLICA_PIN_SECONDS)
+        return response
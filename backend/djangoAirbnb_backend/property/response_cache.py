@@ -0,0 +1,202 @@
+"""
+Versioned response cache for the public property endpoints.
+
+Cached payloads are keyed on the view, the normalized query parameters and
+the current value of one or more generation counters. Signal handlers bump
+exactly the counters a write can affect, which makes every older key
+unreachable without having to find and delete it. The per-user
+``is_wishlisted`` flag is written into the payload after the lookup, so one
+cache entry serves every user.
+
+Generations hold the time of the last change in nanoseconds, which also
+gives list pages a ``Last-Modified`` date without touching the database.
+"""
+
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from rest_framework.response import Response
+
+from . import conditional, replicas
+from .serializers import awishlisted_property_ids, wishlisted_property_ids
+
+# Any change to a listing that can show up in list or search results
+LISTINGS = "listings"
+# Any change to which nights are booked
+AVAILABILITY = "availability"
+
+
+def property_generation(pk):
+    return f"property:{pk}"
+
+
+def listing_generations(check_in, check_out):
+    """Generations a property list depends on"""
+    if check_in and check_out:
+        return [LISTINGS, AVAILABILITY]
+    return [LISTINGS]
+
+
+def _counter_key(name):
+    return f"generation:{name}"
+
+
+def get_generations(names):
+    keys = [_counter_key(name) for name in names]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            # Seed from the clock so a counter that was evicted can never
+            # come back with a value an older entry was stored under.
+            cache.add(key, time.time_ns(), None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+async def aget_generations(names):
+    keys = [_counter_key(name) for name in names]
+    values = await cache.aget_many(keys)
+    for key in keys:
+        if key not in values:
+            await cache.aadd(key, time.time_ns(), None)
+            values[key] = await cache.aget(key)
+    return [values[key] for key in keys]
+
+
+def _bump_now(names):
+    for name in names:
+        key = _counter_key(name)
+        # Always move forward, even if this server's clock is behind the
+        # one that set the current value.
+        current = cache.get(key) or 0
+        cache.set(key, max(time.time_ns(), current + 1), None)
+
+
+def bump(*names):
+    """Invalidate every response cached under the given generations"""
+    transaction.on_commit(lambda: _bump_now(names))
+
+
+def _normalized_params(query_params):
+    return sorted(
+        (name, sorted(value for value in values if value != ""))
+        for name, values in query_params.lists()
+        if any(value != "" for value in values)
+    )
+
+
+def _response_hash(request, view_name, generation_values):
+    payload = json.dumps(
+        [
+            view_name,
+            request.get_host(),
+            _normalized_params(request.query_params),
+            generation_values,
+        ],
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def stitch_wishlist(data, wishlisted_ids):
+    """Set ``is_wishlisted`` on a property payload or a page of them"""
+    ids = {str(pk) for pk in wishlisted_ids}
+    for prop in data["results"] if "results" in data else [data]:
+        prop["is_wishlisted"] = prop["id"] in ids
+    return data
+
+
+def _check_replicas(values):
+    if time.time_ns() - max(values) < settings.REPLICA_PIN_SECONDS * 1e9:
+        # The replicas may not have the change behind the newest generation
+        replicas.use_primary()
+
+
+def _validators(request, response_hash, values, wishlisted_ids):
+    """Return ``(etag, last_modified)`` for a cached response"""
+    if request.user.is_authenticated:
+        # Wishlist changes carry no timestamp, so only the ETag sees them.
+        etag = conditional.make_etag(
+            response_hash, sorted(str(pk) for pk in wishlisted_ids)
+        )
+        return etag, None
+    last_modified = datetime.fromtimestamp(max(values) / 1e9, tz=timezone.utc)
+    return f'"{response_hash}"', last_modified
+
+
+def _cached(data, wishlisted_ids, validators):
+    response = Response(stitch_wishlist(data, wishlisted_ids))
+    if validators is not None:
+        conditional.set_validators(response, *validators)
+        patch_vary_headers(response, ["Authorization"])
+    return response
+
+
+def cached_response(
+    request, view_name, generations, build, wishlisted_ids=None, validate=True
+):
+    """
+    Return the cached payload for this request, or call ``build()`` and
+    cache its payload if it is a 200; streamed responses are passed through.
+    ``is_wishlisted`` is filled in for the requesting user on both paths,
+    from ``wishlisted_ids`` if given.
+
+    With ``validate`` the response also gets an ETag derived from the cache
+    key and the user's wishlist (plus Last-Modified for anonymous requests),
+    and conditional requests are answered with a 304 before the cache is
+    read.
+    """
+    if wishlisted_ids is None:
+        wishlisted_ids = wishlisted_property_ids(request)
+    values = get_generations(generations)
+    _check_replicas(values)
+    response_hash = _response_hash(request, view_name, values)
+    validators = None
+    if validate:
+        validators = _validators(request, response_hash, values, wishlisted_ids)
+        response = conditional.not_modified(request, *validators)
+        if response is not None:
+            return response
+
+    key = f"response:{response_hash}"
+    data = cache.get(key)
+    if data is None:
+        response = build()
+        if response.status_code != 200 or response.streaming:
+            return response
+        data = response.data
+        cache.set(key, data, settings.RESPONSE_CACHE_TIMEOUT)
+    return _cached(data, wishlisted_ids, validators)
+
+
+async def acached_response(
+    request, view_name, generations, build, wishlisted_ids=None, validate=True
+):
+    """``cached_response`` for async views, where ``build`` is a coroutine"""
+    if wishlisted_ids is None:
+        wishlisted_ids = await awishlisted_property_ids(request)
+    values = await aget_generations(generations)
+    _check_replicas(values)
+    response_hash = _response_hash(request, view_name, values)
+    validators = None
+    if validate:
+        validators = _validators(request, response_hash, values, wishlisted_ids)
+        response = conditional.not_modified(request, *validators)
+        if response is not None:
+            return response
+
+    key = f"response:{response_hash}"
+    data = await cache.aget(key)
+    if data is None:
+        response = await build()
+        if response.status_code != 200 or response.streaming:
+            return response
+        data = response.data
+        await cache.aset(key, data, settings.RESPONSE_CACHE_TIMEOUT)
+    return _cached(data, wishlisted_ids, validators)
@@ -0,0 +1,156 @@
+"""
+Full-text destination search.
+
+PostgreSQL keeps a weighted ``tsvector`` in ``Property.search_vector`` behind
+a GIN index. SQLite keeps an FTS5 shadow table, ``property_search_fts``, with
+one row per property. Other backends fall back to ``icontains`` matching.
+"""
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "property_search_fts"
+
+# Location is what guests type into the destination box, so it outranks
+# the title, which outranks the free-text description.
+SEARCH_WEIGHTS = {"location": "A", "title": "B", "description": "C"}
+BM25_WEIGHTS = {"location": 10.0, "title": 5.0, "description": 1.0}
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_vector():
+    vectors = [
+        SearchVector(field, weight=weight) for field, weight in SEARCH_WEIGHTS.items()
+    ]
+    combined = vectors[0]
+    for vector in vectors[1:]:
+        combined = combined + vector
+    return combined
+
+
+def _vendor(using):
+    return connections[using].vendor
+
+
+def _fts_query(destination):
+    # Every term must match, each as a prefix, which mirrors what users
+    # expect from the old substring search ("par" finds "Paris").
+    return " ".join(f'"{token}"*' for token in TOKEN_RE.findall(destination))
+
+
+def _tsquery(destination):
+    # The same terms and prefixes as _fts_query, for PostgreSQL's
+    # to_tsquery(); tokens are word characters only, so quoting is safe.
+    return " & ".join(f"'{token}':*" for token in TOKEN_RE.findall(destination))
+
+
+def _fts_pk(property_id):
+    # UUIDs are stored as 32-character hex strings on SQLite.
+    return property_id.hex
+
+
+def index_property(instance, using="default"):
+    """Refresh the search document for a single saved property"""
+    from .models import Property
+
+    vendor = _vendor(using)
+    if vendor == "postgresql":
+        Property.objects.using(using).filter(pk=instance.pk).update(
+            search_vector=search_vector()
+        )
+    elif vendor == "sqlite":
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE property_id = %s",
+                [_fts_pk(instance.pk)],
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (property_id, location, title, description) "
+                "VALUES (%s, %s, %s, %s)",
+                [
+                    _fts_pk(instance.pk),
+                    instance.location,
+                    instance.title,
+                    instance.description,
+                ],
+            )
+
+
+def unindex_property(instance, using="default"):
+    if _vendor(using) == "sqlite":
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE property_id = %s",
+                [_fts_pk(instance.pk)],
+            )
+
+
+def rebuild_index(using="default"):
+    """Rebuild every search document, e.g. after ``bulk_create``"""
+    from .models import Property
+
+    vendor = _vendor(using)
+    if vendor == "postgresql":
+        Property.objects.using(using).update(search_vector=search_vector())
+    elif vendor == "sqlite":
+        table = Property._meta.db_table
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (property_id, location, title, description) "
+                f"SELECT id, location, title, description FROM {table}"
+            )
+
+
+def filter_by_destination(queryset, destination):
+    """
+    Restrict ``queryset`` to properties matching ``destination`` and
+    annotate each row with a ``search_rank`` (higher is more relevant).
+    """
+    vendor = _vendor(queryset.db)
+    if vendor == "postgresql":
+        tsquery = _tsquery(destination)
+        if not tsquery:
+            return with_default_rank(queryset)
+        # to_tsquery(), which unlike websearch_to_tsquery() supports :*
+        query = SearchQuery(tsquery, search_type="raw")
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F("search_vector"), query)
+        )
+
+    if vendor == "sqlite":
+        match = _fts_query(destination)
+        if not match:
+            return with_default_rank(queryset)
+        table = queryset.model._meta.db_table
+        weights = ", ".join(str(weight) for weight in BM25_WEIGHTS.values())
+        # bm25() is lower-is-better, so negate it to match ts_rank.
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, 0, {weights}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND property_id = {table}.id",
+            [match],
+            output_field=FloatField(),
+        )
+        matches = RawSQL(
+            f"SELECT property_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [match],
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+    return with_default_rank(
+        queryset.filter(
+            Q(location__icontains=destination)
+            | Q(title__icontains=destination)
+            | Q(description__icontains=destination)
+        )
+    )
+
+
+def with_default_rank(queryset):
+    """Annotate a constant rank so ``ordering=-search_rank`` is always valid"""
+    return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
@@ -1,6 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.utils import timezone
+from datetime import date
 from .models import Property, PropertyImage, Reservation, Review, Wishlist
+from . import booking
+from .clusters import MAX_ZOOM
 
 User = get_user_model()
 
@@ -17,12 +22,53 @@ class HostSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "email", "avatar", "bio", "is_host"]
 
 
+def property_eager_loading(queryset, prefix=""):
+    """Attach the host join and ordered images prefetch a nested property needs"""
+    return queryset.select_related(f"{prefix}host").prefetch_related(
+        Prefetch(
+            f"{prefix}images",
+            queryset=PropertyImage.objects.order_by("order", "id"),
+        )
+    )
+
+
+def wishlisted_property_ids(request):
+    """IDs of the properties on the requesting user's wishlist"""
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return set()
+    return set(Wishlist.objects.filter(user=user).values_list("property_id", flat=True))
+
+
+async def awishlisted_property_ids(request):
+    """``wishlisted_property_ids`` for async views"""
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return set()
+    return {
+        pk
+        async for pk in Wishlist.objects.filter(user=user).values_list(
+            "property_id", flat=True
+        )
+    }
+
+
+def is_wishlisted(serializer, obj):
+    # One query per serialization: the ID set lives in the root serializer's
+    # context, which every nested and list child shares.
+    context = serializer.context
+    if "wishlisted_ids" not in context:
+        context["wishlisted_ids"] = wishlisted_property_ids(context.get("request"))
+    return obj.pk in context["wishlisted_ids"]
+
+
 class PropertyListSerializer(serializers.ModelSerializer):
     """Serializer for property list view (basic info)"""
 
     images = PropertyImageSerializer(many=True, read_only=True)
     host = HostSerializer(read_only=True)
     amenities_list = serializers.SerializerMethodField()
+    is_wishlisted = serializers.SerializerMethodField()
 
     class Meta:
         model = Property
@@ -41,11 +87,19 @@ class PropertyListSerializer(serializers.ModelSerializer):
             "host",
             "amenities_list",
             "is_available",
+            "is_wishlisted",
         ]
 
     def get_amenities_list(self, obj):
         return obj.get_amenities_list()
 
+    def get_is_wishlisted(self, obj):
+        return is_wishlisted(self, obj)
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return property_eager_loading(queryset)
+
 
 class PropertyDetailSerializer(serializers.ModelSerializer):
     """Serializer for property detail view (full info)"""
@@ -84,10 +138,11 @@ class PropertyDetailSerializer(serializers.ModelSerializer):
         return obj.get_amenities_list()
 
     def get_is_wishlisted(self, obj):
-        user = self.context.get("request").user
-        if user.is_authenticated:
-            return Wishlist.objects.filter(user=user, property=obj).exists()
-        return False
+        return is_wishlisted(self, obj)
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return property_eager_loading(queryset)
 
 
 class PropertyCreateUpdateSerializer(serializers.ModelSerializer):
@@ -121,10 +176,9 @@ class PropertyCreateUpdateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         amenities_list = validated_data.pop("amenities_list", [])
-        property_instance = Property.objects.create(**validated_data)
-        if amenities_list:
-            property_instance.set_amenities_list(amenities_list)
-            property_instance.save()
+        property_instance = Property(**validated_data)
+        property_instance.set_amenities_list(amenities_list)
+        property_instance.save()
         return property_instance
 
     def update(self, instance, validated_data):
@@ -159,7 +213,8 @@ class ReservationSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ["nights", "total_price"]
+        # Status changes go through the lifecycle endpoints
+        read_only_fields = ["nights", "total_price", "status", "payment_status"]
 
     def validate(self, data):
         check_in = data.get("check_in")
@@ -171,45 +226,31 @@ class ReservationSerializer(serializers.ModelSerializer):
                     "Check-out date must be after check-in date."
                 )
 
-            # Calculate nights and total price
-            nights = (check_out - check_in).days
-            if nights < 1:
+            if (check_out - check_in).days < 1:
                 raise serializers.ValidationError("Minimum stay is 1 night.")
 
-            # Get property to validate capacity and calculate price
-            property_id = data.get("property_id")
-            if property_id:
-                try:
-                    property_obj = Property.objects.get(id=property_id)
-                    if data.get("guests_count", 0) > property_obj.guests:
-                        raise serializers.ValidationError(
-                            f"Maximum {property_obj.guests} guests allowed."
-                        )
-
-                    if nights < property_obj.minimum_nights:
-                        raise serializers.ValidationError(
-                            f"Minimum stay is {property_obj.minimum_nights} nights."
-                        )
-
-                    if nights > property_obj.maximum_nights:
-                        raise serializers.ValidationError(
-                            f"Maximum stay is {property_obj.maximum_nights} nights."
-                        )
-
-                    # Calculate total price
-                    data["total_price"] = property_obj.price_per_night * nights
-                    data["nights"] = nights
-
-                except Property.DoesNotExist:
-                    raise serializers.ValidationError("Property not found.")
-
         return data
 
     def create(self, validated_data):
-        property_id = validated_data.pop("property_id")
-        property_obj = Property.objects.get(id=property_id)
-        validated_data["property"] = property_obj
-        return super().create(validated_data)
+        # Capacity, stay length, price and overlap are checked by the booking
+        # engine under a lock on the property row, which is read only once.
+        return booking.create_reservation(**validated_data)
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        queryset = queryset.select_related("guest")
+        return property_eager_loading(queryset, prefix="property__")
+
+
+class ReservationStatusSerializer(serializers.ModelSerializer):
+    """Serializer for a guest's status change, answered with the reservation"""
+
+    class Meta:
+        model = Reservation
+        fields = ["status"]
+
+    def to_representation(self, instance):
+        return ReservationSerializer(instance, context=self.context).data
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -221,6 +262,11 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ["id", "property", "guest", "rating", "comment", "created_at"]
         read_only_fields = ["property", "guest"]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        queryset = queryset.select_related("guest")
+        return property_eager_loading(queryset, prefix="property__")
+
 
 class WishlistSerializer(serializers.ModelSerializer):
     property = PropertyListSerializer(read_only=True)
@@ -229,6 +275,103 @@ class WishlistSerializer(serializers.ModelSerializer):
         model = Wishlist
         fields = ["id", "property", "created_at"]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return property_eager_loading(queryset, prefix="property__")
+
+
+class WishlistBulkSerializer(serializers.Serializer):
+    """Serializer for adding and removing many wishlist entries at once"""
+
+    add = serializers.ListField(
+        child=serializers.UUIDField(), required=False, default=list, max_length=500
+    )
+    remove = serializers.ListField(
+        child=serializers.UUIDField(), required=False, default=list, max_length=500
+    )
+
+    def validate(self, data):
+        if not data["add"] and not data["remove"]:
+            raise serializers.ValidationError("Nothing to add or remove.")
+        if set(data["add"]) & set(data["remove"]):
+            raise serializers.ValidationError(
+                "A property cannot be both added and removed."
+            )
+        return data
+
+
+class ExportSerializer(serializers.Serializer):
+    """Serializer for export filters"""
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    after = serializers.UUIDField(required=False)
+
+    def validate(self, data):
+        if "start" in data and "end" in data and data["start"] > data["end"]:
+            raise serializers.ValidationError("start must not be after end.")
+        return data
+
+
+class HostAnalyticsSerializer(serializers.Serializer):
+    """Serializer for host analytics filters, months given as YYYY-MM"""
+
+    MAX_MONTHS = 120
+
+    start = serializers.DateField(input_formats=["%Y-%m"], required=False)
+    end = serializers.DateField(input_formats=["%Y-%m"], required=False)
+    property = serializers.UUIDField(required=False)
+
+    def validate(self, data):
+        # Default to the last twelve months, this one included
+        end = data.get("end") or timezone.now().date().replace(day=1)
+        if "start" not in data:
+            first = end.year * 12 + end.month - 12
+            data["start"] = date(first // 12, first % 12 + 1, 1)
+        start = data["start"]
+        if start > end:
+            raise serializers.ValidationError("start must not be after end.")
+        if (end.year - start.year) * 12 + end.month - start.month >= self.MAX_MONTHS:
+            raise serializers.ValidationError(
+                f"A report covers at most {self.MAX_MONTHS} months."
+            )
+        data["end"] = end
+        return data
+
+
+class ReservationExportSerializer(ExportSerializer):
+    status = serializers.MultipleChoiceField(
+        choices=Reservation.STATUS_CHOICES, required=False
+    )
+
+
+class PropertyExportSerializer(ExportSerializer):
+    status = serializers.MultipleChoiceField(
+        choices=[("available", "Available"), ("unavailable", "Unavailable")],
+        required=False,
+    )
+
+
+class BoundingBoxField(serializers.CharField):
+    """
+    Map viewport given as "min_lng,min_lat,max_lng,max_lat", returned as
+    ``(min_lat, min_lng, max_lat, max_lng)``
+    """
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        try:
+            min_lng, min_lat, max_lng, max_lat = (
+                float(part) for part in value.split(",")
+            )
+        except ValueError:
+            raise serializers.ValidationError("Use min_lng,min_lat,max_lng,max_lat.")
+        if not (-90 <= min_lat <= max_lat <= 90):
+            raise serializers.ValidationError("Invalid latitude range.")
+        if not (-180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+            raise serializers.ValidationError("Invalid longitude range.")
+        return min_lat, min_lng, max_lat, max_lng
+
 
 class PropertySearchSerializer(serializers.Serializer):
     """Serializer for property search parameters"""
@@ -247,3 +390,29 @@ class PropertySearchSerializer(serializers.Serializer):
     amenities = serializers.ListField(
         child=serializers.CharField(), required=False, allow_empty=True
     )
+    bbox = BoundingBoxField(required=False)
+    lat = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    lng = serializers.FloatField(required=False, min_value=-180, max_value=180)
+    radius_km = serializers.FloatField(
+        required=False, min_value=0.1, max_value=500, default=25
+    )
+    facets = serializers.BooleanField(required=False, default=False)
+    price_bucket = serializers.IntegerField(
+        required=False, min_value=1, max_value=10000, default=50
+    )
+    stream = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        if ("lat" in data) != ("lng" in data):
+            raise serializers.ValidationError("lat and lng must be given together.")
+        return data
+
+
+class PropertyClusterSerializer(serializers.Serializer):
+    """Serializer for map cluster parameters"""
+
+    bbox = BoundingBoxField()
+    zoom = serializers.IntegerField(required=False, min_value=0, max_value=MAX_ZOOM)
+    width = serializers.IntegerField(
+        required=False, min_value=1, max_value=8192, default=1024
+    )
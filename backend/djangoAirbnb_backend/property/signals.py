@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import analytics, clusters, lifecycle, response_cache, search
+from .models import Property, PropertyImage, Reservation, Review, deleted_with
+
+User = get_user_model()
+
+SEARCH_FIELDS = {"title", "location", "description"}
+STAY_FIELDS = {"property", "check_in", "check_out", "status"}
+
+
+@receiver(post_save, sender=Property)
+def update_search_document(sender, instance, using, update_fields, **kwargs):
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        search.index_property(instance, using=using)
+
+
+@receiver(post_delete, sender=Property)
+def remove_search_document(sender, instance, using, **kwargs):
+    search.unindex_property(instance, using=using)
+
+
+@receiver(post_save, sender=Property)
+def update_map_clusters(sender, instance, created, using, update_fields, **kwargs):
+    if update_fields is not None and not set(Property.MAP_FIELDS) & set(update_fields):
+        return
+    if not created and not hasattr(instance, "_loaded_map_point"):
+        # Loaded with deferred map fields, so the old position is unknown;
+        # rebuild_map_clusters reconciles such writes.
+        return
+    new_point = instance.get_map_point()
+    clusters.queue_change(
+        getattr(instance, "_loaded_map_point", None), new_point, using=using
+    )
+    instance._loaded_map_point = new_point
+
+
+@receiver(post_delete, sender=Property)
+def remove_from_map_clusters(sender, instance, using, **kwargs):
+    old_point = getattr(instance, "_loaded_map_point", instance.get_map_point())
+    clusters.queue_change(old_point, None, using=using)
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+def touch_property(sender, instance, using, origin=None, **kwargs):
+    if deleted_with(origin, Property, User):
+        return
+    # Images are part of the property's representation. Reviews touch the
+    # property through its rating aggregates.
+    Property.objects.using(using).filter(pk=instance.property_id).touch()
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, using, origin=None, **kwargs):
+    if deleted_with(origin, Property):
+        return
+    # Runs inside the deletion's transaction, so queryset and cascade
+    # deletes are covered too.
+    Property.objects.using(using).filter(pk=instance.property_id).add_ratings(
+        -1, -instance.rating
+    )
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_property_responses(sender, instance, **kwargs):
+    property_id = instance.pk if sender is Property else instance.property_id
+    response_cache.bump(
+        response_cache.LISTINGS, response_cache.property_generation(property_id)
+    )
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def invalidate_availability_responses(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not STAY_FIELDS & set(update_fields):
+        return
+    response_cache.bump(response_cache.AVAILABILITY)
+
+
+@receiver(lifecycle.status_changed, sender=Reservation)
+def invalidate_swept_availability(sender, **kwargs):
+    response_cache.bump(response_cache.AVAILABILITY)
+
+
+@receiver(post_delete, sender=Reservation)
+def queue_monthly_rollups(sender, instance, using, origin=None, **kwargs):
+    if deleted_with(origin, Property, User):
+        return
+    # Deletes leave no updated_at behind for the analytics watermark
+    analytics.queue_property(instance.property_id, using=using)
+
+
+@receiver(pre_delete, sender=Property)
+def queue_cascaded_property_rollups(sender, instance, using, origin=None, **kwargs):
+    if not deleted_with(origin, User):
+        analytics.queue_properties(
+            Property.objects.using(using).filter(pk=instance.pk), using=using
+        )
+
+
+@receiver(pre_delete, sender=User)
+def queue_cascaded_user_rollups(sender, instance, using, **kwargs):
+    # Their properties, and those they stayed at
+    analytics.queue_properties(
+        Property.objects.using(using).filter(
+            Q(host=instance) | Q(reservations__guest=instance)
+        ),
+        using=using,
+    )
@@ -0,0 +1,58 @@
+"""
+Streaming responses for large result sets.
+
+Rows are read with ``QuerySet.iterator(chunk_size=...)`` (a server-side
+cursor on PostgreSQL) and encoded one chunk at a time, so the first bytes go
+out as soon as the first chunk is ready and memory use does not grow with
+the number of rows.
+"""
+
+from django.http import StreamingHttpResponse
+
+from .fast_serialization import property_rows, serialize_properties
+from .renderers import dumps
+
+STREAM_CHUNK_SIZE = 500
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def json_array(chunks, head=b"[", tail=b"]"):
+    """Yield a JSON document whose array is built from ``chunks`` of items"""
+    yield head
+    separator = b""
+    for chunk in chunks:
+        yield separator + b",".join(dumps(item) for item in chunk)
+        separator = b","
+    yield tail
+
+
+def stream_properties(
+    queryset, request, wishlisted_ids, extra=None, chunk_size=STREAM_CHUNK_SIZE
+):
+    """
+    Stream ``{**extra, "results": [...]}`` for every property in the ordered
+    ``queryset``, rendered like ``PropertyListSerializer``.
+    """
+    head = b"{"
+    if extra:
+        head += dumps(extra)[1:-1] + b","
+    head += b'"results":['
+
+    rows = property_rows(queryset).iterator(chunk_size=chunk_size)
+    chunks = (
+        serialize_properties(chunk, request, wishlisted_ids)
+        for chunk in chunked(rows, chunk_size)
+    )
+    return StreamingHttpResponse(
+        json_array(chunks, head=head, tail=b"]}"), content_type="application/json"
+    )
@@ -0,0 +1,411 @@
+"""
+Seeded synthetic data for load and capacity testing.
+
+Properties are generated in fixed-size chunks, each from its own
+``random.Random`` seeded with the run's seed and the chunk number, together
+with their images, amenity tags, reservations, booked nights, reviews and
+wishlist entries. The output therefore only depends on the seed and the
+reference date, whether the chunks run in one process or across a pool.
+
+The distributions aim to look like a marketplace rather than uniform noise:
+
+* listings cluster around a fixed set of cities with a Gaussian spread;
+* a few hosts own most listings and a few listings get most bookings
+  (Pareto weights);
+* stays are denser in each city's high season;
+* ratings skew high.
+
+``bulk_create`` skips ``save()`` and every signal, so each chunk writes the
+derived rows (booked nights, amenity tags, rating aggregates, grid cells)
+itself and ``finish()`` rebuilds the search index, map clusters, user
+stats and analytics rollups.
+"""
+
+import math
+import random
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from operator import attrgetter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from useraccount import stats as user_stats
+
+from . import analytics, clusters, geo, response_cache, search
+from .models import (
+    Amenity,
+    BookedNight,
+    Property,
+    PropertyAmenity,
+    PropertyImage,
+    Reservation,
+    Review,
+    Wishlist,
+)
+from .ratings import average_rating
+
+User = get_user_model()
+
+EMAIL_DOMAIN = "synthetic.example"
+
+# name, country, latitude, longitude, spread in degrees, median nightly
+# price, relative size, day of year at the height of the season
+CITIES = [
+    ("Paris", "France", 48.8566, 2.3522, 0.06, 140, 9, 196),
+    ("London", "United Kingdom", 51.5072, -0.1276, 0.08, 150, 9, 196),
+    ("Barcelona", "Spain", 41.3874, 2.1686, 0.05, 120, 6, 210),
+    ("Rome", "Italy", 41.9028, 12.4964, 0.05, 115, 6, 180),
+    ("Lisbon", "Portugal", 38.7223, -9.1393, 0.05, 95, 4, 210),
+    ("Berlin", "Germany", 52.5200, 13.4050, 0.07, 90, 4, 190),
+    ("New York", "United States", 40.7128, -74.0060, 0.08, 190, 9, 170),
+    ("Miami", "United States", 25.7617, -80.1918, 0.08, 210, 5, 40),
+    ("Los Angeles", "United States", 34.0522, -118.2437, 0.12, 170, 6, 200),
+    ("Denver", "United States", 39.7392, -104.9903, 0.10, 110, 3, 20),
+    ("Mexico City", "Mexico", 19.4326, -99.1332, 0.08, 70, 4, 80),
+    ("Rio de Janeiro", "Brazil", -22.9068, -43.1729, 0.06, 85, 4, 45),
+    ("Cape Town", "South Africa", -33.9249, 18.4241, 0.07, 90, 3, 15),
+    ("Tokyo", "Japan", 35.6762, 139.6503, 0.10, 130, 7, 95),
+    ("Bangkok", "Thailand", 13.7563, 100.5018, 0.08, 55, 5, 355),
+    ("Bali", "Indonesia", -8.4095, 115.1889, 0.15, 80, 4, 210),
+    ("Sydney", "Australia", -33.8688, 151.2093, 0.09, 160, 5, 15),
+]
+
+# type, weight, price factor, (min, max) bedrooms
+PROPERTY_TYPES = [
+    ("apartment", 45, 1.0, (1, 3)),
+    ("house", 15, 1.4, (2, 5)),
+    ("villa", 4, 3.0, (3, 7)),
+    ("cabin", 4, 0.9, (1, 3)),
+    ("loft", 8, 1.2, (1, 2)),
+    ("townhouse", 8, 1.3, (2, 4)),
+    ("cottage", 6, 1.0, (1, 3)),
+    ("other", 2, 0.8, (1, 2)),
+]
+
+AMENITIES = [
+    "WiFi",
+    "Kitchen",
+    "Air conditioning",
+    "Heating",
+    "Washer",
+    "Dryer",
+    "Parking",
+    "Pool",
+    "Hot tub",
+    "Workspace",
+    "TV",
+    "Gym",
+    "Balcony",
+    "Garden",
+    "Beach access",
+    "Fireplace",
+    "Pets allowed",
+    "EV charger",
+]
+
+ADJECTIVES = ["Sunny", "Cozy", "Modern", "Quiet", "Charming", "Spacious", "Bright"]
+STREETS = ["Main St", "Oak Ave", "Harbour Rd", "Station Rd", "Park Lane", "High St"]
+COMMENTS = [
+    "Great stay, would come back.",
+    "Exactly as described.",
+    "Lovely host and a great location.",
+    "A bit noisy at night.",
+    "Clean, comfortable and easy check-in.",
+]
+
+# Stay lengths and their weights
+STAY_NIGHTS = [1, 2, 3, 4, 5, 6, 7, 10, 14]
+STAY_WEIGHTS = [8, 22, 22, 15, 10, 6, 10, 4, 3]
+# Stars 1-5
+RATING_WEIGHTS = [2, 3, 8, 27, 60]
+REVIEW_RATE = 0.65
+
+# Bookings span the past year and the next six months
+PAST_DAYS = 365
+FUTURE_DAYS = 180
+
+
+def _uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _cumulative(weights):
+    total = 0
+    cumulative = []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+
+def _season_weights(first_day, days, peak):
+    """Cumulative booking weight of each day, highest on day of year ``peak``"""
+    weights = []
+    for n in range(days):
+        day_of_year = (first_day + timedelta(days=n)).timetuple().tm_yday
+        weights.append(1 + 0.7 * math.cos(2 * math.pi * (day_of_year - peak) / 365))
+    return _cumulative(weights)
+
+
+def _split(total, parts, index):
+    """Share of ``total`` that falls to part ``index`` of ``parts``"""
+    return total * (index + 1) // parts - total * index // parts
+
+
+class Generator:
+    """
+    A synthetic data set. ``create_users()`` runs once, then every chunk in
+    ``range(chunk_count)`` is written by ``write_chunk()`` in any order and
+    in any process, and ``finish()`` rebuilds the derived indexes.
+    """
+
+    def __init__(
+        self,
+        seed,
+        hosts,
+        guests,
+        properties,
+        reservations,
+        wishlists,
+        today=None,
+        chunk_size=10_000,
+        batch_size=2000,
+    ):
+        self.seed = seed
+        self.hosts = hosts
+        self.guests = guests
+        self.properties = properties
+        self.reservations = reservations
+        self.wishlists = wishlists
+        self.today = today or date.today()
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.chunk_count = math.ceil(properties / chunk_size)
+        self.first_day = self.today - timedelta(days=PAST_DAYS)
+        self.window = PAST_DAYS + FUTURE_DAYS
+
+    def email(self, role, index):
+        return f"{role}-{self.seed}-{index}@{EMAIL_DOMAIN}"
+
+    def exists(self):
+        return User.objects.filter(email=self.email("host", 0)).exists()
+
+    def create_users(self):
+        """Create hosts and guests and everything the chunks share"""
+        password = make_password(None)
+        for role, count in [("host", self.hosts), ("guest", self.guests)]:
+            User.objects.bulk_create(
+                (
+                    User(
+                        email=self.email(role, i),
+                        name=f"{role.title()} {i}",
+                        password=password,
+                        is_host=role == "host",
+                    )
+                    for i in range(count)
+                ),
+                batch_size=self.batch_size,
+            )
+        self.host_pks = self.user_pks("host")
+        self.guest_pks = self.user_pks("guest")
+        rng = random.Random(f"{self.seed}:hosts")
+        # A long tail of single-listing hosts and a few large portfolios
+        self.host_weights = _cumulative(rng.paretovariate(1.1) for _ in self.host_pks)
+
+        self.amenities = [
+            (amenity.name, amenity.pk, amenity.mask)
+            for amenity in Amenity.objects.resolve(AMENITIES)
+        ]
+        self.season_weights = {
+            city[0]: _season_weights(self.first_day, self.window, city[7])
+            for city in CITIES
+        }
+
+    def user_pks(self, role):
+        return list(
+            User.objects.filter(
+                email__startswith=f"{role}-{self.seed}-",
+                email__endswith=f"@{EMAIL_DOMAIN}",
+            )
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+    def write_chunk(self, chunk):
+        """Generate and insert one chunk; return the number of rows per model"""
+        rows = self.generate_chunk(chunk)
+        for model in (Property, Reservation):
+            # Random UUIDs in key order land on neighbouring index pages
+            rows[model].sort(key=attrgetter("pk"))
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                # Throwaway data: trade durability for a bigger page cache
+                # and no fsync per commit, on this connection only
+                cursor.execute("PRAGMA cache_size = -262144")
+                cursor.execute("PRAGMA synchronous = OFF")
+        with transaction.atomic():
+            for model, objects in rows.items():
+                model.objects.bulk_create(objects, batch_size=self.batch_size)
+        return {model.__name__: len(objects) for model, objects in rows.items()}
+
+    def generate_chunk(self, chunk):
+        rng = random.Random(f"{self.seed}:{chunk}")
+        rows = {
+            Property: [],
+            PropertyAmenity: [],
+            PropertyImage: [],
+            Reservation: [],
+            BookedNight: [],
+            Review: [],
+            Wishlist: [],
+        }
+
+        city_weights = _cumulative(city[6] for city in CITIES)
+        type_weights = _cumulative(kind[1] for kind in PROPERTY_TYPES)
+        count = _split(self.properties, self.chunk_count, chunk)
+        cities = rng.choices(CITIES, cum_weights=city_weights, k=count)
+        for city in cities:
+            kind = rng.choices(PROPERTY_TYPES, cum_weights=type_weights)[0]
+            self.generate_property(rng, city, kind, rows)
+        properties = rows[Property]
+
+        # A few listings take most of the bookings and wishlist entries
+        popularity = _cumulative(rng.paretovariate(1.5) for _ in properties)
+        stays = [0] * count
+        for index in rng.choices(
+            range(count),
+            cum_weights=popularity,
+            k=_split(self.reservations, self.chunk_count, chunk),
+        ):
+            stays[index] += 1
+        for prop, city, stay_count in zip(properties, cities, stays):
+            if stay_count:
+                self.generate_stays(rng, prop, city, stay_count, rows)
+
+        wishlisted = set()
+        for _ in range(_split(self.wishlists, self.chunk_count, chunk)):
+            prop = rng.choices(properties, cum_weights=popularity)[0]
+            wishlisted.add((rng.choice(self.guest_pks), prop.pk))
+        rows[Wishlist] = [
+            Wishlist(user_id=user_id, property_id=property_id)
+            for user_id, property_id in sorted(wishlisted, key=str)
+        ]
+        return rows
+
+    def generate_property(self, rng, city, kind, rows):
+        name, country, lat, lng, spread, median_price, _, _ = city
+        property_type, _, price_factor, (min_bedrooms, max_bedrooms) = kind
+        bedrooms = rng.randint(min_bedrooms, max_bedrooms)
+        latitude = Decimal(rng.gauss(lat, spread)).quantize(Decimal("0.000001"))
+        longitude = Decimal(rng.gauss(lng, spread)).quantize(Decimal("0.000001"))
+        amenities = rng.sample(self.amenities, rng.randint(3, 10))
+        price = rng.lognormvariate(math.log(median_price * price_factor), 0.45)
+
+        prop = Property(
+            id=_uuid(rng),
+            title=f"{rng.choice(ADJECTIVES)} {property_type} in {name}",
+            description=f"A {bedrooms}-bedroom {property_type} in {name}.",
+            location=f"{name}, {country}",
+            address=f"{rng.randint(1, 400)} {rng.choice(STREETS)}, {name}",
+            latitude=latitude,
+            longitude=longitude,
+            geo_cell=geo.cell_for(latitude, longitude),
+            property_type=property_type,
+            price_per_night=Decimal(max(price, 15)).quantize(Decimal("0.01")),
+            guests=bedrooms * 2,
+            bedrooms=bedrooms,
+            bathrooms=max(1, bedrooms - rng.randint(0, 2)),
+            amenities=", ".join(amenity[0] for amenity in amenities),
+            amenity_mask=sum(amenity[2] for amenity in amenities),
+            is_available=rng.random() < 0.95,
+            minimum_nights=rng.choice([1, 1, 1, 2, 2, 3]),
+            host_id=rng.choices(self.host_pks, cum_weights=self.host_weights)[0],
+        )
+        rows[Property].append(prop)
+        rows[PropertyAmenity].extend(
+            PropertyAmenity(property_id=prop.pk, amenity_id=amenity[1])
+            for amenity in amenities
+        )
+        rows[PropertyImage].extend(
+            PropertyImage(
+                property_id=prop.pk,
+                image=f"property_images/synthetic/{property_type}-{rng.randrange(40)}.jpg",
+                caption=rng.choice(["", "Living room", "Bedroom", "View"]),
+                is_primary=order == 0,
+                order=order,
+            )
+            for order in range(rng.randint(1, 6))
+        )
+
+    def generate_stays(self, rng, prop, city, count, rows):
+        """Lay ``count`` non-overlapping seasonal stays out along the window"""
+        starts = sorted(
+            rng.choices(
+                range(self.window), cum_weights=self.season_weights[city[0]], k=count
+            )
+        )
+        free_from = 0
+        for start in starts:
+            start = max(start, free_from)
+            nights = rng.choices(STAY_NIGHTS, weights=STAY_WEIGHTS)[0]
+            if start + nights > self.window:
+                break
+            free_from = start + nights
+            check_in = self.first_day + timedelta(days=start)
+            check_out = check_in + timedelta(days=nights)
+
+            if check_out <= self.today:
+                status = "completed" if rng.random() < 0.92 else "cancelled"
+            elif check_in <= self.today:
+                status = "confirmed"
+            else:
+                status = rng.choices(
+                    ["confirmed", "pending", "cancelled"], weights=[70, 15, 15]
+                )[0]
+            reservation = Reservation(
+                id=_uuid(rng),
+                property_id=prop.pk,
+                guest_id=rng.choice(self.guest_pks),
+                check_in=check_in,
+                check_out=check_out,
+                guests_count=rng.randint(1, prop.guests),
+                total_price=prop.price_per_night * nights,
+                nights=nights,
+                status=status,
+                payment_status="pending" if status == "pending" else "paid",
+            )
+            rows[Reservation].append(reservation)
+
+            if status in Reservation.BLOCKING_STATUSES:
+                rows[BookedNight].extend(
+                    BookedNight(
+                        property_id=prop.pk,
+                        reservation_id=reservation.pk,
+                        night=check_in + timedelta(days=n),
+                    )
+                    for n in range(nights)
+                )
+            elif status == "completed" and rng.random() < REVIEW_RATE:
+                rating = rng.choices(range(1, 6), weights=RATING_WEIGHTS)[0]
+                rows[Review].append(
+                    Review(
+                        property_id=prop.pk,
+                        guest_id=reservation.guest_id,
+                        reservation_id=reservation.pk,
+                        rating=rating,
+                        comment=rng.choice(COMMENTS),
+                    )
+                )
+                prop.review_count += 1
+                prop.rating_sum += rating
+        prop.average_rating = average_rating(prop.rating_sum, prop.review_count)
+
+    def finish(self):
+        """Rebuild what bulk_create did not maintain"""
+        search.rebuild_index()
+        clusters.rebuild()
+        user_stats.rebuild()
+        analytics.refresh(full=True)
+        response_cache.bump(response_cache.LISTINGS, response_cache.AVAILABILITY)
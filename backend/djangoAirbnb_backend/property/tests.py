@@ -1,3 +1,1594 @@
-from django.test import TestCase
+import asyncio
+import base64
+import calendar
+import os
+import random
+import sqlite3
+import threading
+import time
+import unittest
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import quote
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import (
+    analytics,
+    booking,
+    clusters,
+    fast_serialization,
+    lifecycle,
+    ratings,
+    replicas,
+    response_cache,
+    search,
+    throttling,
+)
+from .models import (
+    Amenity,
+    BookedNight,
+    Property,
+    PropertyAmenity,
+    PropertyImage,
+    Reservation,
+    Review,
+    StaleRollup,
+    Wishlist,
+)
+from .serializers import PropertyListSerializer, wishlisted_property_ids
+
+REPLICA = "replica_test"
+
+User = get_user_model()
+
+
+def make_property(host, number=0, **fields):
+    fields = {
+        "title": f"Property {number}",
+        "description": "A place to stay",
+        "location": "Paris",
+        "address": f"{number} Rue de Rivoli",
+        "price_per_night": 100 + number % 7,
+        "amenities": "WiFi, Pool",
+        "host": host,
+        **fields,
+    }
+    return Property.objects.create(**fields)
+
+
+def api_client(user=None):
+    client = APIClient()
+    if user is not None:
+        token = RefreshToken.for_user(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return client
+
+
+class QueryCountTests(TestCase):
+    """
+    The read endpoints run as many queries for a thousand rows as for ten:
+    each is measured on a small data set, the data set grows, and the same
+    request must then run exactly as many queries.
+    """
+
+    small, large = 10, 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user("host@example.com", is_host=True)
+        cls.guest = User.objects.create_user("guest@example.com")
+        cls.wifi = Amenity.objects.resolve(["WiFi"])[0]
+        cls.reviewed = make_property(cls.host)
+
+    def grow(self, size):
+        """Give the host, the guest and the reviewed property ``size`` rows each"""
+        count = size - Property.objects.filter(host=self.host).count()
+        first_day = date.today() + timedelta(days=30)
+        properties = Property.objects.bulk_create(
+            Property(
+                title=f"Property {i}",
+                description="A place to stay",
+                location="Paris, France",
+                address=f"{i} Rue de Rivoli",
+                latitude=48.85,
+                longitude=2.35,
+                price_per_night=100 + i % 7,
+                amenities="WiFi",
+                host=self.host,
+            )
+            for i in range(count)
+        )
+        PropertyImage.objects.bulk_create(
+            PropertyImage(property=prop, image="property_images/room.jpg")
+            for prop in properties
+        )
+        PropertyAmenity.objects.bulk_create(
+            PropertyAmenity(property=prop, amenity=self.wifi) for prop in properties
+        )
+        Wishlist.objects.bulk_create(
+            Wishlist(user=self.guest, property=prop) for prop in properties
+        )
+        reservations = Reservation.objects.bulk_create(
+            Reservation(
+                property=self.reviewed,
+                guest=self.guest,
+                check_in=first_day - timedelta(days=2 * i + 400),
+                check_out=first_day - timedelta(days=2 * i + 399),
+                guests_count=1,
+                total_price=100,
+                nights=1,
+                status="completed",
+            )
+            for i in range(count)
+        )
+        Review.objects.bulk_create(
+            Review(
+                property=self.reviewed,
+                guest=self.guest,
+                reservation=reservation,
+                rating=5,
+                comment="Lovely",
+            )
+            for reservation in reservations
+        )
+        search.rebuild_index()
+
+    def assertConstantQueries(self, path, user=None):
+        client = api_client(user)
+        self.grow(self.small)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+
+        self.grow(self.large)
+        cache.clear()
+        with self.assertNumQueries(len(queries)):
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_property_list(self):
+        self.assertConstantQueries(reverse("property:property-list-create"))
+
+    def test_property_list_authenticated(self):
+        self.assertConstantQueries(reverse("property:property-list-create"), self.guest)
+
+    def test_host_properties(self):
+        self.assertConstantQueries(reverse("property:user-properties"), self.host)
+
+    def test_property_detail(self):
+        self.assertConstantQueries(
+            reverse("property:property-detail", args=[self.reviewed.pk]), self.guest
+        )
+
+    def test_search(self):
+        self.assertConstantQueries(
+            reverse("property:property-search") + "?destination=Paris", self.guest
+        )
+
+    def test_search_dates_and_facets(self):
+        check_in = date.today() + timedelta(days=30)
+        self.assertConstantQueries(
+            reverse("property:property-search")
+            + f"?destination=Paris&check_in={check_in}"
+            + f"&check_out={check_in + timedelta(days=3)}&guests=2&facets=true",
+            self.guest,
+        )
+
+    def test_reservations(self):
+        self.assertConstantQueries(reverse("property:reservation-list"), self.guest)
+
+    def test_wishlist(self):
+        self.assertConstantQueries(reverse("property:wishlist"), self.guest)
+
+    def test_reviews(self):
+        self.assertConstantQueries(
+            reverse("property:property-reviews", args=[self.reviewed.pk]), self.guest
+        )
+
+
+class FastSerializationTests(TestCase):
+    """``serialize_properties`` renders exactly what PropertyListSerializer does"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user(
+            "host@example.com",
+            name="Hôte",
+            bio="Hosting since 2010",
+            avatar="avatars/host.png",
+            is_host=True,
+        )
+        cls.other_host = User.objects.create_user("other@example.com")
+        cls.guest = User.objects.create_user("guest@example.com")
+        properties = [
+            make_property(
+                cls.host,
+                1,
+                price_per_night=Decimal("99.5"),
+                amenities="WiFi,  Pool , ,Kitchen",
+            ),
+            make_property(
+                cls.host, 2, price_per_night=Decimal("1234567.89"), amenities=""
+            ),
+            make_property(
+                cls.other_host,
+                3,
+                price_per_night=Decimal("100"),
+                title='Loft "Étoile" <3',
+                is_available=False,
+            ),
+        ]
+        Property.objects.filter(pk=properties[0].pk).update(
+            average_rating=Decimal("4.67"), review_count=3
+        )
+        PropertyImage.objects.create(
+            property=properties[0], image="property_images/b.jpg", order=1
+        )
+        PropertyImage.objects.create(
+            property=properties[0],
+            image="property_images/a b.jpg",
+            caption="Living room",
+            is_primary=True,
+        )
+        PropertyImage.objects.create(property=properties[2], image="")
+        Wishlist.objects.create(user=cls.guest, property=properties[1])
+
+    def request(self, user=None):
+        request = RequestFactory().get("/api/properties/", HTTP_HOST="testserver")
+        if user is not None:
+            request.user = user
+        return request
+
+    def assertIdentical(self, request):
+        queryset = Property.objects.order_by("-created_at", "-pk")
+        expected = PropertyListSerializer(
+            PropertyListSerializer.setup_eager_loading(queryset),
+            many=True,
+            context={"request": request},
+        ).data
+        wishlisted_ids = wishlisted_property_ids(request)
+        rows = list(fast_serialization.property_rows(queryset))
+        renderer = JSONRenderer()
+        self.assertEqual(
+            renderer.render(
+                fast_serialization.serialize_properties(rows, request, wishlisted_ids)
+            ),
+            renderer.render(expected),
+        )
+        self.assertEqual(
+            renderer.render(
+                async_to_sync(fast_serialization.aserialize_properties)(
+                    rows, request, wishlisted_ids
+                )
+            ),
+            renderer.render(expected),
+        )
+
+    def test_anonymous(self):
+        self.assertIdentical(self.request())
+
+    def test_wishlisted(self):
+        self.assertIdentical(self.request(self.guest))
+
+    def test_without_request(self):
+        self.assertIdentical(None)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("The threads need a test database file")
+        self.host = User.objects.create_user("host@example.com")
+        self.guests = [
+            User.objects.create_user(f"guest{i}@example.com")
+            for i in range(self.threads)
+        ]
+        self.property = make_property(self.host)
+
+    def book_at_once(self, stays):
+        """Book ``stays`` from as many threads at the same moment"""
+        barrier = threading.Barrier(len(stays))
+        results = [None] * len(stays)
+
+        def book(i, check_in, check_out):
+            try:
+                barrier.wait()
+                results[i] = booking.create_reservation(
+                    property_id=self.property.pk,
+                    check_in=check_in,
+                    check_out=check_out,
+                    guests_count=1,
+                    guest=self.guests[i],
+                )
+            except Exception as exc:
+                results[i] = exc
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=book, args=(i, *stay))
+            for i, stay in enumerate(stays)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_same_nights_are_booked_once(self):
+        check_in = date.today() + timedelta(days=30)
+        results = self.book_at_once(
+            [(check_in, check_in + timedelta(days=3))] * self.threads
+        )
+
+        booked = [r for r in results if isinstance(r, Reservation)]
+        conflicts = [r for r in results if isinstance(r, booking.BookingConflict)]
+        self.assertEqual(len(booked), 1, results)
+        self.assertEqual(len(conflicts), self.threads - 1, results)
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertEqual(
+            list(BookedNight.objects.values_list("reservation_id", flat=True)),
+            [booked[0].pk] * 3,
+        )
+
+    def test_overlapping_stays_never_share_a_night(self):
+        start = date.today() + timedelta(days=30)
+        stays = [
+            (start + timedelta(days=i), start + timedelta(days=i + 2))
+            for i in range(self.threads)
+        ]
+        results = self.book_at_once(stays)
+
+        booked = [r for r in results if isinstance(r, Reservation)]
+        self.assertTrue(booked)
+        self.assertTrue(
+            all(isinstance(r, (Reservation, booking.BookingConflict)) for r in results),
+            results,
+        )
+        nights = list(BookedNight.objects.values_list("night", flat=True))
+        self.assertEqual(len(nights), len(set(nights)))
+        self.assertEqual(len(nights), sum(r.nights for r in booked))
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Walking the pages forwards and back visits every row once, in the
+    requested order, even when many rows tie on the ordering value; bad
+    cursors are a 400.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        host = User.objects.create_user("host@example.com")
+        cls.guest = User.objects.create_user("guest@example.com")
+        for number in range(15):
+            make_property(
+                host,
+                number,
+                price_per_night=100 if number % 3 else 150,
+                latitude=48.85 + number % 2 / 100,
+                longitude=2.35,
+            )
+        search.rebuild_index()
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url):
+        response = api_client(self.guest).get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def ids(self, page):
+        return [row["id"] for row in page["results"]]
+
+    def assertWalks(self, path):
+        """Pages of 4 add up to the one page of everything, forwards and back"""
+        expected = self.ids(self.get(path + "&page_size=100"))
+        self.assertEqual(len(set(expected)), 15)
+
+        forwards, page = [], self.get(path + "&page_size=4")
+        while True:
+            forwards.append(self.ids(page))
+            if page["next"] is None:
+                break
+            page = self.get(page["next"])
+        self.assertEqual(sum(forwards, []), expected)
+
+        backwards = [forwards[-1]]
+        while page["previous"] is not None:
+            page = self.get(page["previous"])
+            backwards.append(self.ids(page))
+        self.assertEqual(sum(reversed(backwards), []), expected)
+
+    def test_ties_on_price(self):
+        list_path = reverse("property:property-list-create")
+        self.assertWalks(list_path + "?ordering=price_per_night")
+        self.assertWalks(list_path + "?ordering=-price_per_night")
+
+    def test_ties_on_rating(self):
+        self.assertWalks(
+            reverse("property:property-list-create") + "?ordering=-average_rating"
+        )
+
+    def test_search_rank(self):
+        self.assertWalks(
+            reverse("property:property-search")
+            + "?destination=Paris&ordering=-search_rank"
+        )
+
+    def test_distance(self):
+        path = reverse("property:property-search") + "?lat=48.85&lng=2.35&radius_km=5"
+        self.assertWalks(path)
+        self.assertWalks(path + "&ordering=-distance")
+
+    def test_invalid_cursor(self):
+        def encode(querystring):
+            return base64.b64encode(querystring.encode()).decode()
+
+        pk = Property.objects.values_list("pk", flat=True).first()
+        cursors = [
+            "not base64!",
+            encode("v=100"),
+            encode(f"v=cheap&i={pk}"),
+            encode("v=100&i=not-a-uuid"),
+            encode(f"v=100&i={pk}&r=backwards"),
+        ]
+        paths = [
+            reverse("property:property-list-create") + "?ordering=price_per_night",
+            reverse("property:property-search") + "?ordering=price_per_night",
+            reverse("property:property-search") + "?lat=48.85&lng=2.35&radius_km=5",
+        ]
+        for path in paths:
+            for cursor in cursors:
+                with self.subTest(path=path, cursor=cursor):
+                    response = api_client(self.guest).get(
+                        f"{path}&cursor={quote(cursor)}"
+                    )
+                    self.assertEqual(response.status_code, 400, response.content)
+                    self.assertIn("cursor", response.json())
+
+
+class ReservationLifecycleTests(TestCase):
+    """
+    The sweep expires lapsed holds and completes past stays, releasing their
+    nights, and leaves everything else alone.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user("host@example.com")
+        cls.guest = User.objects.create_user("guest@example.com")
+        cls.property = make_property(cls.host)
+
+    def book(self, check_in, nights=3, status="pending", age=None):
+        """Book ``nights`` from ``check_in``, created ``age`` ago"""
+        reservation = Reservation.objects.create(
+            property=self.property,
+            guest=self.guest,
+            check_in=check_in,
+            check_out=check_in + timedelta(days=nights),
+            guests_count=1,
+            total_price=300,
+            status=status,
+        )
+        if age is not None:
+            Reservation.objects.filter(pk=reservation.pk).update(
+                created_at=timezone.now() - age
+            )
+        return reservation
+
+    def nights(self, reservation):
+        return BookedNight.objects.filter(reservation=reservation).count()
+
+    def test_expired_hold_releases_its_nights(self):
+        check_in = date.today() + timedelta(days=30)
+        hold_age = timedelta(minutes=settings.RESERVATION_HOLD_MINUTES + 1)
+        lapsed = self.book(check_in, age=hold_age)
+        fresh = self.book(check_in + timedelta(days=10))
+        self.assertEqual(self.nights(lapsed), 3)
+
+        self.assertEqual(lifecycle.sweep(), (1, 0))
+
+        lapsed.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(lapsed.status, "expired")
+        self.assertEqual(self.nights(lapsed), 0)
+        self.assertEqual(fresh.status, "pending")
+        self.assertEqual(self.nights(fresh), 3)
+
+        # The released nights can be booked again, and the host can no
+        # longer confirm the lapsed hold
+        rebooked = booking.create_reservation(
+            property_id=self.property.pk,
+            check_in=check_in,
+            check_out=check_in + timedelta(days=3),
+            guests_count=1,
+            guest=self.guest,
+        )
+        self.assertEqual(self.nights(rebooked), 3)
+        response = api_client(self.host).post(
+            reverse("property:confirm-reservation", args=[lapsed.pk])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_confirmed_booking_is_not_swept(self):
+        check_in = date.today() + timedelta(days=30)
+        confirmed = self.book(check_in, status="confirmed", age=timedelta(days=7))
+
+        self.assertEqual(lifecycle.sweep(), (0, 0))
+
+        confirmed.refresh_from_db()
+        self.assertEqual(confirmed.status, "confirmed")
+        self.assertEqual(self.nights(confirmed), 3)
+
+    def test_past_stay_is_completed(self):
+        past = self.book(
+            date.today() - timedelta(days=5), status="confirmed", age=timedelta(days=7)
+        )
+
+        self.assertEqual(lifecycle.sweep(), (0, 1))
+
+        past.refresh_from_db()
+        self.assertEqual(past.status, "completed")
+        self.assertEqual(self.nights(past), 0)
+
+    def test_batches(self):
+        hold_age = timedelta(minutes=settings.RESERVATION_HOLD_MINUTES + 1)
+        holds = [
+            self.book(date.today() + timedelta(days=30 + 4 * i), age=hold_age)
+            for i in range(5)
+        ]
+
+        self.assertEqual(lifecycle.sweep(batch_size=2), (5, 0))
+        self.assertFalse(BookedNight.objects.filter(reservation__in=holds).exists())
+
+
+class ReservationResponseTests(TestCase):
+    """
+    The booking, cancellation and confirmation responses render the
+    reservation like the reservation detail: absolute image URLs and the
+    requesting user's wishlist.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user("host@example.com", is_host=True)
+        cls.guest = User.objects.create_user("guest@example.com")
+        cls.property = make_property(cls.host)
+        PropertyImage.objects.create(
+            property=cls.property, image="property_images/room.jpg"
+        )
+        for user in (cls.host, cls.guest):
+            Wishlist.objects.create(user=user, property=cls.property)
+
+    def book(self):
+        check_in = date.today() + timedelta(days=30)
+        response = api_client(self.guest).post(
+            reverse("property:create-reservation"),
+            {
+                "property_id": str(self.property.pk),
+                "check_in": check_in.isoformat(),
+                "check_out": (check_in + timedelta(days=2)).isoformat(),
+                "guests_count": 1,
+            },
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def assertRenderedWithRequest(self, data):
+        listing = data["property"]
+        self.assertTrue(listing["is_wishlisted"])
+        self.assertTrue(listing["images"][0]["image"].startswith("http://testserver/"))
+
+    def detail(self, reservation_id):
+        return api_client(self.guest).get(
+            reverse("property:reservation-detail", args=[reservation_id])
+        )
+
+    def test_create(self):
+        data = self.book()
+        self.assertRenderedWithRequest(data)
+        self.assertEqual(data, self.detail(data["id"]).data)
+
+    def test_cancel(self):
+        reservation_id = self.book()["id"]
+        response = api_client(self.guest).post(
+            reverse("property:cancel-reservation", args=[reservation_id])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertRenderedWithRequest(response.data)
+        self.assertEqual(response.data, self.detail(reservation_id).data)
+
+    def test_confirm(self):
+        reservation_id = self.book()["id"]
+        response = api_client(self.host).post(
+            reverse("property:confirm-reservation", args=[reservation_id])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], "confirmed")
+        self.assertRenderedWithRequest(response.data)
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], REPLICA_PIN_SECONDS=1)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    A second SQLite database stands in for a replica that lags behind: it
+    gets a copy of ``default`` when each test starts, and nothing after.
+    The alias only exists while these tests run, and as a mirror of
+    ``default`` it is never flushed.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        default = connections["default"]
+        if default.vendor != "sqlite" or default.is_in_memory_db():
+            raise unittest.SkipTest("The replica is a copy of a test database file")
+        super().setUpClass()
+        name = default.settings_dict["NAME"]
+        cls.replica_name = os.path.join(
+            os.path.dirname(name), "replica_" + os.path.basename(name)
+        )
+        connections.settings[REPLICA] = {
+            **default.settings_dict,
+            "NAME": cls.replica_name,
+            "TEST": {**default.settings_dict["TEST"], "MIRROR": "default"},
+        }
+        cls.databases = {*cls.databases, REPLICA}
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.databases
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        if os.path.exists(cls.replica_name):
+            os.remove(cls.replica_name)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.host = User.objects.create_user("host@example.com", is_host=True)
+        self.guest = User.objects.create_user("guest@example.com")
+        self.other = User.objects.create_user("other@example.com")
+        make_property(self.host, 1)
+        self.replicate()
+        self.unreplicated = make_property(self.host, 2)
+        # Long enough ago for cached lists to be built from a replica again
+        cache.set(
+            response_cache._counter_key(response_cache.LISTINGS),
+            time.time_ns() - 60 * 10**9,
+            None,
+        )
+        self.requests = 0
+
+    def replicate(self):
+        connections[REPLICA].close()
+        source = sqlite3.connect(connections["default"].settings_dict["NAME"])
+        target = sqlite3.connect(self.replica_name)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+    def list_titles(self, user):
+        """Return the listed titles and the number of replica queries"""
+        # A new query string every time, so no page comes from the cache
+        self.requests += 1
+        path = reverse("property:property-list-create") + f"?request={self.requests}"
+        with CaptureQueriesContext(connections[REPLICA]) as queries:
+            response = api_client(user).get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        titles = {prop["title"] for prop in response.json()["results"]}
+        return titles, len(queries)
+
+    def test_reads_go_to_the_replica(self):
+        titles, replica_queries = self.list_titles(self.guest)
+        self.assertEqual(titles, {"Property 1"})
+        self.assertGreater(replica_queries, 0)
+
+    def test_writer_is_pinned_to_the_primary(self):
+        response = api_client(self.guest).post(
+            reverse("property:bulk-update-wishlist"),
+            {"add": [str(self.unreplicated.pk)]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(Wishlist.objects.using("default").exists())
+        self.assertFalse(Wishlist.objects.using(REPLICA).exists())
+
+        self.assertEqual(
+            self.list_titles(self.guest), ({"Property 1", "Property 2"}, 0)
+        )
+        self.assertTrue(cache.get(replicas._pin_key(self.guest.pk)))
+        # Nobody else is pinned
+        self.assertEqual(self.list_titles(self.other)[0], {"Property 1"})
+
+        time.sleep(1.1)
+        self.assertEqual(self.list_titles(self.guest)[0], {"Property 1"})
+
+    def test_changed_lists_are_read_from_the_primary(self):
+        make_property(self.host, 3)
+        self.assertEqual(
+            self.list_titles(self.other)[0],
+            {"Property 1", "Property 2", "Property 3"},
+        )
+
+    def test_image_changes_touch_the_property_on_their_database(self):
+        replicated = Property.objects.using(REPLICA).get()
+        image = PropertyImage(property=replicated, image="property_images/room.jpg")
+        image.save(using=REPLICA)
+        image.delete(using=REPLICA)
+
+        versions = {
+            alias: Property.objects.using(alias).get(pk=replicated.pk).version
+            for alias in ("default", REPLICA)
+        }
+        self.assertEqual(versions, {"default": 1, REPLICA: 3})
+
+
+class RatingAggregateTests(TestCase):
+    """
+    Adding, editing and deleting reviews keeps each property's running
+    rating aggregates equal to what the reviews table adds up to.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user("host@example.com")
+        cls.guest = User.objects.create_user("guest@example.com")
+        cls.property = make_property(cls.host, 0)
+        cls.other = make_property(cls.host, 1)
+
+    def review(self, rating, prop=None):
+        """Review a completed stay at ``prop`` with ``rating`` stars"""
+        prop = prop or self.property
+        reservation = Reservation.objects.create(
+            property=prop,
+            guest=self.guest,
+            check_in=date(2024, 5, 1),
+            check_out=date(2024, 5, 3),
+            guests_count=1,
+            total_price=200,
+            status="completed",
+        )
+        return Review.objects.create(
+            property=prop,
+            guest=self.guest,
+            reservation=reservation,
+            rating=rating,
+            comment="Stayed here",
+        )
+
+    def assertAggregates(self, average=None):
+        """The aggregates of both properties match their reviews"""
+        for prop in (self.property, self.other):
+            prop.refresh_from_db()
+            stars = list(prop.reviews.values_list("rating", flat=True))
+            self.assertEqual(
+                (prop.review_count, prop.rating_sum, prop.average_rating),
+                (
+                    len(stars),
+                    sum(stars),
+                    ratings.average_rating(sum(stars), len(stars)),
+                ),
+            )
+        if average is not None:
+            self.assertEqual(self.property.average_rating, Decimal(average))
+        # Nothing for a full recompute to correct
+        self.assertEqual(ratings.recompute(), 0)
+
+    def test_add(self):
+        self.review(5)
+        self.assertAggregates("5.00")
+        self.review(4)
+        self.review(4)
+        self.assertAggregates("4.33")
+
+    def test_add_through_the_endpoint(self):
+        self.review(2)
+        Reservation.objects.create(
+            property=self.property,
+            guest=self.guest,
+            check_in=date(2024, 6, 1),
+            check_out=date(2024, 6, 3),
+            guests_count=1,
+            total_price=200,
+            status="completed",
+        )
+        response = api_client(self.guest).post(
+            reverse("property:property-reviews", args=[self.property.pk]),
+            {"rating": 5, "comment": "Better this time"},
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertAggregates("3.50")
+
+    def test_rounds_half_up(self):
+        # 9 stars over 8 reviews is 1.125
+        self.review(2)
+        for _ in range(7):
+            self.review(1)
+        self.assertAggregates("1.13")
+
+    def test_edit(self):
+        first = self.review(5)
+        second = self.review(3)
+
+        first.rating = 2
+        first.save()
+        self.assertAggregates("2.50")
+
+        # A comment edit, and one of a review loaded without its property
+        second.comment = "Changed my mind"
+        second.save()
+        with self.assertNumQueries(1):
+            deferred = Review.objects.only("rating", "comment").get(pk=second.pk)
+        deferred.comment = "Changed it back"
+        deferred.save()
+        self.assertAggregates("2.50")
+
+        # Moved to another property
+        second.property = self.other
+        second.save()
+        self.assertAggregates("2.00")
+        self.assertEqual(self.other.average_rating, Decimal("3.00"))
+
+    def test_delete(self):
+        first = self.review(5)
+        self.review(4)
+        self.review(1)
+
+        first.delete()
+        self.assertAggregates("2.50")
+        Review.objects.filter(rating=1).delete()
+        self.assertAggregates("4.00")
+
+    def test_delete_the_last_review(self):
+        self.review(4).delete()
+        self.assertAggregates("0.00")
+        self.assertEqual(self.property.review_count, 0)
+
+        # Through the reservation it belongs to
+        self.review(3)
+        Reservation.objects.filter(property=self.property).delete()
+        self.assertAggregates("0.00")
+
+
+class ClusterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        host = User.objects.create_user("host@example.com", is_host=True)
+        points = [(0, 0), (5, 5), (48.85, 2.35), (0.5, 179.9), (0.5, -179.9)]
+        for number, (lat, lng) in enumerate(points):
+            make_property(host, number, latitude=lat, longitude=lng)
+        clusters.rebuild()
+
+    def get(self, query):
+        response = api_client().get(reverse("property:property-clusters") + query)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def count(self, data):
+        return sum(cluster["count"] for cluster in data["clusters"])
+
+    def test_explicit_zoom_is_capped_by_the_viewport(self):
+        data = self.get("?bbox=-10,-10,10,10&zoom=14")
+        self.assertEqual(
+            data["zoom"], clusters.zoom_for_viewport(-10, -10, 10, 10, 1024)
+        )
+        self.assertEqual(self.count(data), 2)
+        self.assertLessEqual(len(data["clusters"]), (1024 // 64 + 2) ** 2)
+
+    def test_explicit_zoom_below_the_viewport_zoom_is_kept(self):
+        self.assertEqual(self.get("?bbox=-10,-10,10,10&zoom=1")["zoom"], 1)
+
+    def test_whole_world_at_high_zoom(self):
+        data = self.get("?bbox=-180,-90,180,90&zoom=14&width=8192")
+        self.assertEqual(self.count(data), 5)
+
+    def test_tall_viewport(self):
+        data = self.get("?bbox=-1,-90,1,90&zoom=14&width=8192")
+        self.assertEqual(self.count(data), 1)
+
+    def test_across_the_antimeridian(self):
+        self.assertEqual(self.count(self.get("?bbox=179,-1,-179,1")), 2)
+
+    def test_many_rows_at_the_finest_zoom(self):
+        # Past the clamp, too many rows for one range each
+        found = clusters.clusters_in_viewport(clusters.MAX_ZOOM, -10, -10, 10, 10)
+        self.assertEqual(sum(cluster["count"] for cluster in found), 2)
+
+
+class GeoSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        host = User.objects.create_user("host@example.com", is_host=True)
+        cls.guest = User.objects.create_user("guest@example.com")
+        points = {
+            "East edge": (0.5, 179.95),
+            "West edge": (0.5, -179.95),
+            "Fiji": (0.5, 170),
+            "North": (89.9, 90),
+            "North, across the pole": (89.85, -170),
+            "North, further out": (89.4, 10),
+            "South, across the pole": (-89.9, -135),
+            "South, further out": (-89.5, 45),
+        }
+        for number, (title, (lat, lng)) in enumerate(points.items()):
+            make_property(host, number, title=title, latitude=lat, longitude=lng)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query):
+        response = api_client(self.guest).get(
+            reverse("property:property-search") + query
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return [prop["title"] for prop in response.json()["results"]]
+
+    def test_radius_across_the_antimeridian(self):
+        self.assertEqual(
+            self.search("?lat=0.5&lng=-179.96&radius_km=20"),
+            ["West edge", "East edge"],
+        )
+        self.assertEqual(
+            self.search("?lat=0.5&lng=179.96&radius_km=20"),
+            ["East edge", "West edge"],
+        )
+
+    def test_bbox_across_the_antimeridian(self):
+        self.assertCountEqual(
+            self.search("?bbox=179.9,0,-179.9,1"), ["East edge", "West edge"]
+        )
+
+    def test_radius_around_the_north_pole(self):
+        self.assertCountEqual(
+            self.search("?lat=89.9&lng=10&radius_km=50"),
+            ["North", "North, across the pole"],
+        )
+
+    def test_radius_around_the_south_pole(self):
+        self.assertEqual(
+            self.search("?lat=-89.95&lng=45&radius_km=30"),
+            ["South, across the pole"],
+        )
+
+    def test_bbox_at_the_pole(self):
+        self.assertCountEqual(
+            self.search("?bbox=-180,89,180,90"),
+            ["North", "North, across the pole", "North, further out"],
+        )
+
+
+class ConditionalRequestTests(TestCase):
+    """
+    Every write to a property bumps its version and ETag; reads answer
+    If-None-Match with a 304, writes with a stale If-Match with a 412.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user("host@example.com", is_host=True)
+        cls.property = make_property(cls.host)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("property:property-detail", args=[self.property.pk])
+        self.client = api_client(self.host)
+
+    def etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def version(self):
+        return Property.objects.values_list("version", flat=True).get()
+
+    def test_writes_change_the_etag(self):
+        etags, versions = [self.etag()], [self.version()]
+
+        response = self.client.patch(
+            self.url, {"title": "Renamed"}, format="json", HTTP_IF_MATCH=etags[-1]
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        # The response carries the validators of the new version
+        self.assertEqual(response["ETag"], self.etag())
+        etags.append(response["ETag"])
+        versions.append(self.version())
+
+        PropertyImage.objects.create(
+            property=self.property, image="property_images/room.jpg"
+        )
+        etags.append(self.etag())
+        versions.append(self.version())
+
+        self.assertEqual(len(set(etags)), 3)
+        self.assertEqual(versions, [versions[0], versions[0] + 1, versions[0] + 2])
+
+    def test_stale_if_match(self):
+        stale = self.etag()
+        self.client.patch(self.url, {"title": "Renamed"}, format="json")
+        version = self.version()
+
+        response = self.client.patch(
+            self.url, {"title": "Lost update"}, format="json", HTTP_IF_MATCH=stale
+        )
+        self.assertEqual(response.status_code, 412)
+        response = self.client.delete(self.url, HTTP_IF_MATCH=stale)
+        self.assertEqual(response.status_code, 412)
+        self.property.refresh_from_db()
+        self.assertEqual(
+            (self.property.title, self.property.version), ("Renamed", version)
+        )
+
+        response = self.client.delete(self.url, HTTP_IF_MATCH=self.etag())
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Property.objects.exists())
+
+    def test_if_none_match(self):
+        etag = self.etag()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        response = async_to_sync(self.async_client.get)(
+            self.url, headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        Property.objects.filter(pk=self.property.pk).touch()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class DestinationSearchTests(TestCase):
+    """
+    Every term of a destination must match, each as a prefix, the same on
+    PostgreSQL and SQLite; location matches outrank title matches.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        host = User.objects.create_user("host@example.com")
+        cls.paris = make_property(host, 0, location="Paris")
+        cls.lyon = make_property(
+            host, 1, location="Lyon", title="Quiet flat", description="Old town"
+        )
+        cls.view = make_property(host, 2, location="Lyon", title="Paris view")
+        search.rebuild_index()
+
+    def matches(self, destination):
+        """The matching properties, most relevant first"""
+        queryset = search.filter_by_destination(Property.objects.all(), destination)
+        return list(queryset.order_by("-search_rank"))
+
+    def test_prefixes(self):
+        self.assertEqual(self.matches("par"), [self.paris, self.view])
+        self.assertEqual(self.matches("PARIS"), [self.paris, self.view])
+        self.assertCountEqual(self.matches("lyo"), [self.lyon, self.view])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.matches("lyo qui"), [self.lyon])
+        self.assertEqual(self.matches("par old"), [])
+
+    def test_no_terms(self):
+        self.assertCountEqual(self.matches("!?"), [self.paris, self.lyon, self.view])
+
+    def test_query_syntax(self):
+        self.assertEqual(search._fts_query("Saint-Malo"), '"Saint"* "Malo"*')
+        self.assertEqual(search._tsquery("Saint-Malo"), "'Saint':* & 'Malo':*")
+
+    def test_endpoint(self):
+        guest = User.objects.create_user("guest@example.com")
+        response = api_client(guest).get(
+            reverse("property:property-search")
+            + "?destination=par&ordering=-search_rank"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]],
+            [str(self.paris.pk), str(self.view.pk)],
+        )
+
+
+class AsyncViewParityTests(TestCase):
+    """
+    The async views (served under ASGI) answer exactly like the DRF views
+    (served under WSGI): same status, body and validators.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user("host@example.com", is_host=True)
+        cls.guest = User.objects.create_user("guest@example.com", name="Guest")
+        cls.property = make_property(cls.host, latitude=48.85, longitude=2.35)
+        PropertyImage.objects.create(
+            property=cls.property, image="property_images/room.jpg"
+        )
+        reservation = Reservation.objects.create(
+            property=cls.property,
+            guest=cls.guest,
+            check_in=date(2024, 5, 1),
+            check_out=date(2024, 5, 3),
+            guests_count=1,
+            total_price=200,
+            status="completed",
+        )
+        Review.objects.create(
+            property=cls.property,
+            guest=cls.guest,
+            reservation=reservation,
+            rating=4,
+            comment="Lovely",
+        )
+        Wishlist.objects.create(user=cls.guest, property=cls.property)
+        search.rebuild_index()
+
+    def headers(self, user, **headers):
+        if user is not None:
+            token = RefreshToken.for_user(user).access_token
+            headers["Authorization"] = f"Bearer {token}"
+        return headers
+
+    def assertSameResponse(self, path, user=None, **headers):
+        headers = self.headers(user, **headers)
+        cache.clear()
+        sync = self.client.get(path, headers=headers)
+        # Build the response again, under the same generations
+        generations = cache.get_many(
+            response_cache._counter_key(name)
+            for name in [
+                response_cache.LISTINGS,
+                response_cache.AVAILABILITY,
+                response_cache.property_generation(self.property.pk),
+            ]
+        )
+        cache.clear()
+        cache.set_many(generations, None)
+        asynchronous = async_to_sync(self.async_client.get)(path, headers=headers)
+
+        if sync.status_code != 304:
+            # Answered by the DRF view and by the coroutine respectively
+            self.assertIsInstance(sync, Response)
+            self.assertNotIsInstance(asynchronous, Response)
+        self.assertEqual(asynchronous.status_code, sync.status_code)
+        self.assertEqual(asynchronous.content, sync.content)
+        for header in ["ETag", "Last-Modified", "Content-Type", "Allow"]:
+            self.assertEqual(asynchronous.get(header), sync.get(header), header)
+        self.assertEqual(
+            set(asynchronous.get("Vary", "").split(", ")),
+            set(sync.get("Vary", "").split(", ")),
+        )
+        return sync
+
+    def test_property_detail(self):
+        path = reverse("property:property-detail", args=[self.property.pk])
+        self.assertSameResponse(path)
+        response = self.assertSameResponse(path, self.guest)
+        self.assertEqual(response.json()["is_wishlisted"], True)
+        response = self.assertSameResponse(
+            path, self.guest, If_None_Match=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_property(self):
+        path = reverse("property:property-detail", args=[Reservation().pk])
+        self.assertEqual(self.assertSameResponse(path).status_code, 404)
+
+    def test_reviews(self):
+        path = reverse("property:property-reviews", args=[self.property.pk])
+        self.assertSameResponse(path)
+        response = self.assertSameResponse(path, self.guest)
+        self.assertEqual(len(response.json()["results"]), 1)
+        response = self.assertSameResponse(
+            path, self.guest, If_None_Match=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_search(self):
+        path = reverse("property:property-search")
+        response = self.assertSameResponse(path + "?destination=Paris", self.guest)
+        self.assertEqual(len(response.json()["results"]), 1)
+        self.assertSameResponse(path + "?lat=48.85&lng=2.35&radius_km=5", self.guest)
+        response = self.assertSameResponse(path + "?lat=48.85", self.guest)
+        self.assertEqual(response.status_code, 400)
+
+    def test_wishlist(self):
+        path = reverse("property:wishlist")
+        response = self.assertSameResponse(path, self.guest)
+        self.assertEqual(len(response.json()["results"]), 1)
+        self.assertEqual(self.assertSameResponse(path).status_code, 401)
+
+
+def throttle_rates(**rates):
+    """Override the throttle rates with ``rates`` only"""
+    return override_settings(
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}
+    )
+
+
+class ThrottleTests(TestCase):
+    """
+    Clients over their budget get a 429 with Retry-After, from the DRF and
+    the async views alike, and concurrent requests never share a token.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user("host@example.com")
+        cls.guest = User.objects.create_user("guest@example.com")
+        make_property(cls.host)
+
+    def setUp(self):
+        cache.clear()
+        token = RefreshToken.for_user(self.guest).access_token
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def search(self, path=None):
+        return api_client(self.guest).get(path or reverse("property:property-search"))
+
+    def async_search(self, path=None):
+        return async_to_sync(self.async_client.get)(
+            path or reverse("property:property-search"), headers=self.headers
+        )
+
+    def assertThrottled(self, response, retry_after):
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], str(retry_after))
+
+    @throttle_rates(search_user="2/min")
+    def test_user_budget_is_shared_by_sync_and_async_views(self):
+        self.assertEqual(self.search().status_code, 200)
+        self.assertEqual(self.async_search().status_code, 200)
+        # The next token is 30 seconds away
+        self.assertThrottled(self.async_search(), 30)
+        self.assertThrottled(self.search(), 30)
+
+        # Other users have buckets of their own
+        other = User.objects.create_user("other@example.com")
+        response = api_client(other).get(reverse("property:property-search"))
+        self.assertEqual(response.status_code, 200)
+
+    @throttle_rates(auth_anon="1/h")
+    def test_anonymous_budget(self):
+        url = reverse("useraccount:user-register")
+        self.assertEqual(APIClient().post(url, {}).status_code, 400)
+        self.assertThrottled(APIClient().post(url, {}), 3600)
+
+    @throttle_rates(search_user="100/min", stream_user="1/min")
+    def test_streamed_search_has_a_budget_of_its_own(self):
+        path = reverse("property:property-search") + "?stream=true"
+        response = self.search(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        b"".join(response.streaming_content)
+        self.assertThrottled(self.search(path), 60)
+        self.assertThrottled(self.async_search(path), 60)
+        self.assertEqual(self.search().status_code, 200)
+        self.assertEqual(APIClient().get(path).status_code, 401)
+
+    @throttle_rates(search_user="10/d")
+    def test_concurrent_requests_take_one_token_each(self):
+        def request():
+            django_request = RequestFactory().get("/")
+            django_request.resolver_match = resolve(reverse("property:property-search"))
+            drf_request = Request(django_request)
+            drf_request.user = self.guest
+            return drf_request
+
+        barrier = threading.Barrier(8)
+        allowed = []
+
+        def take():
+            barrier.wait()
+            for _ in range(5):
+                throttle = throttling.UserTokenBucketThrottle()
+                allowed.append(throttle.allow_request(request(), None))
+
+        def slow_refill(*args):
+            # Between reading the bucket and writing it back
+            time.sleep(0.001)
+            return refill(*args)
+
+        refill = throttling.refill
+        threads = [threading.Thread(target=take) for _ in range(8)]
+        with mock.patch.object(throttling, "refill", slow_refill):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(allowed.count(True), 10)
+
+    def test_throttle_base_class_is_abstract(self):
+        with self.assertRaises(TypeError):
+            throttling.TokenBucketThrottle()
+
+
+@override_settings(LOAD_SHED_MAX_IN_FLIGHT=1, LOAD_SHED_RETRY_AFTER=3)
+class LoadSheddingTests(TestCase):
+    """
+    Expensive GET requests beyond LOAD_SHED_MAX_IN_FLIGHT get a 503 with
+    Retry-After until a running one finishes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user("host@example.com")
+        cls.guest = User.objects.create_user("guest@example.com")
+        make_property(cls.host)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertShed(self, response):
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "3")
+
+    def test_streamed_response_holds_its_slot(self):
+        client = api_client(self.guest)
+        path = reverse("property:property-search")
+        streamed = client.get(path + "?stream=true")
+        self.assertTrue(streamed.streaming)
+
+        self.assertShed(client.get(path))
+        # Other views are not counted
+        self.assertEqual(
+            client.get(reverse("property:reservation-list")).status_code, 200
+        )
+
+        # Read to the end, which closes it
+        b"".join(streamed.streaming_content)
+        self.assertEqual(client.get(path).status_code, 200)
+        self.assertEqual(client.get(path).status_code, 200)
+
+    def test_async_request_holds_its_slot(self):
+        def request():
+            path = reverse("property:property-search")
+            request = RequestFactory().get(path)
+            request.resolver_match = resolve(path)
+            return request
+
+        async def run():
+            started, finish = asyncio.Event(), asyncio.Event()
+
+            async def get_response(request):
+                started.set()
+                await finish.wait()
+                return HttpResponse()
+
+            middleware = throttling.LoadSheddingMiddleware(get_response)
+            first = request()
+            self.assertIsNone(middleware.process_view(first, None, (), {}))
+            running = asyncio.ensure_future(middleware(first))
+            await started.wait()
+            shed = middleware.process_view(request(), None, (), {})
+            finish.set()
+            await running
+            return shed, middleware.process_view(request(), None, (), {})
+
+        shed, admitted = async_to_sync(run)()
+        self.assertShed(shed)
+        self.assertIsNone(admitted)
+
+
+class HostAnalyticsTests(TestCase):
+    """
+    ``host_report`` agrees with the same figures counted night by night
+    from the reservations, on both expansion paths and after incremental
+    refreshes.
+    """
+
+    start, end = date(2024, 1, 1), date(2025, 3, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        cls.host = User.objects.create_user("host@example.com", is_host=True)
+        cls.other_host = User.objects.create_user("other@example.com", is_host=True)
+        cls.guest = User.objects.create_user("guest@example.com")
+        hosts = [cls.host, cls.host, cls.host, cls.other_host]
+        cls.properties = [make_property(host, n) for n, host in enumerate(hosts)]
+        for month, prop in zip([1, 1, 6, 3], cls.properties):
+            Property.objects.filter(pk=prop.pk).update(
+                created_at=timezone.make_aware(datetime(2024, month, 15))
+            )
+        for prop in cls.properties:
+            for _ in range(15):
+                cls.book(
+                    prop,
+                    date(2024, 1, 1) + timedelta(days=rng.randrange(400)),
+                    rng.randrange(1, 45),
+                    rng.choice(["completed", "completed", "cancelled", "expired"]),
+                    Decimal(rng.randrange(5000, 500000)) / 100,
+                )
+            # Blocking statuses, which may not overlap
+            cls.book(prop, date(2025, 1, 25), 10, "confirmed", Decimal("1000.01"))
+            cls.book(prop, date(2025, 2, 20), 3, "pending", Decimal("300.00"))
+        # Older than the watermark overlap of the first refresh
+        Reservation.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+
+    @classmethod
+    def book(cls, prop, check_in, nights, status, total_price):
+        return Reservation.objects.create(
+            property=prop,
+            guest=cls.guest,
+            check_in=check_in,
+            check_out=check_in + timedelta(days=nights),
+            guests_count=1,
+            total_price=total_price,
+            status=status,
+        )
+
+    def direct_report(self, host, property_id=None):
+        """The monthly figures of host_report, counted from the reservations"""
+        properties = Property.objects.filter(host=host)
+        if property_id is not None:
+            properties = properties.filter(pk=property_id)
+        nights, cents, check_ins = Counter(), Counter(), Counter()
+        for reservation in Reservation.objects.filter(
+            property__in=properties, status__in=["confirmed", "completed"]
+        ):
+            total = int(reservation.total_price * 100)
+            check_ins[reservation.check_in.replace(day=1)] += 1
+            for night in range(reservation.nights):
+                month = (reservation.check_in + timedelta(days=night)).replace(day=1)
+                nights[month] += 1
+                cents[month] += (
+                    total * (night + 1) // reservation.nights
+                    - total * night // reservation.nights
+                )
+        added = [
+            timezone.localtime(created_at).date().replace(day=1)
+            for created_at in properties.values_list("created_at", flat=True)
+        ]
+        months = []
+        for month in analytics._months(self.start, self.end):
+            listings = sum(month_added <= month for month_added in added)
+            months.append(
+                {
+                    "month": f"{month:%Y-%m}",
+                    "listings": listings,
+                    "available_nights": listings
+                    * calendar.monthrange(month.year, month.month)[1],
+                    "booked_nights": nights[month],
+                    "revenue": str(Decimal(cents[month]).scaleb(-2)),
+                    "check_ins": check_ins[month],
+                }
+            )
+        return months
+
+    def assertReport(self, host, property_id=None):
+        expected = self.direct_report(host, property_id)
+        report = analytics.host_report(host, self.start, self.end, property_id)
+        self.assertEqual(
+            [{key: month[key] for key in expected[0]} for month in report["months"]],
+            expected,
+        )
+        self.assertEqual(
+            report["totals"]["booked_nights"],
+            sum(month["booked_nights"] for month in expected),
+        )
+        self.assertEqual(
+            Decimal(report["totals"]["revenue"]),
+            sum(Decimal(month["revenue"]) for month in expected),
+        )
+
+    def assertReports(self):
+        for host in (self.host, self.other_host):
+            self.assertReport(host)
+        for prop in Property.objects.all():
+            self.assertReport(prop.host, prop.pk)
+
+    def test_python_path(self):
+        analytics.refresh()
+        self.assertReports()
+        response = api_client(self.host).get(
+            reverse("property:host-analytics"), {"start": "2024-01", "end": "2025-03"}
+        )
+        self.assertEqual(
+            response.data, analytics.host_report(self.host, self.start, self.end)
+        )
+
+    @unittest.skipIf(analytics.numpy is None, "NumPy is not installed")
+    def test_numpy_path(self):
+        with mock.patch.object(analytics, "NUMPY_MIN_ROWS", 1):
+            analytics.refresh()
+        self.assertReports()
+
+    @unittest.skipIf(analytics.numpy is None, "NumPy is not installed")
+    def test_expansions_agree(self):
+        rng = random.Random(11)
+        rows = []
+        for _ in range(analytics.NUMPY_MIN_ROWS + 1000):
+            check_in = date(2020, 1, 1) + timedelta(days=rng.randrange(2000))
+            rows.append(
+                (
+                    rng.randrange(50),
+                    check_in,
+                    check_in + timedelta(days=rng.randrange(0, 90)),
+                    Decimal(rng.randrange(0, 10**6)) / 100,
+                )
+            )
+        self.assertEqual(
+            dict(analytics._expand_numpy(rows)), dict(analytics._expand_python(rows))
+        )
+
+    def test_incremental_refresh(self):
+        analytics.refresh()
+        prop = self.properties[0]
+        added = self.book(prop, date(2024, 12, 28), 7, "completed", Decimal("700.00"))
+        self.assertEqual(analytics.refresh(), 1)
+        self.assertReports()
+
+        # Deletes leave no updated_at behind, so they are queued
+        added.delete()
+        Reservation.objects.filter(property=self.properties[1]).first().delete()
+        self.assertEqual(StaleRollup.objects.count(), 2)
+        self.assertEqual(analytics.refresh(), 2)
+        self.assertFalse(StaleRollup.objects.exists())
+        self.assertReports()
+
+        self.properties[2].delete()
+        analytics.refresh()
+        self.assertReports()
+
+    def test_watermark_overlap(self):
+        started = timezone.now()
+        analytics.refresh()
+        late, early = (
+            self.book(prop, date(2024, 11, 1), 5, "completed", Decimal("500.00"))
+            for prop in self.properties[:2]
+        )
+        # Committed after that run although updated before it started: a
+        # minute before is within the overlap, ten minutes before is not
+        Reservation.objects.filter(pk=late.pk).update(
+            updated_at=started - timedelta(minutes=1)
+        )
+        Reservation.objects.filter(pk=early.pk).update(
+            updated_at=started - timedelta(minutes=10)
+        )
+
+        self.assertEqual(analytics.refresh(), 1)
+        self.assertReport(self.host, late.property_id)
+        # Left to a full refresh
+        report = analytics.host_report(
+            self.host, self.start, self.end, early.property_id
+        )
+        self.assertEqual(
+            report["totals"]["booked_nights"] + early.nights,
+            sum(
+                month["booked_nights"]
+                for month in self.direct_report(self.host, early.property_id)
+            ),
+        )
+
+        analytics.refresh(full=True)
+        self.assertReports()
@@ -0,0 +1,341 @@
+"""
+Token bucket throttles and load shedding for the expensive endpoints.
+
+Every scope has a bucket per client that holds up to ``num_requests`` tokens
+and refills at ``num_requests`` per period, so a client may burst up to the
+full budget and is then held to the average rate. Anonymous requests are
+counted per IP address (``<scope>_anon`` rates), authenticated ones per
+user (``<scope>_user`` rates).
+
+Buckets live in the ``THROTTLE_CACHE`` cache: LocMemCache keeps them in
+process, which is what tests and single worker setups want, Redis shares
+them between workers. Taking a token is atomic either way: on Redis a Lua
+script refills and takes in one step, on other caches the bucket is read
+and written under a lock taken with ``cache.add``, so concurrent requests
+of a client never spend the same token twice.
+"""
+
+import asyncio
+import threading
+import time
+from abc import ABCMeta, abstractmethod
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.http import JsonResponse
+from rest_framework.fields import BooleanField
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+# View name -> throttle scope
+THROTTLE_SCOPES = {
+    "property:property-list-create": "search",
+    "property:property-search": "search",
+    "property:property-clusters": "search",
+    "property:create-reservation": "booking",
+    "property:cancel-reservation": "booking",
+    "property:confirm-reservation": "booking",
+    "useraccount:user-register": "auth",
+    "useraccount:change-password": "auth",
+    "rest_login": "auth",
+    "rest_register": "auth",
+    "rest_password_change": "auth",
+    "rest_password_reset": "auth",
+    "rest_password_reset_confirm": "auth",
+    "token_refresh": "auth",
+}
+
+# (view name, query parameter) -> throttle scope of the requests that turn
+# the parameter on, instead of the view's scope. Streamed searches return
+# every match rather than a page, so they get a much smaller budget.
+PARAM_THROTTLE_SCOPES = {
+    ("property:property-search", "stream"): "stream",
+}
+
+# A bucket's lock outside Redis: seconds before a crashed holder's lock
+# lapses, and how often and how long a request waits for it
+LOCK_TIMEOUT = 1
+LOCK_ATTEMPTS = 20
+LOCK_WAIT = 0.005
+
+# Refills the bucket KEYS[1] to now and takes a token from it; returns "" if
+# it did, or the seconds until it will have one. Numbers go back as strings,
+# which Redis does not truncate to integers.
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(state[1]) or capacity
+local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+tokens = math.min(capacity, tokens + elapsed * refill)
+if tokens < 1 then
+    return tostring((1 - tokens) / refill)
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens - 1), "updated_at", tostring(now))
+redis.call("EXPIRE", KEYS[1], ARGV[4])
+return ""
+"""
+
+# Views whose GET requests count towards LOAD_SHED_MAX_IN_FLIGHT
+EXPENSIVE_VIEWS = {
+    "property:property-list-create",
+    "property:property-search",
+    "property:property-clusters",
+    "property:export-reservations",
+    "property:export-properties",
+}
+
+
+def parse_rate(rate):
+    """Return ``(num_requests, seconds)`` for a DRF style rate like 60/min"""
+    num, period = rate.split("/")
+    return int(num), {"s": 1, "m": 60, "h": 3600, "d": 86400}[period[0]]
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else None
+
+
+def throttle_scope(request):
+    """The scope of the request: PARAM_THROTTLE_SCOPES, then THROTTLE_SCOPES"""
+    name = view_name(request)
+    for (view, param), scope in PARAM_THROTTLE_SCOPES.items():
+        if view == name and request.GET.get(param) in BooleanField.TRUE_VALUES:
+            return scope
+    return THROTTLE_SCOPES.get(name)
+
+
+def refill(bucket, state, now):
+    """Return the tokens in ``bucket`` at ``now``, given its cached state"""
+    _, capacity, duration = bucket
+    tokens, updated_at = state or (capacity, now)
+    return min(capacity, tokens + max(0, now - updated_at) * capacity / duration)
+
+
+class TokenBucketThrottle(BaseThrottle, metaclass=ABCMeta):
+    """
+    Throttle the scope that ``throttle_scope`` gives the request; subclasses
+    pick the clients they count and how they tell them apart.
+    """
+
+    # Suffix of the rate names for this kind of client
+    kind = None
+
+    @abstractmethod
+    def applies_to(self, request):
+        """Whether the request comes from this kind of client"""
+
+    @abstractmethod
+    def get_ident_key(self, request):
+        """The part of the bucket key that identifies the client"""
+
+    def get_bucket(self, request):
+        """Return ``(key, capacity, duration)`` for the request, or None"""
+        scope = throttle_scope(request)
+        if scope is None or not self.applies_to(request):
+            return None
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f"{scope}_{self.kind}")
+        if rate is None:
+            return None
+        capacity, duration = parse_rate(rate)
+        key = f"throttle:{scope}:{self.kind}:{self.get_ident_key(request)}"
+        return key, capacity, duration
+
+    def take(self, bucket, state, now):
+        """
+        Return the bucket's state after taking a token, or None (and set
+        ``wait_seconds``) if it is empty.
+        """
+        _, capacity, duration = bucket
+        tokens = refill(bucket, state, now)
+        if tokens < 1:
+            self.wait_seconds = (1 - tokens) * duration / capacity
+            return None
+        return tokens - 1, now
+
+    def take_from_redis(self, cache, bucket):
+        """Take a token with TAKE_SCRIPT, in one step on the Redis server"""
+        key, capacity, duration = bucket
+        key = cache.make_and_validate_key(key)
+        client = cache._cache.get_client(key, write=True)
+        wait = client.register_script(TAKE_SCRIPT)(
+            keys=[key], args=[capacity, capacity / duration, time.time(), duration]
+        )
+        if wait:
+            self.wait_seconds = float(wait)
+            return False
+        return True
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        bucket = self.get_bucket(request)
+        if bucket is None:
+            return True
+        cache = caches[settings.THROTTLE_CACHE]
+        if isinstance(cache, RedisCache):
+            return self.take_from_redis(cache, bucket)
+        lock = f"{bucket[0]}:lock"
+        for _ in range(LOCK_ATTEMPTS):
+            if cache.add(lock, True, LOCK_TIMEOUT):
+                try:
+                    state = self.take(bucket, cache.get(bucket[0]), time.time())
+                    if state is None:
+                        return False
+                    # Kept until the bucket would be full again anyway
+                    cache.set(bucket[0], state, bucket[2])
+                    return True
+                finally:
+                    cache.delete(lock)
+            time.sleep(LOCK_WAIT)
+        # The client's other requests kept the bucket busy all along
+        self.wait_seconds = LOCK_TIMEOUT
+        return False
+
+    async def aallow_request(self, request, view):
+        """``allow_request`` for async views"""
+        self.wait_seconds = None
+        bucket = self.get_bucket(request)
+        if bucket is None:
+            return True
+        cache = caches[settings.THROTTLE_CACHE]
+        if isinstance(cache, RedisCache):
+            return await sync_to_async(self.take_from_redis)(cache, bucket)
+        lock = f"{bucket[0]}:lock"
+        for _ in range(LOCK_ATTEMPTS):
+            if await cache.aadd(lock, True, LOCK_TIMEOUT):
+                try:
+                    state = self.take(bucket, await cache.aget(bucket[0]), time.time())
+                    if state is None:
+                        return False
+                    await cache.aset(bucket[0], state, bucket[2])
+                    return True
+                finally:
+                    await cache.adelete(lock)
+            await asyncio.sleep(LOCK_WAIT)
+        self.wait_seconds = LOCK_TIMEOUT
+        return False
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class AnonTokenBucketThrottle(TokenBucketThrottle):
+    kind = "anon"
+
+    def applies_to(self, request):
+        return not (request.user and request.user.is_authenticated)
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    kind = "user"
+
+    def applies_to(self, request):
+        return bool(request.user and request.user.is_authenticated)
+
+    def get_ident_key(self, request):
+        return request.user.pk
+
+
+class LoadSheddingMiddleware:
+    """
+    Answer GET requests for EXPENSIVE_VIEWS with an immediate 503 while
+    LOAD_SHED_MAX_IN_FLIGHT of them are already running in this process.
+
+    Turning excess work away before authentication and before any query
+    keeps latency bounded for the requests that are admitted, instead of
+    letting every request slow down together. Streamed responses hold their
+    slot until the last chunk is sent. A limit of 0 disables shedding.
+
+    Under ASGI it runs as a coroutine, so the async views behind it (see
+    property.async_views) never need a thread of their own.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self.release(request)
+            raise
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            self.release(request)
+            raise
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        if getattr(request, "_load_shed_slot", False):
+            if response.streaming:
+                response.streaming_content = ReleasingIterator(
+                    response.streaming_content, lambda: self.release(request)
+                )
+            else:
+                self.release(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        limit = settings.LOAD_SHED_MAX_IN_FLIGHT
+        if not limit or request.method not in ("GET", "HEAD"):
+            return None
+        if view_name(request) not in EXPENSIVE_VIEWS:
+            return None
+        with self.lock:
+            if self.in_flight >= limit:
+                shed = True
+            else:
+                self.in_flight += 1
+                shed = False
+        if shed:
+            response = JsonResponse(
+                {"detail": "The server is busy, please retry shortly."}, status=503
+            )
+            response["Retry-After"] = str(settings.LOAD_SHED_RETRY_AFTER)
+            return response
+        request._load_shed_slot = True
+        return None
+
+    def release(self, request):
+        if getattr(request, "_load_shed_slot", False):
+            request._load_shed_slot = False
+            with self.lock:
+                self.in_flight -= 1
+
+
+class ReleasingIterator:
+    """Call ``release`` once the response is closed, even if never iterated"""
+
+    def __init__(self, chunks, release):
+        self.chunks = chunks
+        self.release = release
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        try:
+            if hasattr(self.chunks, "close"):
+                self.chunks.close()
+        finally:
+            self.release()
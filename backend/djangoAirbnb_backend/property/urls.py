@@ -1,16 +1,17 @@
-from django.urls import path
-from . import views
+from django.urls import path, re_path
+from . import async_views, views
 
 app_name = "property"
 
 urlpatterns = [
     # Property URLs
     path("", views.PropertyListCreateView.as_view(), name="property-list-create"),
-    path("<uuid:pk>/", views.PropertyDetailView.as_view(), name="property-detail"),
+    path("<uuid:pk>/", async_views.property_detail, name="property-detail"),
     path(
         "user/properties/", views.UserPropertiesView.as_view(), name="user-properties"
     ),
-    path("search/", views.property_search, name="property-search"),
+    path("search/", async_views.property_search, name="property-search"),
+    path("clusters/", views.property_clusters, name="property-clusters"),
     # Reservation URLs
     path("reservations/", views.ReservationListView.as_view(), name="reservation-list"),
     path("reservations/create/", views.create_reservation, name="create-reservation"),
@@ -24,14 +25,33 @@ urlpatterns = [
         views.cancel_reservation,
         name="cancel-reservation",
     ),
+    path(
+        "reservations/<uuid:reservation_id>/confirm/",
+        views.confirm_reservation,
+        name="confirm-reservation",
+    ),
+    # Host export URLs
+    re_path(
+        r"^exports/reservations\.(?P<export_format>csv|ndjson)$",
+        views.export_reservations,
+        name="export-reservations",
+    ),
+    re_path(
+        r"^exports/properties\.(?P<export_format>csv|ndjson)$",
+        views.export_properties,
+        name="export-properties",
+    ),
+    # Host analytics URLs
+    path("analytics/", views.host_analytics, name="host-analytics"),
     # Review URLs
     path(
         "<uuid:property_id>/reviews/",
-        views.PropertyReviewsView.as_view(),
+        async_views.property_reviews,
         name="property-reviews",
     ),
     # Wishlist URLs
-    path("wishlist/", views.WishlistView.as_view(), name="wishlist"),
+    path("wishlist/", async_views.wishlist, name="wishlist"),
+    path("wishlist/bulk/", views.bulk_update_wishlist, name="bulk-update-wishlist"),
     path(
         "wishlist/<uuid:property_id>/remove/",
         views.remove_from_wishlist,
@@ -1,34 +1,138 @@
-from rest_framework import generics, status, permissions, filters
+from rest_framework import exceptions, generics, status, permissions, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Property, Reservation, Review, Wishlist, PropertyImage
+from .pagination import KeysetPagination, PropertyCursorPagination
+from . import (
+    analytics,
+    clusters,
+    conditional,
+    exports,
+    facets,
+    fast_serialization,
+    geo,
+    lifecycle,
+    response_cache,
+    search,
+    streaming,
+)
 from .serializers import (
     PropertyListSerializer,
     PropertyDetailSerializer,
     PropertyCreateUpdateSerializer,
     ReservationSerializer,
+    ReservationStatusSerializer,
     ReviewSerializer,
     WishlistSerializer,
+    WishlistBulkSerializer,
     PropertySearchSerializer,
+    PropertyClusterSerializer,
+    ReservationExportSerializer,
+    PropertyExportSerializer,
+    HostAnalyticsSerializer,
+    wishlisted_property_ids,
 )
 
 
-class PropertyListCreateView(generics.ListCreateAPIView):
+def wishlist_entry(request, property_id):
+    """The user's wishlist entry for a property, or None for anonymous users"""
+    if not request.user.is_authenticated:
+        return None
+    return Wishlist.objects.filter(user=request.user, property_id=property_id)
+
+
+def property_etag(property_id, version, is_wishlisted):
+    return conditional.make_etag("property", property_id, version, is_wishlisted)
+
+
+class PropertyRead:
+    """
+    A conditional GET of a page built from one property, shared by the DRF
+    view and its async version (see property.async_views). Each view
+    fetches the property's ``(version, updated_at)`` and the user's
+    is_wishlisted its own way; the ETag, the 304 and the response headers
+    come from here.
+    """
+
+    def __init__(self, request, etag, last_modified):
+        self.request = request
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def not_modified(self):
+        return conditional.not_modified(self.request, self.etag, self.last_modified)
+
+    def finish(self, response):
+        conditional.set_validators(response, self.etag, self.last_modified)
+        # The ETag covers the user's is_wishlisted
+        patch_vary_headers(response, ["Authorization"])
+        return response
+
+
+class PropertyDetailRead(PropertyRead):
+    def __init__(self, request, property_id, validators, is_wishlisted):
+        version, last_modified = validators
+        super().__init__(
+            request, property_etag(property_id, version, is_wishlisted), last_modified
+        )
+        # Arguments for response_cache.cached_response: one entry per
+        # version, with is_wishlisted filled in per user
+        self.cache_name = f"property-detail:{property_id}:{version}"
+        self.generations = [response_cache.property_generation(property_id)]
+        self.wishlisted_ids = {property_id} if is_wishlisted else set()
+
+
+class PropertyReviewsRead(PropertyRead):
+    def __init__(self, request, validators, is_wishlisted):
+        version, last_modified = validators
+        # Every review embeds the property, with the user's is_wishlisted
+        etag = conditional.make_etag(
+            "reviews", request.get_full_path(), version, is_wishlisted
+        )
+        super().__init__(request, etag, last_modified)
+
+
+class PropertyRowsListMixin:
+    """
+    Serve GET lists of properties through the read-only fast path (see
+    property.fast_serialization) instead of PropertyListSerializer.
+    """
+
+    def get_wishlisted_ids(self):
+        if not hasattr(self, "wishlisted_ids"):
+            self.wishlisted_ids = wishlisted_property_ids(self.request)
+        return self.wishlisted_ids
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(fast_serialization.property_rows(queryset))
+        return self.get_paginated_response(
+            fast_serialization.serialize_properties(
+                page, request, self.get_wishlisted_ids()
+            )
+        )
+
+
+class PropertyListCreateView(PropertyRowsListMixin, generics.ListCreateAPIView):
     """List all properties or create a new property"""
 
     queryset = Property.objects.filter(is_available=True)
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = PropertyCursorPagination
     filter_backends = [
         DjangoFilterBackend,
         filters.SearchFilter,
         filters.OrderingFilter,
     ]
     search_fields = ["title", "location", "description"]
-    ordering_fields = ["price_per_night", "average_rating", "created_at"]
+    ordering_fields = ["price_per_night", "average_rating", "created_at", "search_rank"]
     ordering = ["-created_at"]
 
     def get_serializer_class(self):
@@ -39,6 +143,18 @@ class PropertyListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(host=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        generations = response_cache.listing_generations(
+            request.query_params.get("check_in"), request.query_params.get("check_out")
+        )
+        return response_cache.cached_response(
+            request,
+            "property-list",
+            generations,
+            lambda: super(PropertyListCreateView, self).list(request, *args, **kwargs),
+            wishlisted_ids=self.get_wishlisted_ids(),
+        )
+
     def get_queryset(self):
         queryset = Property.objects.filter(is_available=True)
 
@@ -52,11 +168,9 @@ class PropertyListCreateView(generics.ListCreateAPIView):
         property_type = self.request.query_params.get("property_type")
 
         if destination:
-            queryset = queryset.filter(
-                Q(location__icontains=destination)
-                | Q(title__icontains=destination)
-                | Q(description__icontains=destination)
-            )
+            queryset = search.filter_by_destination(queryset, destination)
+        else:
+            queryset = search.with_default_rank(queryset)
 
         if guests:
             try:
@@ -84,12 +198,13 @@ class PropertyListCreateView(generics.ListCreateAPIView):
 
         # Filter out properties that are booked for the given dates
         if check_in and check_out:
-            booked_properties = Reservation.objects.filter(
-                status__in=["confirmed", "pending"],
-                check_in__lt=check_out,
-                check_out__gt=check_in,
-            ).values_list("property_id", flat=True)
-            queryset = queryset.exclude(id__in=booked_properties)
+            try:
+                check_in_date = parse_date(check_in)
+                check_out_date = parse_date(check_out)
+            except ValueError:
+                check_in_date = check_out_date = None
+            if check_in_date and check_out_date:
+                queryset = queryset.available_between(check_in_date, check_out_date)
 
         return queryset
 
@@ -97,7 +212,7 @@ class PropertyListCreateView(generics.ListCreateAPIView):
 class PropertyDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a property"""
 
-    queryset = Property.objects.all()
+    queryset = PropertyDetailSerializer.setup_eager_loading(Property.objects.all())
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     def get_serializer_class(self):
@@ -110,26 +225,75 @@ class PropertyDetailView(generics.RetrieveUpdateDestroyAPIView):
             return [IsAuthenticated()]
         return [permissions.AllowAny()]
 
+    def is_wishlisted(self):
+        entry = wishlist_entry(self.request, self.kwargs["pk"])
+        return entry is not None and entry.exists()
+
+    def get_version(self, lock=False):
+        """Return ``(version, updated_at)`` without loading the property"""
+        validators = conditional.property_validators(self.kwargs["pk"], lock=lock)
+        if validators is None:
+            raise Http404
+        return validators
+
+    def get_etag(self, version, is_wishlisted):
+        return property_etag(self.kwargs["pk"], version, is_wishlisted)
+
+    def retrieve(self, request, *args, **kwargs):
+        read = PropertyDetailRead(
+            request, self.kwargs["pk"], self.get_version(), self.is_wishlisted()
+        )
+        response = read.not_modified()
+        if response is None:
+            response = response_cache.cached_response(
+                request,
+                read.cache_name,
+                read.generations,
+                lambda: super(PropertyDetailView, self).retrieve(
+                    request, *args, **kwargs
+                ),
+                wishlisted_ids=read.wishlisted_ids,
+                validate=False,
+            )
+        return read.finish(response)
+
+    def check_preconditions(self):
+        """Lock the property and enforce If-Match / If-Unmodified-Since"""
+        version, last_modified = self.get_version(lock=True)
+        etag = self.get_etag(version, self.is_wishlisted())
+        conditional.check_preconditions(self.request, etag, last_modified)
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        version, last_modified = self.get_version()
+        etag = self.get_etag(version, self.is_wishlisted())
+        return conditional.set_validators(response, etag, last_modified)
+
     def perform_update(self, serializer):
         # Only allow property owner to update
         if self.get_object().host != self.request.user:
-            raise permissions.PermissionDenied("You can only edit your own properties.")
-        serializer.save()
+            raise exceptions.PermissionDenied("You can only edit your own properties.")
+        with transaction.atomic():
+            self.check_preconditions()
+            serializer.save()
 
     def perform_destroy(self, instance):
         # Only allow property owner to delete
         if instance.host != self.request.user:
-            raise permissions.PermissionDenied(
+            raise exceptions.PermissionDenied(
                 "You can only delete your own properties."
             )
-        instance.delete()
+        with transaction.atomic():
+            self.check_preconditions()
+            instance.delete()
 
 
-class UserPropertiesView(generics.ListAPIView):
+class UserPropertiesView(PropertyRowsListMixin, generics.ListAPIView):
     """List properties owned by the authenticated user"""
 
     serializer_class = PropertyListSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PropertyCursorPagination
 
     def get_queryset(self):
         return Property.objects.filter(host=self.request.user)
@@ -139,7 +303,7 @@ class UserPropertiesView(generics.ListAPIView):
 @permission_classes([IsAuthenticated])
 def create_reservation(request):
     """Create a new reservation"""
-    serializer = ReservationSerializer(data=request.data)
+    serializer = ReservationSerializer(data=request.data, context={"request": request})
     if serializer.is_valid():
         serializer.save(guest=request.user)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -151,35 +315,44 @@ class ReservationListView(generics.ListAPIView):
 
     serializer_class = ReservationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return Reservation.objects.filter(guest=self.request.user)
+        return ReservationSerializer.setup_eager_loading(
+            Reservation.objects.filter(guest=self.request.user)
+        )
 
 
 class ReservationDetailView(generics.RetrieveUpdateAPIView):
     """Retrieve or update a reservation"""
 
-    serializer_class = ReservationSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.request.method in ["PUT", "PATCH"]:
+            return ReservationStatusSerializer
+        return ReservationSerializer
+
     def get_queryset(self):
-        return Reservation.objects.filter(guest=self.request.user)
+        return ReservationSerializer.setup_eager_loading(
+            Reservation.objects.filter(guest=self.request.user)
+        )
 
     def perform_update(self, serializer):
         # Only allow status updates for now
         instance = self.get_object()
         if "status" in serializer.validated_data:
             if (
-                instance.status == "confirmed"
+                instance.status in Reservation.BLOCKING_STATUSES
                 and serializer.validated_data["status"] == "cancelled"
             ):
                 serializer.save()
             else:
-                raise permissions.PermissionDenied(
-                    "You can only cancel confirmed reservations."
+                raise exceptions.PermissionDenied(
+                    "You can only cancel pending or confirmed reservations."
                 )
         else:
-            raise permissions.PermissionDenied("Only status updates are allowed.")
+            raise exceptions.PermissionDenied("Only status updates are allowed.")
 
 
 @api_view(["POST"])
@@ -188,11 +361,13 @@ def cancel_reservation(request, reservation_id):
     """Cancel a reservation"""
     try:
         reservation = Reservation.objects.get(
-            id=reservation_id, guest=request.user, status="confirmed"
+            id=reservation_id,
+            guest=request.user,
+            status__in=Reservation.BLOCKING_STATUSES,
         )
         reservation.status = "cancelled"
         reservation.save()
-        serializer = ReservationSerializer(reservation)
+        serializer = ReservationSerializer(reservation, context={"request": request})
         return Response(serializer.data)
     except Reservation.DoesNotExist:
         return Response(
@@ -201,15 +376,59 @@ def cancel_reservation(request, reservation_id):
         )
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def confirm_reservation(request, reservation_id):
+    """Confirm a pending reservation on one of the user's properties"""
+    with transaction.atomic():
+        # Locked, so the sweep cannot expire it in the meantime
+        reservation = (
+            Reservation.objects.select_for_update(of=("self",))
+            .filter(
+                id=reservation_id,
+                property__host=request.user,
+                status="pending",
+                created_at__gte=lifecycle.hold_cutoff(),
+            )
+            .first()
+        )
+        if reservation is None:
+            return Response(
+                {"error": "Reservation not found or cannot be confirmed"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        reservation.status = "confirmed"
+        reservation.save()
+    serializer = ReservationSerializer(reservation, context={"request": request})
+    return Response(serializer.data)
+
+
 class PropertyReviewsView(generics.ListCreateAPIView):
     """List reviews for a property or create a new review"""
 
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+
+    def is_wishlisted(self):
+        entry = wishlist_entry(self.request, self.kwargs["property_id"])
+        return entry is not None and entry.exists()
+
+    def list(self, request, *args, **kwargs):
+        validators = conditional.property_validators(self.kwargs["property_id"])
+        if validators is None:
+            return super().list(request, *args, **kwargs)
+        read = PropertyReviewsRead(request, validators, self.is_wishlisted())
+        response = read.not_modified()
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return read.finish(response)
 
     def get_queryset(self):
         property_id = self.kwargs["property_id"]
-        return Review.objects.filter(property_id=property_id)
+        return ReviewSerializer.setup_eager_loading(
+            Review.objects.filter(property_id=property_id)
+        )
 
     def perform_create(self, serializer):
         property_id = self.kwargs["property_id"]
@@ -221,13 +440,13 @@ class PropertyReviewsView(generics.ListCreateAPIView):
         ).first()
 
         if not reservation:
-            raise permissions.PermissionDenied(
+            raise exceptions.PermissionDenied(
                 "You can only review properties you have stayed at."
             )
 
         # Check if user already reviewed this reservation
         if hasattr(reservation, "review"):
-            raise permissions.PermissionDenied("You have already reviewed this stay.")
+            raise exceptions.PermissionDenied("You have already reviewed this stay.")
 
         serializer.save(
             guest=self.request.user, property=property_obj, reservation=reservation
@@ -239,21 +458,54 @@ class WishlistView(generics.ListCreateAPIView):
 
     serializer_class = WishlistSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return Wishlist.objects.filter(user=self.request.user)
+        return WishlistSerializer.setup_eager_loading(
+            Wishlist.objects.filter(user=self.request.user)
+        )
 
     def perform_create(self, serializer):
         property_id = self.request.data.get("property_id")
         property_obj = get_object_or_404(Property, id=property_id)
 
-        # Check if already in wishlist
-        if Wishlist.objects.filter(
-            user=self.request.user, property=property_obj
-        ).exists():
-            raise permissions.PermissionDenied("Property already in wishlist.")
+        # Let the unique (user, property) constraint catch duplicates
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user, property=property_obj)
+        except IntegrityError:
+            raise exceptions.PermissionDenied("Property already in wishlist.")
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def bulk_update_wishlist(request):
+    """Add and remove many wishlist entries in one idempotent request"""
+    serializer = WishlistBulkSerializer(data=request.data)
+    if serializer.is_valid():
+        add = set(
+            Property.objects.filter(
+                pk__in=serializer.validated_data["add"]
+            ).values_list("pk", flat=True)
+        )
+        remove = serializer.validated_data["remove"]
+        with transaction.atomic():
+            Wishlist.objects.bulk_create(
+                [Wishlist(user=request.user, property_id=pk) for pk in add],
+                ignore_conflicts=True,
+            )
+            Wishlist.objects.filter(user=request.user, property_id__in=remove).delete()
+        return Response(
+            {
+                "added": sorted(str(pk) for pk in add),
+                "removed": sorted(str(pk) for pk in remove),
+                "not_found": sorted(
+                    str(pk) for pk in serializer.validated_data["add"] if pk not in add
+                ),
+            }
+        )
 
-        serializer.save(user=self.request.user, property=property_obj)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(["DELETE"])
@@ -275,51 +527,221 @@ def remove_from_wishlist(request, property_id):
 @api_view(["GET"])
 def property_search(request):
     """Advanced property search"""
+    wishlisted_ids = wishlisted_property_ids(request)
+    return response_cache.cached_response(
+        request,
+        "property-search",
+        search_generations(request),
+        lambda: _property_search(request, wishlisted_ids),
+        wishlisted_ids=wishlisted_ids,
+    )
+
+
+def _property_search(request, wishlisted_ids):
+    validated_data, paginator, queryset = search_request(request)
+
+    facet_counts = None
+    if validated_data["facets"]:
+        facet_counts = facets.get_facets(
+            queryset, validated_data, validated_data["price_bucket"]
+        )
+
+    if validated_data["stream"]:
+        # Every match, emitted as it is read instead of one page
+        field, descending = paginator.get_ordering(request, queryset, None)
+        direction = "-" if descending else ""
+        return streaming.stream_properties(
+            queryset.order_by(f"{direction}{field}", f"{direction}pk"),
+            request,
+            wishlisted_ids,
+            extra=None if facet_counts is None else {"facets": facet_counts},
+        )
+
+    page = paginator.paginate_queryset(
+        fast_serialization.property_rows(queryset), request
+    )
+    response = paginator.get_paginated_response(
+        fast_serialization.serialize_properties(page, request, wishlisted_ids)
+    )
+    if facet_counts is not None:
+        response.data["facets"] = facet_counts
+    return response
+
+
+def search_generations(request):
+    """The response cache generations a search depends on"""
+    return response_cache.listing_generations(
+        request.query_params.get("check_in"), request.query_params.get("check_out")
+    )
+
+
+def search_request(request):
+    """
+    Validate a search and return ``(validated_data, paginator, queryset)``
+    for its first or next page; invalid parameters raise a ValidationError.
+    """
     serializer = PropertySearchSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    paginator = PropertyCursorPagination()
+    queryset = search_queryset(serializer.validated_data, paginator)
+    return serializer.validated_data, paginator, queryset
+
+
+def search_queryset(validated_data, paginator):
+    """
+    Return the available properties matching validated search parameters;
+    radius searches also default ``paginator`` to ordering by distance.
+    """
+    queryset = Property.objects.filter(is_available=True)
+
+    if validated_data.get("destination"):
+        queryset = search.filter_by_destination(queryset, validated_data["destination"])
+    else:
+        queryset = search.with_default_rank(queryset)
+
+    if validated_data.get("guests"):
+        queryset = queryset.filter(guests__gte=validated_data["guests"])
+
+    if validated_data.get("min_price"):
+        queryset = queryset.filter(price_per_night__gte=validated_data["min_price"])
+
+    if validated_data.get("max_price"):
+        queryset = queryset.filter(price_per_night__lte=validated_data["max_price"])
+
+    if validated_data.get("property_type"):
+        queryset = queryset.filter(property_type=validated_data["property_type"])
+
+    if validated_data.get("amenities"):
+        queryset = queryset.with_all_amenities(validated_data["amenities"])
+
+    # Filter by availability dates
+    if validated_data.get("check_in") and validated_data.get("check_out"):
+        queryset = queryset.available_between(
+            validated_data["check_in"], validated_data["check_out"]
+        )
+
+    # Map viewport and/or distance from a centre point
+    if validated_data.get("bbox"):
+        queryset = geo.filter_bbox(queryset, *validated_data["bbox"])
+
+    if "lat" in validated_data:
+        queryset = geo.filter_radius(
+            queryset,
+            validated_data["lat"],
+            validated_data["lng"],
+            validated_data["radius_km"],
+        )
+        paginator.ordering = "distance"
+    return queryset
+
+
+@api_view(["GET"])
+@permission_classes([permissions.AllowAny])
+def property_clusters(request):
+    """Aggregated map markers for a viewport"""
+    serializer = PropertyClusterSerializer(data=request.query_params)
     if serializer.is_valid():
-        queryset = Property.objects.filter(is_available=True)
+        min_lat, min_lng, max_lat, max_lng = serializer.validated_data["bbox"]
+        # An explicit zoom can only make the cells bigger, so the number of
+        # clusters depends on the screen and not on the viewport
+        zoom = clusters.zoom_for_viewport(
+            min_lat, min_lng, max_lat, max_lng, serializer.validated_data["width"]
+        )
+        if serializer.validated_data.get("zoom") is not None:
+            zoom = min(zoom, serializer.validated_data["zoom"])
+        return Response(
+            {
+                "zoom": zoom,
+                "clusters": clusters.clusters_in_viewport(
+                    zoom, min_lat, min_lng, max_lat, max_lng
+                ),
+            }
+        )
 
-        # Apply filters based on search parameters
-        validated_data = serializer.validated_data
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        if validated_data.get("destination"):
-            destination = validated_data["destination"]
-            queryset = queryset.filter(
-                Q(location__icontains=destination) | Q(title__icontains=destination)
-            )
 
-        if validated_data.get("guests"):
-            queryset = queryset.filter(guests__gte=validated_data["guests"])
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_reservations(request, export_format):
+    """Stream every reservation on the user's properties as CSV or NDJSON"""
+    serializer = ReservationExportSerializer(data=request.query_params)
+    if serializer.is_valid():
+        validated_data = serializer.validated_data
+        queryset = Reservation.objects.filter(property__host=request.user)
+
+        # Stays that overlap the date range
+        if validated_data.get("start"):
+            queryset = queryset.filter(check_out__gt=validated_data["start"])
+        if validated_data.get("end"):
+            queryset = queryset.filter(check_in__lte=validated_data["end"])
+        if validated_data.get("status"):
+            queryset = queryset.filter(status__in=validated_data["status"])
+
+        return exports.stream_export(
+            queryset,
+            exports.RESERVATION_COLUMNS,
+            export_format,
+            "reservations",
+            after=validated_data.get("after"),
+        )
 
-        if validated_data.get("min_price"):
-            queryset = queryset.filter(price_per_night__gte=validated_data["min_price"])
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        if validated_data.get("max_price"):
-            queryset = queryset.filter(price_per_night__lte=validated_data["max_price"])
 
-        if validated_data.get("property_type"):
-            queryset = queryset.filter(property_type=validated_data["property_type"])
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_properties(request, export_format):
+    """Stream every property the user hosts as CSV or NDJSON"""
+    serializer = PropertyExportSerializer(data=request.query_params)
+    if serializer.is_valid():
+        validated_data = serializer.validated_data
+        queryset = Property.objects.filter(host=request.user)
+
+        # Listings created within the date range
+        if validated_data.get("start"):
+            queryset = queryset.filter(created_at__date__gte=validated_data["start"])
+        if validated_data.get("end"):
+            queryset = queryset.filter(created_at__date__lte=validated_data["end"])
+        if len(validated_data.get("status", ())) == 1:
+            queryset = queryset.filter(
+                is_available="available" in validated_data["status"]
+            )
 
-        if validated_data.get("amenities"):
-            for amenity in validated_data["amenities"]:
-                queryset = queryset.filter(amenities__icontains=amenity)
+        return exports.stream_export(
+            queryset,
+            exports.PROPERTY_COLUMNS,
+            export_format,
+            "properties",
+            after=validated_data.get("after"),
+        )
 
-        # Filter by availability dates
-        if validated_data.get("check_in") and validated_data.get("check_out"):
-            check_in = validated_data["check_in"]
-            check_out = validated_data["check_out"]
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            booked_properties = Reservation.objects.filter(
-                status__in=["confirmed", "pending"],
-                check_in__lt=check_out,
-                check_out__gt=check_in,
-            ).values_list("property_id", flat=True)
 
-            queryset = queryset.exclude(id__in=booked_properties)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def host_analytics(request):
+    """Monthly occupancy, revenue and ADR of the user's properties"""
+    serializer = HostAnalyticsSerializer(data=request.query_params)
+    if serializer.is_valid():
+        validated_data = serializer.validated_data
+        property_id = validated_data.get("property")
+        if (
+            property_id is not None
+            and not Property.objects.filter(pk=property_id, host=request.user).exists()
+        ):
+            return Response(
+                {"error": "Property not found"}, status=status.HTTP_404_NOT_FOUND
+            )
 
-        properties = PropertyListSerializer(
-            queryset, many=True, context={"request": request}
+        return Response(
+            analytics.host_report(
+                request.user,
+                validated_data["start"],
+                validated_data["end"],
+                property_id=property_id,
+            )
         )
-        return Response(properties.data)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,162 @@
+"""
+JWT authentication with an in-process user cache.
+
+``JWTAuthentication`` loads the user row on every request. This subclass
+keeps recently seen users in a bounded LRU with a TTL, keyed on the user id
+and the user's auth version. The version lives in the shared cache and is
+bumped whenever the user row, its groups or its permissions change (see
+useraccount.signals), so an edit made in any process makes every cached copy
+unreachable on the next request, which then reads the row again.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def _version_key(user_id):
+    return f"auth-version:{user_id}"
+
+
+def get_version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted version never comes back with a
+        # value that older cache entries were stored under.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(user_id):
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def _bump_now(user_id):
+    key = _version_key(user_id)
+    current = cache.get(key) or 0
+    cache.set(key, max(time.time_ns(), current + 1), None)
+    users.discard(user_id)
+
+
+def invalidate(user_id):
+    """Make every cached copy of the user stale"""
+    # Also right away, so the writing request's own process never serves
+    # the old row while the transaction is still open.
+    users.discard(user_id)
+    transaction.on_commit(lambda: _bump_now(user_id))
+
+
+class UserCache:
+    """Thread-safe LRU of user objects with a per-entry time to live"""
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id, version):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            cached_version, expires_at, user = entry
+            if cached_version != version or expires_at < time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+        # Requests get their own copy, so changes made while handling one
+        # never leak into another.
+        return copy.copy(user)
+
+    def set(self, user_id, version, user):
+        entry = (version, time.monotonic() + self.timeout, copy.copy(user))
+        with self.lock:
+            self.entries[user_id] = entry
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+users = UserCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TIMEOUT)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        version = get_version(user_id)
+        user = users.get(user_id, version)
+        if user is None:
+            user = super().get_user(validated_token)
+            users.set(user_id, version, user)
+            return user
+        return self.check_user(user, validated_token)
+
+    async def aauthenticate(self, request):
+        """``authenticate`` for async views"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        version = await aget_version(user_id)
+        user = users.get(user_id, version)
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed("User not found", code="user_not_found")
+            self.check_user(user, validated_token)
+            users.set(user_id, version, user)
+            return user
+        return self.check_user(user, validated_token)
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+    def check_user(self, user, validated_token):
+        # The same checks JWTAuthentication makes on a freshly loaded row
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                "The user's password has been changed.", code="password_changed"
+            )
+        return user
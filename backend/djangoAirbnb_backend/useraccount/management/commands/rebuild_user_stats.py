@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from useraccount import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every user's dashboard stats from their properties, "
+        "reservations and reviews"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        corrected = stats.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Created or corrected the stats of {corrected} users")
+        )
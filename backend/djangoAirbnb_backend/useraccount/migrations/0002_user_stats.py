@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("useraccount", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("properties", models.IntegerField(default=0)),
+                ("reservations", models.IntegerField(default=0)),
+                ("reviews_given", models.IntegerField(default=0)),
+                ("reviews_received", models.IntegerField(default=0)),
+                ("host_bookings", models.IntegerField(default=0)),
+                ("host_completed_bookings", models.IntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "user stats",
+            },
+        ),
+    ]
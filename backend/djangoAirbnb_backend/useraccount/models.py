@@ -56,5 +56,46 @@ class User(AbstractUser):
 
     objects = CustomUserManager()
 
+    # Shown with every property the user hosts
+    LISTING_FIELDS = ["name", "email", "avatar", "bio", "is_host"]
+
     def __str__(self):
         return self.email
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_listing = instance.get_listing_key()
+        return instance
+
+    def get_listing_key(self):
+        """The values of LISTING_FIELDS, or None if any is deferred"""
+        if set(self.LISTING_FIELDS) & self.get_deferred_fields():
+            return None
+        return tuple(
+            self._meta.get_field(name).value_to_string(self)
+            for name in self.LISTING_FIELDS
+        )
+
+
+class UserStats(models.Model):
+    """
+    Running totals shown by the user_stats endpoint, one row per user (see
+    useraccount.stats).
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    properties = models.IntegerField(default=0)
+    reservations = models.IntegerField(default=0)
+    reviews_given = models.IntegerField(default=0)
+    reviews_received = models.IntegerField(default=0)
+    host_bookings = models.IntegerField(default=0)
+    host_completed_bookings = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "user stats"
+
+    def __str__(self):
+        return f"Stats for user {self.user_id}"
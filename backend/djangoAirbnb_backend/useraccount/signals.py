@@ -0,0 +1,155 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from property import lifecycle
+from property.models import Property, Reservation, Review, deleted_with
+
+from . import authentication, stats
+from .models import UserStats
+
+User = get_user_model()
+
+PARTY_FIELDS = {"guest", "guest_id", "property", "property_id", "status"}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    authentication.invalidate(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_cached_user_permissions(sender, instance, action, reverse, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        # A group or permission changed members; pk_set holds the users
+        for user_id in kwargs["pk_set"] or ():
+            authentication.invalidate(user_id)
+    else:
+        authentication.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, using, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.using(using).create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def touch_hosted_properties(sender, instance, created, using, update_fields, **kwargs):
+    if update_fields is not None and not set(User.LISTING_FIELDS) & set(update_fields):
+        return
+    listing = instance.get_listing_key()
+    if not created and listing != getattr(instance, "_loaded_listing", None):
+        # Property payloads embed their host and review pages their guests:
+        # new versions give them new ETags and detail cache keys, and
+        # touch() renews the cached lists.
+        Property.objects.using(using).filter(
+            Q(host=instance)
+            | Q(
+                pk__in=Review.objects.using(using)
+                .filter(guest=instance)
+                .values("property_id")
+            )
+        ).touch()
+    instance._loaded_listing = listing
+
+
+@receiver(post_save, sender=Property)
+def update_host_stats(sender, instance, created, using, update_fields, **kwargs):
+    if update_fields is not None and not {"host", "host_id"} & update_fields:
+        return
+    old_host_id = getattr(instance, "_loaded_host_id", None)
+    if created:
+        stats.apply(stats.property_changes(instance.host_id, 1), using=using)
+    elif old_host_id is not None and old_host_id != instance.host_id:
+        # An unknown old host (deferred field) is left to rebuild_user_stats
+        stats.move_property(instance.pk, old_host_id, instance.host_id, using=using)
+    instance._loaded_host_id = instance.host_id
+
+
+@receiver(post_delete, sender=Property)
+def remove_host_stats(sender, instance, using, origin=None, **kwargs):
+    if deleted_with(origin, User):
+        # The host's own stats go with them
+        return
+    stats.apply(stats.property_changes(instance.host_id, -1), using=using)
+
+
+@receiver(pre_delete, sender=Property)
+def remove_cascaded_property_stats(sender, instance, using, origin=None, **kwargs):
+    if deleted_with(origin, User):
+        return
+    stats.remove_deleted(
+        Reservation.objects.using(using).filter(property=instance),
+        Review.objects.using(using).filter(property=instance),
+        using=using,
+    )
+
+
+@receiver(pre_delete, sender=User)
+def remove_cascaded_user_stats(sender, instance, using, **kwargs):
+    # Their stays and reviews, and those on their properties
+    parties = Q(guest=instance) | Q(property__host=instance)
+    stats.remove_deleted(
+        Reservation.objects.using(using).filter(parties),
+        Review.objects.using(using).filter(parties),
+        using=using,
+    )
+
+
+def _update_party_stats(instance, created, using, update_fields, parties, changes):
+    if update_fields is not None and not PARTY_FIELDS & set(update_fields):
+        return
+    old = getattr(instance, "_loaded_parties", None)
+    if created:
+        stats.apply(changes(parties, 1), using=using)
+    elif old is not None and old != parties:
+        # An unknown old state (deferred fields) is left to rebuild_user_stats
+        stats.apply(changes(old, -1) + changes(parties, 1), using=using)
+    instance._loaded_parties = parties
+
+
+@receiver(post_save, sender=Reservation)
+def update_reservation_stats(sender, instance, created, using, update_fields, **kwargs):
+    parties = (instance.guest_id, instance.property_id, instance.status)
+    _update_party_stats(
+        instance, created, using, update_fields, parties, stats.reservation_changes
+    )
+
+
+@receiver(post_delete, sender=Reservation)
+def remove_reservation_stats(sender, instance, using, origin=None, **kwargs):
+    if deleted_with(origin, Property, User):
+        return
+    parties = (instance.guest_id, instance.property_id, instance.status)
+    stats.apply(stats.reservation_changes(parties, -1), using=using)
+
+
+@receiver(lifecycle.status_changed, sender=Reservation)
+def update_swept_reservation_stats(
+    sender, reservation_ids, old_status, new_status, using, **kwargs
+):
+    stats.apply(
+        stats.status_changes(reservation_ids, old_status, new_status, using=using),
+        using=using,
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_review_stats(sender, instance, created, using, update_fields, **kwargs):
+    parties = (instance.guest_id, instance.property_id)
+    _update_party_stats(
+        instance, created, using, update_fields, parties, stats.review_changes
+    )
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_stats(sender, instance, using, origin=None, **kwargs):
+    if deleted_with(origin, Property, User):
+        return
+    parties = (instance.guest_id, instance.property_id)
+    stats.apply(stats.review_changes(parties, -1), using=using)
@@ -0,0 +1,223 @@
+"""
+Per-user totals behind the user_stats endpoint.
+
+``UserStats`` keeps one row of counters per user. Signal handlers (see
+useraccount.signals) turn every property, reservation and review write into
+``F()`` increments of the affected rows, at most one UPDATE per user, so
+reading a user's stats is a single primary key lookup. Counters a property's
+host receives are addressed through the property, with the host looked up
+in the same statement.
+
+Deleting a property or a user takes its cascaded reservations and reviews
+out in bulk with ``remove_deleted`` instead of one handler per row.
+
+Writes that bypass signals (``bulk_create``, queryset ``update()``, saves of
+instances loaded with deferred fields) leave the counters behind;
+``rebuild`` recomputes them with one grouped query per counter. The batch
+updates of the reservation lifecycle sweep send
+``property.lifecycle.status_changed`` instead, which is handled here.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from property.models import Property, Reservation, Review
+
+from .models import User, UserStats
+
+# Counter -> (model, user lookup, filters)
+COUNTERS = {
+    "properties": (Property, "host_id", {}),
+    "reservations": (Reservation, "guest_id", {}),
+    "reviews_given": (Review, "guest_id", {}),
+    "reviews_received": (Review, "property__host_id", {}),
+    "host_bookings": (Reservation, "property__host_id", {}),
+    "host_completed_bookings": (
+        Reservation,
+        "property__host_id",
+        {"status": "completed"},
+    ),
+}
+
+
+def property_changes(host_id, sign):
+    return [(("user", host_id), "properties", sign)]
+
+
+def reservation_changes(parties, sign):
+    guest_id, property_id, status = parties
+    return [
+        (("user", guest_id), "reservations", sign),
+        (("host", property_id), "host_bookings", sign),
+        (
+            ("host", property_id),
+            "host_completed_bookings",
+            sign * (status == "completed"),
+        ),
+    ]
+
+
+def status_changes(reservation_ids, old_status, new_status, using=None):
+    """Changes for moving the reservations from one status to another"""
+    sign = (new_status == "completed") - (old_status == "completed")
+    if not sign:
+        return []
+    hosts = (
+        Reservation.objects.using(using)
+        .filter(pk__in=reservation_ids)
+        .order_by()
+        .values("property__host_id")
+        .annotate(count=Count("pk"))
+    )
+    return [
+        (
+            ("user", row["property__host_id"]),
+            "host_completed_bookings",
+            sign * row["count"],
+        )
+        for row in hosts
+    ]
+
+
+def review_changes(parties, sign):
+    guest_id, property_id = parties
+    return [
+        (("user", guest_id), "reviews_given", sign),
+        (("host", property_id), "reviews_received", sign),
+    ]
+
+
+def apply(changes, using=None):
+    """Apply ``(target, counter, delta)`` changes, one UPDATE per target"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for target, counter, delta in changes:
+        deltas[target][counter] += delta
+
+    for (kind, key), counters in deltas.items():
+        counters = {name: delta for name, delta in counters.items() if delta}
+        if not counters or key is None:
+            continue
+        rows = UserStats.objects.using(using)
+        if kind == "host":
+            host = Property.objects.using(using).filter(pk=key).values("host_id")
+            rows = rows.filter(pk=Subquery(host))
+        else:
+            rows = rows.filter(pk=key)
+        # Users without a row yet get theirs computed on first read.
+        rows.update(**{name: F(name) + delta for name, delta in counters.items()})
+
+
+def remove_deleted(reservations, reviews, using=None):
+    """
+    Take ``reservations`` and ``reviews`` that are about to be deleted out
+    of the counters, one UPDATE per user lookup however many rows and users
+    there are. For the cascades of property and user deletes, whose rows
+    skip the per-row signal handlers.
+    """
+    if not reservations.exists() and not reviews.exists():
+        # Building the correlated UPDATEs costs more than this check
+        return
+    rows = {Reservation: reservations, Review: reviews}
+    updates = defaultdict(dict)
+    users = defaultdict(Q)
+    for name, (model, lookup, filters) in COUNTERS.items():
+        if model in rows:
+            counted = (
+                rows[model]
+                .filter(**filters, **{lookup: OuterRef("pk")})
+                .order_by()
+                .values(lookup)
+                .annotate(count=Count("pk"))
+                .values("count")
+            )
+            updates[lookup][name] = F(name) - Coalesce(Subquery(counted), 0)
+            users[lookup] |= Q(pk__in=rows[model].values(lookup))
+    for lookup, counters in updates.items():
+        UserStats.objects.using(using).filter(users[lookup]).update(**counters)
+
+
+def move_property(property_id, old_host_id, new_host_id, using=None):
+    """Move a property's counters over to its new host"""
+    reviews = Review.objects.using(using).filter(property_id=property_id).count()
+    bookings = Reservation.objects.using(using).filter(property_id=property_id)
+    completed = bookings.filter(status="completed").count()
+    bookings = bookings.count()
+    changes = []
+    for host_id, sign in [(old_host_id, -1), (new_host_id, 1)]:
+        changes += [
+            (("user", host_id), "properties", sign),
+            (("user", host_id), "reviews_received", sign * reviews),
+            (("user", host_id), "host_bookings", sign * bookings),
+            (("user", host_id), "host_completed_bookings", sign * completed),
+        ]
+    apply(changes, using=using)
+
+
+def compute(user_ids):
+    """Return ``{user id: {counter: value}}`` counted from the source tables"""
+    totals = {user_id: dict.fromkeys(COUNTERS, 0) for user_id in user_ids}
+    for name, (model, lookup, filters) in COUNTERS.items():
+        rows = (
+            model.objects.filter(**filters, **{f"{lookup}__in": user_ids})
+            .order_by()
+            .values(lookup)
+            .annotate(count=Count("pk"))
+        )
+        for row in rows:
+            totals[row[lookup]][name] = row["count"]
+    return totals
+
+
+def for_user(user):
+    """Return the user's ``UserStats``, computing the row if it is missing"""
+    stats, created = UserStats.objects.get_or_create(user=user)
+    if created:
+        # The empty row is committed first, so increments from now on land
+        # on it. Counted under its lock, the totals include every write
+        # committed before, and later increments wait and add up on top.
+        with transaction.atomic():
+            stats = UserStats.objects.select_for_update().get(pk=user.pk)
+            for name, value in compute([user.pk])[user.pk].items():
+                setattr(stats, name, value)
+            stats.save(update_fields=list(COUNTERS))
+    return stats
+
+
+def rebuild(batch_size=1000):
+    """Return the number of users whose stats were created or corrected"""
+    users = User.objects.order_by("pk").values_list("pk", flat=True)
+    corrected = 0
+    last_pk = None
+    while True:
+        page = users if last_pk is None else users.filter(pk__gt=last_pk)
+        with transaction.atomic():
+            user_ids = list(page[:batch_size])
+            if not user_ids:
+                break
+            last_pk = user_ids[-1]
+            # Locking the rows holds back concurrent increments until the
+            # recomputed values are written.
+            existing = {
+                stats.pk: stats
+                for stats in UserStats.objects.select_for_update().filter(
+                    pk__in=user_ids
+                )
+            }
+
+            changed, missing = [], []
+            for user_id, values in compute(user_ids).items():
+                stats = existing.get(user_id)
+                if stats is None:
+                    missing.append(UserStats(user_id=user_id, **values))
+                elif any(
+                    getattr(stats, name) != value for name, value in values.items()
+                ):
+                    for name, value in values.items():
+                        setattr(stats, name, value)
+                    changed.append(stats)
+            UserStats.objects.bulk_update(changed, list(COUNTERS))
+            UserStats.objects.bulk_create(missing)
+            corrected += len(changed) + len(missing)
+    return corrected
@@ -1,3 +1,243 @@
+from datetime import date, timedelta
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from property import lifecycle
+from property.models import Property, Reservation, Review
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import authentication, stats
+
+User = get_user_model()
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """
+    Changes to a user reach the next request even though the user is cached,
+    including in processes that cached it before the change: the test puts
+    the stale copy back under the old auth version, as such a process holds.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("user@example.com")
+        cls.permission = Permission.objects.get(codename="add_property")
+        cls.group = Group.objects.create(name="Editors")
+
+    def setUp(self):
+        cache.clear()
+        authentication.users.clear()
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    def request(self):
+        return Request(
+            APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        )
+
+    def authenticate(self):
+        """Authenticate a request the sync way, then the async way"""
+        backend = authentication.CachedJWTAuthentication()
+        user, _ = backend.authenticate(self.request())
+        auser, _ = async_to_sync(backend.aauthenticate)(self.request())
+        return user, auser
+
+    def change(self, update):
+        """Apply ``update`` to the user the way another process would see it"""
+        stale, _ = self.authenticate()
+        old_version = authentication.get_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            update(User.objects.get(pk=self.user.pk))
+        authentication.users.set(self.user.pk, old_version, stale)
+
+    def test_cached_user_is_reused(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user, auser = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(auser.pk, self.user.pk)
+
+    def test_deactivation(self):
+        def deactivate(user):
+            user.is_active = False
+            user.save()
+
+        self.change(deactivate)
+        backend = authentication.CachedJWTAuthentication()
+        with self.assertRaisesMessage(AuthenticationFailed, "User is inactive"):
+            backend.authenticate(self.request())
+        with self.assertRaisesMessage(AuthenticationFailed, "User is inactive"):
+            async_to_sync(backend.aauthenticate)(self.request())
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        response = client.get(reverse("useraccount:user-profile"))
+        self.assertEqual(response.status_code, 401)
+
+    def test_staff_change(self):
+        def promote(user):
+            user.is_staff = True
+            user.save(update_fields=["is_staff"])
+
+        self.change(promote)
+        for user in self.authenticate():
+            self.assertTrue(user.is_staff)
+
+    def test_user_permissions(self):
+        self.change(lambda user: user.user_permissions.add(self.permission))
+        for user in self.authenticate():
+            self.assertTrue(user.has_perm("property.add_property"))
+
+        self.change(lambda user: user.user_permissions.clear())
+        for user in self.authenticate():
+            self.assertFalse(user.has_perm("property.add_property"))
+
+    def test_groups(self):
+        self.group.permissions.add(self.permission)
+        self.change(lambda user: user.groups.add(self.group))
+        for user in self.authenticate():
+            self.assertTrue(user.has_perm("property.add_property"))
+
+        # From the group's side, with the users in pk_set
+        self.change(lambda user: self.group.user_set.remove(user))
+        for user in self.authenticate():
+            self.assertFalse(user.has_perm("property.add_property"))
+
+    def test_group_permissions(self):
+        self.change(lambda user: user.groups.add(self.group))
+        self.authenticate()
+        self.group.permissions.add(self.permission)
+        for user in self.authenticate():
+            self.assertTrue(user.has_perm("property.add_property"))
+
+
+class UserStatsTests(TestCase):
+    """The stats rows always equal the totals counted from the source tables"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user("host@example.com", is_host=True)
+        cls.guest = User.objects.create_user("guest@example.com")
+        cls.property = Property.objects.create(
+            title="Flat",
+            description="A place to stay",
+            location="Paris",
+            address="1 Rue de Rivoli",
+            price_per_night=100,
+            host=cls.host,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def api_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def book(
+        self, status="completed", guest=None, check_in=date(2024, 5, 1), prop=None
+    ):
+        return Reservation.objects.create(
+            property=prop or self.property,
+            guest=guest or self.guest,
+            check_in=check_in,
+            check_out=check_in + timedelta(days=2),
+            guests_count=1,
+            total_price=200,
+            status=status,
+        )
+
+    def review(self, reservation, rating=4):
+        return Review.objects.create(
+            property=reservation.property,
+            guest=reservation.guest,
+            reservation=reservation,
+            rating=rating,
+            comment="Stayed here",
+        )
+
+    def assertStats(self):
+        """Every user's row matches a fresh count, and rebuild changes nothing"""
+        users = list(User.objects.all())
+        expected = stats.compute([user.pk for user in users])
+        for user in users:
+            row = stats.for_user(user)
+            self.assertEqual(
+                {name: getattr(row, name) for name in stats.COUNTERS},
+                expected[user.pk],
+                user.email,
+            )
+        self.assertEqual(stats.rebuild(), 0)
+
+    def test_deferred_loads(self):
+        self.review(self.book())
+        self.assertStats()
+
+        # Instances loaded without their parties need no query of their own
+        with self.assertNumQueries(3):
+            list(Property.objects.only("title"))
+            list(Reservation.objects.only("check_in"))
+            list(Review.objects.only("comment"))
+
+        review = Review.objects.only("comment").get()
+        review.comment = "Still lovely"
+        review.save()
+        self.assertStats()
+
+        # The old status of a reservation loaded without its parties is
+        # unknown, so rebuild reconciles its host's counters
+        reservation = Reservation.objects.only("status").get()
+        reservation.status = "cancelled"
+        reservation.save(update_fields=["status"])
+        self.assertEqual(stats.rebuild(), 1)
+        self.assertStats()
+
+    def test_writes_keep_the_counters(self):
+        guest = User.objects.create_user("second-guest@example.com")
+        other_host = User.objects.create_user("second-host@example.com", is_host=True)
+        self.assertStats()
+        other = Property.objects.create(
+            title="Loft",
+            description="Another place",
+            location="Lyon",
+            address="2 Rue de la République",
+            price_per_night=80,
+            host=self.host,
+        )
+        upcoming = date.today() + timedelta(days=30)
+        pending = self.book("pending", check_in=upcoming)
+        past = self.book("confirmed", guest=guest, check_in=date(2024, 6, 1))
+        elsewhere = self.book(guest=guest, prop=other)
+        self.review(self.book())
+        self.review(elsewhere, rating=5)
+        self.assertStats()
+
+        # Cancelled through the API, completed by the lifecycle sweep
+        response = self.api_client(self.guest).post(
+            reverse("property:cancel-reservation", args=[pending.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(lifecycle.sweep(), (0, 1))
+        self.assertStats()
+
+        # Reassigned to another host with its bookings and reviews
+        other.host = other_host
+        other.save()
+        self.assertStats()
+        response = self.api_client(other_host).get(reverse("useraccount:user-stats"))
+        self.assertEqual(response.data["host_total_bookings"], 1)
+        self.assertEqual(response.data["total_reviews_received"], 1)
 
-# Create your tests here.
+        # Deletes, on their own and cascaded
+        past.refresh_from_db()
+        past.delete()
+        self.assertStats()
+        other.delete()
+        self.assertStats()
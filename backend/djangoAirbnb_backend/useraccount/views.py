@@ -3,6 +3,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
+from . import stats
 from .serializers import (
     CustomUserDetailsSerializer,
     UserRegistrationSerializer,
@@ -63,31 +64,22 @@ def become_host(request):
 def user_stats(request):
     """Get user statistics"""
     user = request.user
+    totals = stats.for_user(user)
 
-    from property.models import Property, Reservation, Review
-
-    stats = {
-        "total_properties": Property.objects.filter(host=user).count(),
-        "total_reservations": Reservation.objects.filter(guest=user).count(),
-        "total_reviews_given": Review.objects.filter(guest=user).count(),
-        "total_reviews_received": Review.objects.filter(property__host=user).count(),
+    data = {
+        "total_properties": totals.properties,
+        "total_reservations": totals.reservations,
+        "total_reviews_given": totals.reviews_given,
+        "total_reviews_received": totals.reviews_received,
     }
 
     if user.is_host:
         # Additional host stats
-        host_properties = Property.objects.filter(host=user)
-        total_bookings = Reservation.objects.filter(
-            property__in=host_properties
-        ).count()
-        completed_bookings = Reservation.objects.filter(
-            property__in=host_properties, status="completed"
-        ).count()
-
-        stats.update(
+        data.update(
             {
-                "host_total_bookings": total_bookings,
-                "host_completed_bookings": completed_bookings,
+                "host_total_bookings": totals.host_bookings,
+                "host_completed_bookings": totals.host_completed_bookings,
             }
         )
 
-    return Response(stats)
+    return Response(data)